@@ -1,61 +1,58 @@
 from flask import Flask
-from controllers.document_controller import document_blueprint
-import importlib.util
+from controllers.document_controller import document_blueprint, PDF_TRANSLATIONS
+from utils.logging_utils import configure_logging
+from utils.pdf_backends import warm_up_backend
 import os
 import secrets
 import logging
-from logging.handlers import RotatingFileHandler
 import traceback
 
-# Configure logging more thoroughly
-logging.basicConfig(
-    level=logging.DEBUG,  # Set to DEBUG for more verbose logging
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),  # Log to console
-    ]
-)
-
 # Create a specific logger for the app
 logger = logging.getLogger('book_of_documents')
-logger.setLevel(logging.DEBUG)  # Set to DEBUG for development
 
-# Create logs directory if it doesn't exist
-os.makedirs('logs', exist_ok=True)
+app = Flask(__name__)
 
-# Add file handler to save logs to file with more detailed formatting
-file_handler = RotatingFileHandler(
-    'logs/application.log',
-    maxBytes=10485760,  # 10MB
-    backupCount=5
-)
-file_handler.setLevel(logging.DEBUG)
-file_handler.setFormatter(logging.Formatter(
-    '%(asctime)s - %(name)s - %(levelname)s - %(pathname)s:%(lineno)d - %(message)s'
-))
-logger.addHandler(file_handler)
+# Log through a queue: request threads never wait on the console or log
+# file. Levels and format come from LOG_LEVEL, LOG_ROOT_LEVEL, LOG_JSON
+# and LOG_SOURCE (see configure_logging)
+app.config['LOG_FILE'] = 'logs/application.log'  # Rotated at 10MB; tailed by /logs and /logs/stream
+log_listener = configure_logging(app.config['LOG_FILE'], [logger.name, app.name])
 
-app = Flask(__name__)
 app.config['MAX_CONTENT_LENGTH'] = 1073741824  # 1GB max upload
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['OUTPUT_FOLDER'] = 'output'
+app.config['DOCUMENT_REGISTRY_PATH'] = 'uploads/documents.sqlite3'  # Per-session document lists
+app.config['METADATA_CACHE_PATH'] = 'cache/pdf_metadata.sqlite3'
+app.config['METADATA_CACHE_MAX_ENTRIES'] = 10000  # LRU-evicted beyond this
+app.config['NORMALIZATION_CACHE_PATH'] = 'cache/normalized.sqlite3'  # Repaired/decrypted copies of uploads, by content hash
+app.config['NORMALIZE_SLOW_SECONDS'] = 2  # Uploads taking longer to normalize are logged and listed at /stats/normalization
+app.config['BOOK_CACHE_FOLDER'] = 'cache/books'
+app.config['BOOK_CACHE_MAX_BYTES'] = 1073741824  # 1GB of merged book bodies; 0 disables
+app.config['SCRATCH_FOLDER'] = None  # Spill directory for merge and upload scratch files (e.g. a tmpfs mount); None uses the system temp dir
+app.config['STREAMING_MERGE_MIN_BYTES'] = 104857600  # Books with 100MB+ of documents merge with bounded memory; None disables
+app.config['DEDUP_STREAMS'] = True  # Streaming merges share identical fonts/images across documents; ?dedup=0 per request
+app.config['COMPACT_OUTPUT_MIN_BYTES'] = 104857600  # Books with 100MB+ of documents are written compacted (object/xref streams); ?compact=0/1 per request, None disables
+app.config['LINEARIZE_OUTPUT'] = False  # Write books for fast web view (first page first); ?linearize=0/1 per request
+app.config['STREAM_SAVE_COPY'] = False  # Keep an on-disk copy of streamed books
+app.config['INSPECT_WORKERS'] = os.cpu_count() or 1  # Processes for ZIP/folder page counting
+app.config['INSPECT_TIMEOUT_SECONDS'] = 60  # Per-file limit when page counting a batch
+app.config['GENERATION_WORKERS'] = max(1, (os.cpu_count() or 2) // 2)  # Concurrent book generations
+app.config['GENERATION_SLOW_SECONDS'] = 30  # Generations taking longer log their stage times and slowest inputs
+app.config['PROFILING_ENABLED'] = False  # Profile /generate and /upload requests sent with X-Profile: cpu or memory; listed at /profiles
+app.config['PROFILE_FOLDER'] = 'profiles'
 app.secret_key = secrets.token_hex(16)  # Generate a secure secret key for sessions
 app.config['SESSION_TYPE'] = 'filesystem'
 app.config['PERMANENT_SESSION_LIFETIME'] = 3600  # Session lifetime in seconds (1 hour)
 app.config['LOGGER'] = logger
+app.config['PDF_UTIL_MODULE'] = None  # PDF backend module, e.g. utils.pdf_utils_fpdf; None uses ReportLab if installed, else FPDF
+app.config['WARM_UP_PDF_BACKEND'] = True  # Load the backend in the background at startup instead of on the first request
 
-# Configure Flask to log errors
-if not app.debug:
-    app.logger.addHandler(file_handler)
-
-# Check if ReportLab is available, otherwise use FPDF
-try:
-    import reportlab
-    app.config['PDF_UTIL_MODULE'] = 'utils.pdf_utils'
-    logger.info("Using ReportLab for PDF generation")
-except ImportError:
-    app.config['PDF_UTIL_MODULE'] = 'utils.pdf_utils_fpdf'
-    logger.info("Using FPDF for PDF generation")
+# Import the PDF backend and build its front-matter renderers in the
+# background: the server starts at once and the first generation still
+# does not pay for them
+pdf_backend_warm_up = None
+if app.config['WARM_UP_PDF_BACKEND']:
+    pdf_backend_warm_up = warm_up_backend(app.config['PDF_UTIL_MODULE'], list(PDF_TRANSLATIONS.values()), logger)
 
 # Register blueprints
 app.register_blueprint(document_blueprint)
@@ -64,7 +61,7 @@ app.register_blueprint(document_blueprint)
 @app.errorhandler(500)
 def internal_error(error):
     error_traceback = traceback.format_exc()
-    logger.error(f"Internal Server Error: {error_traceback}")
+    logger.error("Internal Server Error: %s", error_traceback)
     return "Internal Server Error", 500
 
 if __name__ == '__main__':
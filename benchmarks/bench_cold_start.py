@@ -0,0 +1,88 @@
+"""Benchmark cold start: time from a fresh process to its first served requests.
+
+Each run starts a new interpreter that imports the app and serves GET /,
+a PDF upload and a generation through the Flask test client, timing each
+from the start of the process. "eager" waits for the PDF backend to be
+imported and warmed up before serving, as app.py used to at import time;
+"lazy" serves at once while the backend warms up in the background.
+Times are medians over several runs. Run from the repository root:
+
+    python -m benchmarks.bench_cold_start
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import statistics
+import subprocess
+
+RUNS = 5
+MODES = ['eager', 'lazy']
+MILESTONES = ['import', 'index', 'upload', 'generate']
+
+def child(mode, work_dir, pdf_path):
+    """Runs in the fresh process; prints seconds since start per milestone."""
+    started = time.perf_counter()
+    times = {}
+    import app as app_module
+    if mode == 'eager':
+        app_module.pdf_backend_warm_up.join()
+    times['import'] = time.perf_counter() - started
+    app = app_module.app
+    app.config.update(
+        UPLOAD_FOLDER=os.path.join(work_dir, 'uploads'),
+        OUTPUT_FOLDER=os.path.join(work_dir, 'output'),
+        DOCUMENT_REGISTRY_PATH=os.path.join(work_dir, 'documents.sqlite3'),
+        METADATA_CACHE_PATH=os.path.join(work_dir, 'metadata.sqlite3'),
+        NORMALIZATION_CACHE_PATH=os.path.join(work_dir, 'normalized.sqlite3'),
+        BOOK_CACHE_FOLDER=os.path.join(work_dir, 'books'),
+        LOG_FILE=os.path.join(work_dir, 'application.log'),
+    )
+    os.makedirs(app.config['OUTPUT_FOLDER'])
+    client = app.test_client()
+    headers = {'X-Requested-With': 'XMLHttpRequest'}
+
+    assert client.get('/').status_code == 200
+    times['index'] = time.perf_counter() - started
+    with open(pdf_path, 'rb') as f:
+        response = client.post('/upload', data={'file': (f, 'document.pdf')}, headers=headers,
+                               content_type='multipart/form-data')
+    assert response.status_code == 200, response.data
+    times['upload'] = time.perf_counter() - started
+    response = client.post('/generate', headers=headers)
+    assert response.status_code == 200, response.data[:500]
+    response.close()
+    times['generate'] = time.perf_counter() - started
+    print(json.dumps(times))
+
+def run(mode, temp_dir, pdf_path):
+    work_dir = tempfile.mkdtemp(dir=temp_dir)
+    # Console logging goes to stderr and is dropped
+    output = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.bench_cold_start', '--child', mode, work_dir, pdf_path],
+        capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    from benchmarks.corpus import make_pdf
+    temp_dir = tempfile.mkdtemp()
+    try:
+        pdf_path = os.path.join(temp_dir, 'document.pdf')
+        make_pdf(pdf_path, 3)
+        print(f"Median of {RUNS} fresh processes, milliseconds since process start")
+        print(f"{'mode':>6} " + " ".join(f"{name:>9}" for name in MILESTONES))
+        for mode in MODES:
+            runs = [run(mode, temp_dir, pdf_path) for _ in range(RUNS)]
+            medians = [statistics.median(times[name] for times in runs) for name in MILESTONES]
+            print(f"{mode:>6} " + " ".join(f"{value * 1000:>9.1f}" for value in medians))
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return 0
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--child']:
+        child(*sys.argv[2:5])
+        sys.exit(0)
+    sys.exit(main())
@@ -0,0 +1,63 @@
+"""Benchmark output compaction against the plain merges.
+
+Uses the uncompressed-text corpus from bench_merge_memory, the worst case
+for a plain merge, and merges it with PdfMerger, with the streaming merge
+and with the streaming merge plus compaction (object streams, an xref
+stream and flate for unfiltered streams), reporting output size and time
+relative to PdfMerger. Run from the repository root:
+
+    python -m benchmarks.bench_compact
+"""
+import os
+import sys
+import time
+import random
+import shutil
+import tempfile
+import PyPDF2
+from utils.merge_utils import ManifestEntry
+from utils.pdf_utils import merge_pdfs
+from utils.pdf_stream_writer import OutputCompactor
+from benchmarks.bench_merge_memory import make_corpus
+
+DOCUMENT_COUNT = 100
+
+def run(manifest, output_path, **options):
+    start = time.perf_counter()
+    merge_pdfs(manifest, output_path, **options)
+    elapsed = time.perf_counter() - start
+    pages = len(PyPDF2.PdfReader(output_path).pages)
+    return elapsed, os.path.getsize(output_path), pages
+
+def main():
+    temp_dir = tempfile.mkdtemp()
+    try:
+        paths = make_corpus(os.path.join(temp_dir, 'corpus'), DOCUMENT_COUNT, random.Random(0))
+        input_bytes = sum(os.path.getsize(path) for path in paths)
+        # The first two and the last document stand in for the front matter
+        manifest = [ManifestEntry(path, None, os.path.basename(path)) for path in paths]
+        print(f"{DOCUMENT_COUNT} documents, {input_bytes / 1e6:.2f} MB of input")
+        print(f"{'mode':>18} {'seconds':>8} {'output MB':>10} {'size':>6} {'time':>6} {'pages':>6}")
+
+        compactor = OutputCompactor()
+        modes = [
+            ('merger', {}),
+            ('streaming', {'streaming': True}),
+            ('streaming+compact', {'streaming': True, 'compact': compactor}),
+        ]
+        baseline = None
+        for name, options in modes:
+            elapsed, size, pages = run(manifest, os.path.join(temp_dir, f"{name}.pdf"), **options)
+            baseline = baseline or (elapsed, size)
+            print(f"{name:>18} {elapsed:>8.2f} {size / 1e6:>10.2f} "
+                  f"{size / baseline[1]:>6.2f} {elapsed / baseline[0]:>6.2f} {pages:>6}")
+        report = compactor.report()
+        print(f"Compaction packed {report['objects_packed']} objects and compressed "
+              f"{report['streams_compressed']} streams, saving "
+              f"{report['compression_bytes_saved'] / 1e6:.2f} MB")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
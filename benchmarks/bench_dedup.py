@@ -0,0 +1,97 @@
+"""Benchmark stream deduplication on a corpus with shared resources.
+
+Every generated document carries the same letterhead in an embedded
+TrueType font and the same logo image, the way exhibit packs repeat a
+firm's branding. The corpus is merged with PdfMerger (whose writer
+already shares identical objects, holding the whole book to do so), with
+the streaming merge and with the streaming merge plus deduplication,
+reporting output size, time and what deduplication shared. Run from the
+repository root:
+
+    python -m benchmarks.bench_dedup
+"""
+import os
+import sys
+import time
+import random
+import shutil
+import tempfile
+import PyPDF2
+import reportlab
+from PIL import Image
+from reportlab.pdfgen import canvas
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from utils.merge_utils import ManifestEntry
+from utils.pdf_utils import merge_pdfs
+from utils.pdf_stream_writer import StreamDeduplicator
+
+DOCUMENT_COUNT = 40
+PAGES_PER_DOCUMENT = 3
+LOGO_SIZE = 200
+LETTERHEAD = "Example & Partners LLP - Exhibit bundle"
+
+def make_logo(path, rng):
+    """Noise compresses badly, like a photographic logo."""
+    pixels = bytes(rng.getrandbits(8) for _ in range(LOGO_SIZE * LOGO_SIZE * 3))
+    Image.frombytes('RGB', (LOGO_SIZE, LOGO_SIZE), pixels).save(path)
+
+def make_corpus(folder, rng):
+    os.makedirs(folder, exist_ok=True)
+    font_path = os.path.join(os.path.dirname(reportlab.__file__), 'fonts', 'Vera.ttf')
+    pdfmetrics.registerFont(TTFont('Letterhead', font_path))
+    logo_path = os.path.join(folder, 'logo.png')
+    make_logo(logo_path, rng)
+    paths = []
+    for i in range(DOCUMENT_COUNT):
+        path = os.path.join(folder, f"exhibit_{i:03d}.pdf")
+        pdf = canvas.Canvas(path)
+        for page in range(PAGES_PER_DOCUMENT):
+            # Only the letterhead uses the embedded font, so every document
+            # embeds the same subset
+            pdf.setFont('Letterhead', 14)
+            pdf.drawString(72, 800, LETTERHEAD)
+            pdf.drawImage(logo_path, 450, 740, 80, 80)
+            pdf.setFont('Helvetica', 11)
+            pdf.drawString(72, 700, f"Exhibit {i + 1}, page {page + 1}")
+            pdf.showPage()
+        pdf.save()
+        paths.append(path)
+    return paths
+
+def run(manifest, output_path, **options):
+    start = time.perf_counter()
+    merge_pdfs(manifest, output_path, **options)
+    elapsed = time.perf_counter() - start
+    pages = len(PyPDF2.PdfReader(output_path).pages)
+    return elapsed, os.path.getsize(output_path), pages
+
+def main():
+    temp_dir = tempfile.mkdtemp()
+    try:
+        paths = make_corpus(os.path.join(temp_dir, 'corpus'), random.Random(0))
+        input_bytes = sum(os.path.getsize(path) for path in paths)
+        # The first two and the last document stand in for the front matter
+        manifest = [ManifestEntry(path, None, os.path.basename(path)) for path in paths]
+        print(f"{DOCUMENT_COUNT} documents, {input_bytes / 1e6:.2f} MB of input")
+        print(f"{'mode':>16} {'seconds':>8} {'output MB':>10} {'pages':>6} {'shared':>7} {'saved MB':>9}")
+
+        deduplicator = StreamDeduplicator()
+        modes = [
+            ('merger', {}),
+            ('streaming', {'streaming': True}),
+            ('streaming+dedup', {'streaming': True, 'dedup': deduplicator}),
+        ]
+        for name, options in modes:
+            elapsed, size, pages = run(manifest, os.path.join(temp_dir, f"{name}.pdf"), **options)
+            shared, saved = '-', '-'
+            if 'dedup' in options:
+                shared = str(deduplicator.streams_shared)
+                saved = f"{deduplicator.bytes_saved / 1e6:.2f}"
+            print(f"{name:>16} {elapsed:>8.2f} {size / 1e6:>10.2f} {pages:>6} {shared:>7} {saved:>9}")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
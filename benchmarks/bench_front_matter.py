@@ -0,0 +1,62 @@
+"""Benchmark front-matter rendering with and without the cached renderer.
+
+For each backend, times the first render after import (cold, what the
+first generation paid before start-up warm-up), then a renderer built per
+call as the old create_* functions did against the cached renderer after
+warm-up. Run from the repository root:
+
+    python -m benchmarks.bench_front_matter
+"""
+import io
+import sys
+import time
+import importlib
+from models.book import Book
+from models.document import Document
+from controllers.document_controller import PDF_TRANSLATIONS
+
+BACKENDS = ['utils.pdf_utils', 'utils.pdf_utils_fpdf']
+DOCUMENT_COUNTS = [10, 100]
+ROUNDS = 20
+
+def make_book(count):
+    book = Book()
+    for i in range(count):
+        doc = Document(f"blobs/{i:05d}.pdf", f"document_{i}.pdf", 'pdf')
+        doc.status = 'success'
+        doc.page_count = 3
+        book.add_document(doc)
+    return book
+
+def render_once(renderer, book):
+    renderer.render(book, io.BytesIO(), io.BytesIO(), io.BytesIO())
+
+def main():
+    translations = PDF_TRANSLATIONS['en']
+    print(f"{'backend':<22} {'documents':>9} {'cold (ms)':>10} {'per call (ms)':>14} {'cached (ms)':>12}")
+    for backend in BACKENDS:
+        module = importlib.import_module(backend)
+        book = make_book(DOCUMENT_COUNTS[0])
+        start = time.perf_counter()
+        render_once(module.get_front_matter_renderer(translations), book)
+        cold = time.perf_counter() - start
+
+        for count in DOCUMENT_COUNTS:
+            book = make_book(count)
+            start = time.perf_counter()
+            for _ in range(ROUNDS):
+                render_once(module.FrontMatterRenderer(translations), book)
+            per_call = (time.perf_counter() - start) / ROUNDS
+
+            module.warm_up_front_matter(PDF_TRANSLATIONS.values())
+            start = time.perf_counter()
+            for _ in range(ROUNDS):
+                render_once(module.get_front_matter_renderer(translations), book)
+            cached = (time.perf_counter() - start) / ROUNDS
+
+            cold_text = f"{cold * 1000:.1f}" if count == DOCUMENT_COUNTS[0] else "-"
+            print(f"{backend:<22} {count:>9} {cold_text:>10} {per_call * 1000:>14.2f} {cached * 1000:>12.2f}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""Benchmark request latency under each logging setup.
+
+Times /generate and /documents/view requests through the Flask test client
+with logging disabled, with the previous synchronous setup (DEBUG to the
+console and a rotating file, recording pathname:lineno) and with the
+queue-based setup at DEBUG and at INFO. Console output goes to a
+temporary file so the terminal does not skew the results. Run from the
+repository root:
+
+    python -m benchmarks.bench_logging
+"""
+import os
+import sys
+import time
+import random
+import shutil
+import logging
+import tempfile
+import statistics
+from logging.handlers import RotatingFileHandler
+from utils.logging_utils import configure_logging, stop_listener, SOURCE_FORMAT, TEXT_FORMAT
+from benchmarks.corpus import make_corpus
+
+DOCUMENT_COUNT = 10
+REQUESTS = 100
+
+def reset_logging():
+    logging.disable(logging.NOTSET)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+
+def synchronous_logging(log_dir, logger_names):
+    """The setup app.py used before: handlers write on the request thread"""
+    logging._srcfile = os.path.normcase(logging.addLevelName.__code__.co_filename)
+    root = logging.getLogger()
+    console = logging.StreamHandler(open(os.path.join(log_dir, 'console.log'), 'a'))
+    console.setFormatter(logging.Formatter(TEXT_FORMAT))
+    root.addHandler(console)
+    root.setLevel(logging.DEBUG)
+    file_handler = RotatingFileHandler(os.path.join(log_dir, 'application.log'),
+                                       maxBytes=10485760, backupCount=5)
+    file_handler.setFormatter(logging.Formatter(SOURCE_FORMAT))
+    for name in logger_names:
+        logging.getLogger(name).setLevel(logging.DEBUG)
+        logging.getLogger(name).addHandler(file_handler)
+    return lambda: [logging.getLogger(name).removeHandler(file_handler) for name in logger_names]
+
+def queue_logging(log_dir, logger_names, level):
+    listener = configure_logging(os.path.join(log_dir, 'application.log'), logger_names,
+                                 level=level, root_level=level, json_output=False,
+                                 source_location=False)
+    # Console output from the listener thread goes to a file as well
+    listener.handlers[0].setStream(open(os.path.join(log_dir, 'console.log'), 'a'))
+    return lambda: stop_listener(listener)
+
+def disabled_logging(log_dir, logger_names):
+    logging.disable(logging.CRITICAL)
+    return lambda: None
+
+def time_requests(client, path, method, headers):
+    latencies = []
+    for _ in range(REQUESTS):
+        start = time.perf_counter()
+        response = getattr(client, method)(path, headers=headers)
+        response.get_data()
+        response.close()
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return statistics.mean(latencies), latencies[int(len(latencies) * 0.95) - 1]
+
+def main():
+    import app as app_module
+    stop_listener(app_module.log_listener)
+    app = app_module.app
+    logger_names = [app_module.logger.name, app.name]
+    temp_dir = tempfile.mkdtemp()
+    try:
+        app.config.update(
+            UPLOAD_FOLDER=os.path.join(temp_dir, 'uploads'),
+            OUTPUT_FOLDER=os.path.join(temp_dir, 'output'),
+            DOCUMENT_REGISTRY_PATH=os.path.join(temp_dir, 'documents.sqlite3'),
+            METADATA_CACHE_PATH=os.path.join(temp_dir, 'metadata.sqlite3'),
+            NORMALIZATION_CACHE_PATH=os.path.join(temp_dir, 'normalized.sqlite3'),
+            BOOK_CACHE_FOLDER=os.path.join(temp_dir, 'books'),
+        )
+        os.makedirs(app.config['OUTPUT_FOLDER'])
+        headers = {'X-Requested-With': 'XMLHttpRequest'}
+        client = app.test_client()
+        for path in make_corpus(os.path.join(temp_dir, 'corpus'), DOCUMENT_COUNT, rng=random.Random(0)):
+            with open(path, 'rb') as f:
+                client.post('/upload', data={'file': (f, os.path.basename(path))}, headers=headers,
+                            content_type='multipart/form-data')
+        view_path = '/documents/view/' + client.get('/documents').json[0]['id']
+        # Warm the metadata and book caches so every mode does the same work
+        reset_logging()
+        logging.disable(logging.CRITICAL)
+        time_requests(client, '/generate', 'post', headers)
+
+        modes = [
+            ('off', disabled_logging),
+            ('synchronous DEBUG', synchronous_logging),
+            ('queue DEBUG', lambda log_dir, names: queue_logging(log_dir, names, logging.DEBUG)),
+            ('queue INFO', lambda log_dir, names: queue_logging(log_dir, names, logging.INFO)),
+        ]
+        print(f"{REQUESTS} requests each, {DOCUMENT_COUNT} documents per book")
+        print(f"{'logging':>18} {'generate mean':>14} {'p95 (ms)':>9} {'view mean':>10} {'p95 (ms)':>9}")
+        for name, setup in modes:
+            reset_logging()
+            log_dir = tempfile.mkdtemp(dir=temp_dir)
+            teardown = setup(log_dir, logger_names)
+            try:
+                generate = time_requests(client, '/generate', 'post', headers)
+                view = time_requests(client, view_path, 'get', headers)
+            finally:
+                teardown()
+            print(f"{name:>18} {generate[0] * 1000:>14.2f} {generate[1] * 1000:>9.2f} "
+                  f"{view[0] * 1000:>10.2f} {view[1] * 1000:>9.2f}")
+    finally:
+        reset_logging()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
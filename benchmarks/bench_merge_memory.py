@@ -0,0 +1,98 @@
+"""Benchmark peak memory of the PdfMerger and streaming merges.
+
+Builds corpora of generated PDFs, then merges each one in a fresh
+subprocess per mode: once measuring peak RSS and wall time, once under
+tracemalloc for the peak of Python allocations. The streaming merge
+should stay flat as the book grows while PdfMerger grows with it. Run
+from the repository root:
+
+    python -m benchmarks.bench_merge_memory
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import resource
+import tempfile
+import subprocess
+import tracemalloc
+from reportlab.pdfgen import canvas
+from utils.merge_utils import ManifestEntry
+from utils.pdf_utils import merge_pdfs
+
+DOCUMENT_COUNTS = [50, 200]
+PAGES_PER_DOCUMENT = 10
+CHARACTERS_PER_PAGE = 8000
+MODES = ['merger', 'streaming']
+
+def make_pdf(path, rng):
+    """A PDF whose uncompressed pages hold random text."""
+    pdf = canvas.Canvas(path, pageCompression=0)
+    alphabet = 'abcdefghijklmnopqrstuvwxyz '
+    for _ in range(PAGES_PER_DOCUMENT):
+        text = ''.join(rng.choices(alphabet, k=CHARACTERS_PER_PAGE))
+        for line in range(0, len(text), 100):
+            pdf.drawString(20, 800 - (line // 100) * 9, text[line:line + 100])
+        pdf.showPage()
+    pdf.save()
+
+def make_corpus(folder, count, rng):
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for i in range(count):
+        path = os.path.join(folder, f"document_{i:04d}.pdf")
+        make_pdf(path, rng)
+        paths.append(path)
+    return paths
+
+def worker(mode, measure, corpus, output_path):
+    """Merge corpus in this process and print the measurements as JSON."""
+    paths = sorted(os.path.join(corpus, name) for name in os.listdir(corpus))
+    # The first two and the last document stand in for the front matter
+    manifest = [ManifestEntry(path, None, os.path.basename(path)) for path in paths]
+    if measure == 'traced':
+        tracemalloc.start()
+    start = time.perf_counter()
+    merge_pdfs(manifest, output_path, streaming=(mode == 'streaming'))
+    elapsed = time.perf_counter() - start
+    result = {'seconds': elapsed, 'output_bytes': os.path.getsize(output_path)}
+    if measure == 'traced':
+        result['traced_peak'] = tracemalloc.get_traced_memory()[1]
+    else:
+        # ru_maxrss is in kilobytes on Linux
+        result['max_rss'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    print(json.dumps(result))
+    return 0
+
+def run_worker(mode, measure, corpus, output_path):
+    output = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.bench_merge_memory', '--worker', mode, measure, corpus, output_path],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    temp_dir = tempfile.mkdtemp()
+    rng = random.Random(0)
+    try:
+        print(f"{'documents':>9} {'input MB':>9} {'mode':>10} {'seconds':>8} {'peak RSS MB':>12} {'traced peak MB':>15}")
+        for count in DOCUMENT_COUNTS:
+            corpus = os.path.join(temp_dir, f"corpus_{count}")
+            paths = make_corpus(corpus, count, rng)
+            input_bytes = sum(os.path.getsize(path) for path in paths)
+            for mode in MODES:
+                output_path = os.path.join(temp_dir, f"book_{count}_{mode}.pdf")
+                rss = run_worker(mode, 'rss', corpus, output_path)
+                traced = run_worker(mode, 'traced', corpus, output_path)
+                print(f"{count:>9} {input_bytes / 1e6:>9.1f} {mode:>10} {rss['seconds']:>8.2f} "
+                      f"{rss['max_rss'] / 1e6:>12.1f} {traced['traced_peak'] / 1e6:>15.1f}")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return 0
+
+if __name__ == '__main__':
+    if len(sys.argv) == 6 and sys.argv[1] == '--worker':
+        sys.exit(worker(*sys.argv[2:]))
+    sys.exit(main())
@@ -0,0 +1,56 @@
+"""Benchmark the trailer-only page-count probe against the full parser.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_page_count
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+import PyPDF2
+from reportlab.pdfgen import canvas
+from utils.pdf_probe import probe_page_count
+
+PAGE_COUNTS = [10, 100, 500, 2000]
+REPEATS = 5
+
+def make_pdf(path, pages):
+    """Write a PDF with the given number of text pages."""
+    c = canvas.Canvas(path)
+    for i in range(pages):
+        c.drawString(72, 720, f"Benchmark page {i + 1}")
+        c.showPage()
+    c.save()
+
+def full_parse(path):
+    with open(path, 'rb') as f:
+        return len(PyPDF2.PdfReader(f).pages)
+
+def best_of(func, path):
+    best = None
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        func(path)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    temp_dir = tempfile.mkdtemp()
+    try:
+        print(f"{'pages':>6} {'full parse (ms)':>16} {'probe (ms)':>11} {'speedup':>8}")
+        for pages in PAGE_COUNTS:
+            path = os.path.join(temp_dir, f"bench_{pages}.pdf")
+            make_pdf(path, pages)
+            assert probe_page_count(path) == full_parse(path) == pages
+            full = best_of(full_parse, path)
+            probe = best_of(probe_page_count, path)
+            print(f"{pages:>6} {full * 1000:>16.2f} {probe * 1000:>11.3f} {full / probe:>7.0f}x")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,70 @@
+"""Benchmark single-document moves against full-order reorders.
+
+Compares the old nested-loop reorder of the session list, a full-order
+reorder through the document registry and the registry's move-before
+operation at growing list sizes. Run from the repository root:
+
+    python -m benchmarks.bench_reorder
+"""
+import os
+import sys
+import time
+import random
+import shutil
+import tempfile
+from models.document import Document
+from utils.document_registry import DocumentRegistry
+
+SIZES = [100, 1000, 10000]
+MOVES = 200
+SESSION_KEY = 'bench'
+
+def legacy_reorder(new_order, documents):
+    """The nested-loop reorder the session-list controller used to run."""
+    reordered_docs = []
+    for doc_id in new_order:
+        for doc in documents:
+            if doc['id'] == doc_id:
+                reordered_docs.append(doc)
+                break
+    return reordered_docs
+
+def make_documents(count):
+    return [Document(f"blobs/{i:05d}.pdf", f"document_{i}.pdf", 'pdf') for i in range(count)]
+
+def main():
+    temp_dir = tempfile.mkdtemp()
+    rng = random.Random(0)
+    try:
+        print(f"{'documents':>9} {'legacy reorder (ms)':>20} {'registry reorder (ms)':>22} {'move (ms)':>10}")
+        for size in SIZES:
+            registry = DocumentRegistry(os.path.join(temp_dir, f"bench_{size}.sqlite3"))
+            documents = make_documents(size)
+            registry.add(SESSION_KEY, documents)
+            ids = [doc.id for doc in documents]
+            shuffled = ids[:]
+            rng.shuffle(shuffled)
+
+            dicts = [doc.to_dict() for doc in documents]
+            start = time.perf_counter()
+            legacy_reorder(shuffled, dicts)
+            legacy = time.perf_counter() - start
+
+            start = time.perf_counter()
+            registry.reorder(SESSION_KEY, shuffled)
+            full = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for _ in range(MOVES):
+                moved, before = rng.sample(ids, 2)
+                assert registry.move(SESSION_KEY, moved, before)
+            move = (time.perf_counter() - start) / MOVES
+
+            assert len(registry.list(SESSION_KEY)) == size
+            print(f"{size:>9} {legacy * 1000:>20.1f} {full * 1000:>22.1f} {move * 1000:>10.3f}")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""Compare streaming ZIP ingestion with the old extract-and-copy path.
+
+Builds an archive of PDFs padded with large non-PDF members and reports wall
+time and peak disk use of each path. Run from the repository root:
+
+    python -m benchmarks.bench_zip_ingest
+"""
+import os
+import sys
+import time
+import shutil
+import zipfile
+import tempfile
+import threading
+from reportlab.pdfgen import canvas
+from utils.blob_store import BlobStore
+from utils.zip_utils import process_zip_file
+
+PDF_COUNT = 40
+PDF_PAGES = 20
+FILLER_COUNT = 10
+FILLER_SIZE = 20 * 1024 * 1024  # 20MB of non-PDF content per filler member
+
+def legacy_process_zip_file(zip_path, upload_folder):
+    """The previous implementation: extract everything, then copy the PDFs."""
+    temp_dir = tempfile.mkdtemp()
+    try:
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            zip_ref.extractall(temp_dir)
+        for root, dirs, files in os.walk(temp_dir):
+            for filename in files:
+                if filename.startswith('.') or not filename.lower().endswith('.pdf'):
+                    continue
+                file_path = os.path.join(root, filename)
+                shutil.copy2(file_path, os.path.join(
+                    upload_folder,
+                    f"{os.path.splitext(filename)[0]}_{os.path.getmtime(file_path):.0f}.pdf"))
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+def directory_size(path):
+    total = 0
+    for root, dirs, files in os.walk(path):
+        for filename in files:
+            try:
+                total += os.path.getsize(os.path.join(root, filename))
+            except OSError:
+                pass  # File removed while walking
+    return total
+
+class DiskSampler:
+    """Samples the size of a directory tree in the background."""
+
+    def __init__(self, path, interval=0.005):
+        self.path = path
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, directory_size(self.path))
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, directory_size(self.path))
+
+def build_archive(path, work_dir):
+    pdf_path = os.path.join(work_dir, 'sample.pdf')
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for i in range(PDF_COUNT):
+            c = canvas.Canvas(pdf_path)
+            for page in range(PDF_PAGES):
+                c.drawString(72, 720, f"Exhibit {i} page {page + 1}")
+                c.showPage()
+            c.save()
+            archive.write(pdf_path, f"exhibits/exhibit_{i:03d}.pdf")
+        for i in range(FILLER_COUNT):
+            archive.writestr(f"scans/raw_{i}.bin", os.urandom(FILLER_SIZE))
+    os.remove(pdf_path)
+
+def run(label, func, scratch):
+    os.makedirs(scratch)
+    with DiskSampler(scratch) as sampler:
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+    print(f"{label:<10} {elapsed:>8.2f} s {sampler.peak / 1048576:>12.1f} MB")
+    shutil.rmtree(scratch, ignore_errors=True)
+
+def main():
+    work_dir = tempfile.mkdtemp()
+    try:
+        zip_path = os.path.join(work_dir, 'exhibits.zip')
+        build_archive(zip_path, work_dir)
+        print(f"archive: {os.path.getsize(zip_path) / 1048576:.1f} MB, "
+              f"{PDF_COUNT} PDFs + {FILLER_COUNT} x {FILLER_SIZE // 1048576} MB non-PDF members")
+        print(f"{'path':<10} {'wall time':>10} {'peak disk':>15}")
+
+        # Point extraction temp dirs inside the measured tree
+        legacy_root = os.path.join(work_dir, 'legacy')
+        def legacy():
+            tempfile.tempdir = legacy_root
+            try:
+                uploads = os.path.join(legacy_root, 'uploads')
+                os.makedirs(uploads)
+                legacy_process_zip_file(zip_path, uploads)
+            finally:
+                tempfile.tempdir = None
+        run('legacy', legacy, legacy_root)
+
+        streaming_root = os.path.join(work_dir, 'streaming')
+        run('streaming', lambda: process_zip_file(zip_path, BlobStore(streaming_root)), streaming_root)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,141 @@
+"""Synthetic PDF corpus for the benchmarks.
+
+Generates PDFs with configurable page counts, page sizes and embedded
+images, optionally with broken xref tables, and packs them into ZIP
+archives and nested folder trees the way users upload them. Run from the
+repository root to write a corpus to a folder:
+
+    python -m benchmarks.corpus OUTPUT_FOLDER --documents 100 --images 0.3 --broken 0.1
+"""
+import io
+import os
+import sys
+import random
+import zipfile
+import argparse
+from PIL import Image
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import letter, legal, A4
+from reportlab.lib.utils import ImageReader
+
+PAGE_SIZES = {'letter': letter, 'a4': A4, 'legal': legal}
+
+class CorpusSpec:
+    """What a generated corpus looks like.
+
+    Each document gets between min_pages and max_pages pages of one of
+    page_sizes; image_fraction of them carry a photo-like image of
+    image_size pixels on every page and broken_fraction of them have every
+    xref offset shifted, so readers have to repair them.
+    """
+
+    def __init__(self, min_pages=1, max_pages=5, page_sizes=('letter', 'a4'),
+                 image_fraction=0.0, image_size=300, broken_fraction=0.0):
+        self.min_pages = min_pages
+        self.max_pages = max_pages
+        self.page_sizes = page_sizes
+        self.image_fraction = image_fraction
+        self.image_size = image_size
+        self.broken_fraction = broken_fraction
+
+    def to_dict(self):
+        return dict(vars(self), page_sizes=list(self.page_sizes))
+
+def make_image(rng, size):
+    """Noise compresses badly, like a photograph."""
+    pixels = bytes(rng.getrandbits(8) for _ in range(size * size * 3))
+    buffer = io.BytesIO()
+    Image.frombytes('RGB', (size, size), pixels).save(buffer, 'PNG')
+    buffer.seek(0)
+    return ImageReader(buffer)
+
+def make_pdf(path, pages, page_size='letter', image=None, title=None):
+    """Write a PDF of text pages, drawing image on each one if given."""
+    width, height = PAGE_SIZES[page_size]
+    pdf = canvas.Canvas(path, pagesize=(width, height))
+    for page in range(pages):
+        pdf.setFont('Helvetica', 14)
+        pdf.drawString(72, height - 72, f"{title or os.path.basename(path)} - page {page + 1}")
+        pdf.setFont('Helvetica', 10)
+        for line in range(20):
+            pdf.drawString(72, height - 110 - line * 14,
+                           f"Line {line + 1} of benchmark content for page {page + 1}.")
+        if image is not None:
+            pdf.drawImage(image, width - 272, 72, 200, 200)
+        pdf.showPage()
+    pdf.save()
+
+def break_xref(path):
+    """Shift every object in a PDF so its xref offsets are all wrong."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    header_end = data.index(b'\n', 10) + 1
+    with open(path, 'wb') as f:
+        f.write(data[:header_end] + b'%' + b'x' * 200 + b'\n' + data[header_end:])
+
+def make_corpus(folder, count, spec=None, rng=None):
+    """Write count PDFs to folder; returns their paths in order."""
+    spec = spec or CorpusSpec()
+    rng = rng or random.Random(0)
+    os.makedirs(folder, exist_ok=True)
+    # A few distinct images shared around, as letterheads and scans repeat
+    images = [make_image(rng, spec.image_size) for _ in range(3)] if spec.image_fraction else []
+    paths = []
+    for i in range(count):
+        path = os.path.join(folder, f"document_{i:04d}.pdf")
+        image = rng.choice(images) if images and rng.random() < spec.image_fraction else None
+        make_pdf(path, rng.randint(spec.min_pages, spec.max_pages),
+                 rng.choice(spec.page_sizes), image, f"Document {i + 1}")
+        if rng.random() < spec.broken_fraction:
+            break_xref(path)
+        paths.append(path)
+    return paths
+
+def make_zip(paths, zip_path, filler_bytes=0):
+    """Pack PDFs into a ZIP, with an optional non-PDF member of filler_bytes."""
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for path in paths:
+            archive.write(path, os.path.join('exhibits', os.path.basename(path)))
+        archive.writestr('exhibits/.DS_Store', b'\0' * 64)
+        if filler_bytes:
+            archive.writestr('attachments/video.bin', os.urandom(filler_bytes))
+    return zip_path
+
+def make_folder_tree(paths, root, per_folder=25):
+    """Copy PDFs into nested folders of per_folder files each; returns root."""
+    for i, path in enumerate(paths):
+        group = i // per_folder
+        folder = os.path.join(root, f"box_{group // 4:02d}", f"folder_{group:03d}")
+        os.makedirs(folder, exist_ok=True)
+        with open(path, 'rb') as source, open(os.path.join(folder, os.path.basename(path)), 'wb') as target:
+            target.write(source.read())
+    # Files the upload ignores
+    with open(os.path.join(root, '.hidden.pdf'), 'wb') as f:
+        f.write(b'%PDF-1.4\n')
+    with open(os.path.join(root, 'notes.txt'), 'w') as f:
+        f.write("not a PDF\n")
+    return root
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('output_folder')
+    parser.add_argument('--documents', type=int, default=100)
+    parser.add_argument('--min-pages', type=int, default=1)
+    parser.add_argument('--max-pages', type=int, default=5)
+    parser.add_argument('--page-sizes', default='letter,a4')
+    parser.add_argument('--images', type=float, default=0.0, help="fraction of documents with images")
+    parser.add_argument('--broken', type=float, default=0.0, help="fraction of documents with broken xrefs")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    spec = CorpusSpec(args.min_pages, args.max_pages, tuple(args.page_sizes.split(',')),
+                      args.images, broken_fraction=args.broken)
+    paths = make_corpus(os.path.join(args.output_folder, 'pdfs'), args.documents, spec,
+                        random.Random(args.seed))
+    make_zip(paths, os.path.join(args.output_folder, 'corpus.zip'))
+    make_folder_tree(paths, os.path.join(args.output_folder, 'tree'))
+    print(f"Wrote {len(paths)} PDFs, corpus.zip and tree/ to {args.output_folder}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,181 @@
+"""Benchmark suite over a synthetic corpus, with JSON results.
+
+For both backends and each corpus size, times get_pdf_page_count over
+every document, process_zip_file and process_folder (page-counting each
+stored document with the backend), each front-matter function and
+merge_pdfs of the whole book. The corpus mixes page counts, page sizes,
+embedded images and broken xref tables (see benchmarks.corpus). Results
+go to a JSON file; pass --compare with an earlier results file to print
+the change per benchmark. Run from the repository root:
+
+    python -m benchmarks.suite --output results.json
+    python -m benchmarks.suite --sizes 10,100 --compare results.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import importlib
+import subprocess
+from datetime import datetime
+from models.book import Book
+from models.document import Document
+from utils.blob_store import BlobStore
+from utils.zip_utils import process_zip_file
+from utils.folder_utils import process_folder
+from utils.merge_utils import ManifestEntry
+from controllers.document_controller import PDF_TRANSLATIONS
+from benchmarks.corpus import CorpusSpec, make_corpus, make_zip, make_folder_tree
+
+BACKENDS = ['utils.pdf_utils', 'utils.pdf_utils_fpdf']
+DOCUMENT_COUNTS = [10, 100, 1000]
+CORPUS_SPEC = CorpusSpec(min_pages=1, max_pages=8, page_sizes=('letter', 'a4', 'legal'),
+                         image_fraction=0.2, image_size=200, broken_fraction=0.05)
+REPEATS = 3
+
+def best_of(func, repeats):
+    """Fastest of repeats calls to func(), and all the timings."""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times), times
+
+def make_book(paths, module):
+    book = Book()
+    for path in paths:
+        doc = Document(path, os.path.basename(path), 'pdf')
+        doc.status = 'success'
+        doc.page_count = module.get_pdf_page_count(path)
+        book.add_document(doc)
+    return book
+
+def ingest(process, work_dir, module):
+    """A run of process(blob_store, inspect) against a fresh blob store."""
+    def run():
+        store_dir = tempfile.mkdtemp(dir=work_dir)
+        try:
+            documents = process(BlobStore(store_dir),
+                                lambda doc, path: setattr(doc, 'page_count', module.get_pdf_page_count(path)))
+            assert all(doc.page_count for doc in documents)
+        finally:
+            shutil.rmtree(store_dir, ignore_errors=True)
+    return run
+
+def run_backend(backend, corpus, work_dir, repeats):
+    """Time every benchmark for one backend; yields (name, best, times)."""
+    module = importlib.import_module(backend)
+    paths, zip_path, tree = corpus
+    translations = PDF_TRANSLATIONS['en']
+    module.warm_up_front_matter([translations])
+    book = make_book(paths, module)
+    cover, index, receipt = (os.path.join(work_dir, f"{name}.pdf") for name in ('cover', 'index', 'receipt'))
+
+    def process_zip(blob_store, inspect):
+        return process_zip_file(zip_path, blob_store, inspect)
+
+    def process_tree(blob_store, inspect):
+        documents = process_folder(tree, blob_store)
+        for doc in documents:
+            inspect(doc, os.path.join(blob_store.root, doc.filename))
+        return documents
+
+    benchmarks = [
+        ('get_pdf_page_count', lambda: [module.get_pdf_page_count(path) for path in paths]),
+        ('process_zip_file', ingest(process_zip, work_dir, module)),
+        ('process_folder', ingest(process_tree, work_dir, module)),
+        ('create_cover_page', lambda: module.create_cover_page(cover, book.title, translations)),
+        ('create_index_page', lambda: module.create_index_page(index, book.documents, translations)),
+        ('create_receipt_page', lambda: module.create_receipt_page(receipt, book, translations)),
+        ('render_front_matter', lambda: module.render_front_matter(book, translations, cover, index, receipt)),
+    ]
+    for name, func in benchmarks:
+        yield (name,) + best_of(func, repeats)
+
+    manifest = ([ManifestEntry(cover, None, 'cover'), ManifestEntry(index, None, 'index')]
+                + [ManifestEntry(path, None, os.path.basename(path)) for path in paths]
+                + [ManifestEntry(receipt, None, 'receipt')])
+    output_path = os.path.join(work_dir, 'book.pdf')
+    yield ('merge_pdfs',) + best_of(lambda: module.merge_pdfs(manifest, output_path), repeats)
+    yield ('merge_pdfs_streaming',) + best_of(
+        lambda: module.merge_pdfs(manifest, output_path, streaming=True), repeats)
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(previous_path, results):
+    """Print the change from an earlier results file, matched by backend, benchmark and size."""
+    with open(previous_path) as f:
+        previous = {(r['backend'], r['benchmark'], r['documents']): r['seconds']
+                    for r in json.load(f)['results']}
+    print(f"\nCompared with {previous_path}")
+    print(f"{'backend':<22} {'benchmark':<22} {'documents':>9} {'before':>9} {'after':>9} {'change':>8}")
+    for r in results:
+        before = previous.get((r['backend'], r['benchmark'], r['documents']))
+        if before is None:
+            continue
+        print(f"{r['backend']:<22} {r['benchmark']:<22} {r['documents']:>9} "
+              f"{before:>9.3f} {r['seconds']:>9.3f} {(r['seconds'] - before) / before:>+8.1%}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default=','.join(map(str, DOCUMENT_COUNTS)),
+                        help="comma-separated document counts")
+    parser.add_argument('--backends', default=','.join(BACKENDS))
+    parser.add_argument('--repeats', type=int, default=REPEATS)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=f"benchmark_results_{datetime.now():%Y%m%d_%H%M%S}.json")
+    parser.add_argument('--compare', help="earlier results file to compare against")
+    args = parser.parse_args(argv)
+    # PyPDF2 warns about every broken xref it repairs
+    logging.getLogger('PyPDF2').setLevel(logging.ERROR)
+
+    results = []
+    temp_dir = tempfile.mkdtemp()
+    try:
+        print(f"{'backend':<22} {'benchmark':<22} {'documents':>9} {'seconds':>9}")
+        for count in map(int, args.sizes.split(',')):
+            corpus_dir = os.path.join(temp_dir, f"corpus_{count}")
+            paths = make_corpus(os.path.join(corpus_dir, 'pdfs'), count, CORPUS_SPEC, random.Random(args.seed))
+            corpus = (paths, make_zip(paths, os.path.join(corpus_dir, 'corpus.zip')),
+                      make_folder_tree(paths, os.path.join(corpus_dir, 'tree')))
+            for backend in args.backends.split(','):
+                work_dir = tempfile.mkdtemp(dir=temp_dir)
+                for name, best, times in run_backend(backend, corpus, work_dir, args.repeats):
+                    results.append({'backend': backend, 'benchmark': name, 'documents': count,
+                                    'seconds': best, 'runs': times})
+                    print(f"{backend:<22} {name:<22} {count:>9} {best:>9.3f}")
+                shutil.rmtree(work_dir, ignore_errors=True)
+            shutil.rmtree(corpus_dir, ignore_errors=True)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'repeats': args.repeats,
+            'seed': args.seed,
+            'corpus': CORPUS_SPEC.to_dict(),
+            'results': results,
+        }, f, indent=2)
+    print(f"Wrote {len(results)} results to {args.output}")
+    if args.compare:
+        compare(args.compare, results)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,60 +1,196 @@
 import os
+import re
 import tempfile
 import shutil
-import importlib
 import json
-from flask import Blueprint, request, render_template, redirect, url_for, flash, current_app, send_file, session, jsonify
-import PyPDF2
+import time
+import secrets
+import functools
+from contextlib import contextmanager
+from flask import Blueprint, request, render_template, redirect, url_for, flash, current_app, send_file, session, jsonify, Response, stream_with_context, after_this_request
 from werkzeug.utils import secure_filename
+from werkzeug.wsgi import ClosingIterator
 from models.document import Document
-from models.book import Book
 from utils.zip_utils import process_zip_file
 from utils.folder_utils import process_folder
-import getpass  # Add this to get the username
-from datetime import datetime  # Add this for timestamp
+from utils.merge_utils import get_parse_counts
+from utils.blob_store import get_blob_store
+from utils.pdf_cache import get_metadata_cache
+from utils.pdf_normalize import check_pdf_header, inspect_upload, get_normalization_cache
+from utils.book_builder import build_book, stream_book
+from utils.book_cache import get_book_cache, book_cache_key
+from utils.job_queue import get_job_queue
+from utils.batch_utils import BatchInspector, error_metadata
+from utils.document_registry import get_document_registry
+from utils.metrics import render_metrics, record_upload, record_send
+from utils.profiler import ProfileStore, profile_call
+from utils.log_tail import RecordFilter, LogFollower, tail_records
+from utils.pdf_backends import get_backend
 
 document_blueprint = Blueprint('document', __name__, template_folder='../views/templates')
 
 ALLOWED_EXTENSIONS = {'pdf', 'zip'}
 
+# Generation progress stream timing
+PROGRESS_INTERVAL_SECONDS = 0.25
+PROGRESS_HEARTBEAT_SECONDS = 15
+
+# /logs entries returned by default and at most, and how often /logs/stream polls
+LOG_TAIL_LINES = 100
+LOG_TAIL_MAX_LINES = 10000
+LOG_FOLLOW_INTERVAL_SECONDS = 0.5
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def init_session():
-    if 'documents' not in session:
-        session['documents'] = []
-    if 'document_count' not in session:
-        session['document_count'] = 0
-
-def save_document_to_session(doc):
-    """Save document to session storage"""
-    init_session()
-    # Convert document object to dict for session storage
-    doc_dict = doc.to_dict()
-    session['documents'].append(doc_dict)
-    session['document_count'] += 1
-    session.modified = True
-    return doc_dict
+def get_session_key():
+    """Opaque key tying this session to its rows in the document registry"""
+    if 'registry_key' not in session:
+        session['registry_key'] = secrets.token_urlsafe(24)
+    return session['registry_key']
+
+def get_registry():
+    """Return the server-side document registry"""
+    return get_document_registry(current_app.config['DOCUMENT_REGISTRY_PATH'])
+
+def save_documents_to_session(docs):
+    """Append documents to this session's list; returns their dicts"""
+    get_registry().add(get_session_key(), docs)
+    return [doc.to_dict() for doc in docs]
 
 def get_documents_from_session():
-    """Get list of documents from session storage"""
-    init_session()
-    docs = []
-    for doc_dict in session.get('documents', []):
-        # Convert back to Document object
-        doc = Document.from_dict(doc_dict)
-        docs.append(doc)
-    return docs
+    """Get this session's documents in order"""
+    return get_registry().list(get_session_key())
+
+def release_document_file(doc):
+    """Drop a document's reference to its stored file"""
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    if doc.content_hash:
+        get_blob_store(upload_folder).release(doc.content_hash)
+    else:
+        # Documents uploaded before the blob store own their file outright
+        file_path = os.path.join(upload_folder, doc.filename)
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+def get_pdf_backend():
+    """Return the configured PDF backend"""
+    return get_backend(current_app.config['PDF_UTIL_MODULE'])
+
+def get_pdf_metadata_cache():
+    """Return the persistent PDF metadata cache"""
+    return get_metadata_cache(
+        current_app.config['METADATA_CACHE_PATH'],
+        current_app.config['METADATA_CACHE_MAX_ENTRIES']
+    )
+
+def get_upload_normalization_cache():
+    """Return the record of normalized uploads"""
+    return get_normalization_cache(current_app.config['NORMALIZATION_CACHE_PATH'])
+
+def store_normalized_upload(doc, blob_store, outcome):
+    """Record what an inspection worker found for an upload; returns the path to read.
+
+    A normalized copy is stored as a blob and replaces the upload.
+    """
+    logger = current_app.config['LOGGER']
+    normalized_hash = doc.content_hash
+    if outcome['normalized_path'] is not None:
+        try:
+            # The new blob's reference becomes the document's
+            normalized_hash, _, _ = blob_store.store_file(outcome['normalized_path'])
+        finally:
+            os.remove(outcome['normalized_path'])
+    reason, seconds = outcome['reason'], outcome['seconds']
+    get_upload_normalization_cache().put(doc.content_hash, normalized_hash, reason, seconds,
+                                         doc.original_filename)
+    if reason is not None:
+        logger.info("Normalized %s (%s) in %.2fs", doc.original_filename, reason, seconds)
+    if seconds >= current_app.config['NORMALIZE_SLOW_SECONDS']:
+        logger.warning("Slow normalization of %s: %.2fs", doc.original_filename, seconds)
+    apply_normalization(doc, blob_store, {'normalized_hash': normalized_hash, 'reason': reason})
+    return os.path.join(blob_store.root, doc.filename)
+
+def apply_normalization(doc, blob_store, outcome):
+    """Point a document at the blob its normalization outcome names"""
+    if outcome['normalized_hash'] != doc.content_hash:
+        blob_store.release(doc.content_hash)
+        doc.content_hash = outcome['normalized_hash']
+        doc.filename = blob_store.relative_path(doc.content_hash)
+    doc.normalized = outcome['reason']
+
+def normalize_document(doc, blob_store):
+    """Point a stored upload at its repaired, decrypted copy if the outcome is known.
+
+    Encrypted files and files with broken xref tables are rewritten once
+    at upload, so generation never goes down PyPDF2's repair paths. The
+    inspection workers do the checking (inspect_upload) and the outcome is
+    cached by content hash. Returns False when the upload has not been
+    checked yet.
+    """
+    outcome = get_upload_normalization_cache().get(doc.content_hash)
+    if outcome is not None and outcome['normalized_hash'] != doc.content_hash \
+            and not blob_store.acquire(outcome['normalized_hash']):
+        # The normalized copy was released since; make it again
+        outcome = None
+    if outcome is None:
+        return False
+    apply_normalization(doc, blob_store, outcome)
+    return True
+
+def submit_upload(inspector, doc, blob_store):
+    """Queue a stored upload for inspection, normalizing it first if it has not been checked"""
+    pdf_path = blob_store.path_for(doc.content_hash)
+    error = check_pdf_header(pdf_path)
+    if error is not None:
+        doc.apply_metadata(error_metadata(error), pdf_path)
+    elif normalize_document(doc, blob_store):
+        inspector.submit(doc, os.path.join(blob_store.root, doc.filename))
+    else:
+        inspector.submit(doc, pdf_path, normalize=True)
+
+def get_assembled_book_cache(config):
+    """Return the cache of merged book bodies, or None when it is disabled"""
+    if not config['BOOK_CACHE_MAX_BYTES']:
+        return None
+    return get_book_cache(config['BOOK_CACHE_FOLDER'], config['BOOK_CACHE_MAX_BYTES'])
+
+@contextmanager
+def upload_inspector(get_pdf_metadata, blob_store):
+    """Inspector that normalizes and page-counts one request's uploads.
+
+    Batches run on a process pool. Normalized copies are written to a
+    scratch folder that is removed afterwards.
+    """
+    scratch_folder = current_app.config['SCRATCH_FOLDER']
+    if scratch_folder:
+        os.makedirs(scratch_folder, exist_ok=True)
+    work_folder = tempfile.mkdtemp(dir=scratch_folder)
+    inspector = BatchInspector(
+        get_pdf_metadata,
+        get_pdf_metadata_cache(),
+        current_app.config['INSPECT_WORKERS'],
+        current_app.config['INSPECT_TIMEOUT_SECONDS'],
+        normalizer=functools.partial(inspect_upload, scratch_folder=work_folder,
+                                     get_pdf_metadata=get_pdf_metadata),
+        store_normalized=lambda doc, outcome: store_normalized_upload(doc, blob_store, outcome)
+    )
+    try:
+        yield inspector
+    finally:
+        inspector.close()
+        shutil.rmtree(work_folder, ignore_errors=True)
 
 def clear_session_documents():
     """Clear documents from session"""
-    session['documents'] = []
-    session['document_count'] = 0
-    session.modified = True
+    for doc in get_registry().clear(get_session_key()):
+        try:
+            release_document_file(doc)
+        except Exception:
+            pass  # Ignore errors releasing files
 
 @document_blueprint.route('/', methods=['GET'])
 def index():
-    init_session()
     documents = get_documents_from_session()
     return render_template('index.html', documents=documents)
 
@@ -71,25 +207,66 @@ def clear_documents():
 @document_blueprint.route('/documents/reorder', methods=['POST'])
 def reorder_documents():
     new_order = request.json.get('order', [])
-    documents = session.get('documents', [])
-    
-    # Create a new list with reordered documents
-    reordered_docs = []
-    for doc_id in new_order:
-        for doc in documents:
-            if doc['id'] == doc_id:
-                reordered_docs.append(doc)
-                break
-    
-    session['documents'] = reordered_docs
-    session.modified = True
+    get_registry().reorder(get_session_key(), new_order)
+    return jsonify({'status': 'success'})
+
+@document_blueprint.route('/documents/move', methods=['POST'])
+def move_document():
+    """Move one document in front of another (or to the end when before is null)"""
+    document_id = request.json.get('id')
+    before_id = request.json.get('before')
+    if not get_registry().move(get_session_key(), document_id, before_id):
+        return jsonify({'status': 'error', 'message': 'Document not found'}), 404
     return jsonify({'status': 'success'})
 
+@document_blueprint.route('/documents/parse-counts', methods=['GET'])
+def get_document_parse_counts():
+    """Report how many times each uploaded file has been parsed"""
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    documents = get_documents_from_session()
+    paths = [os.path.join(upload_folder, doc.filename) for doc in documents]
+    counts = get_parse_counts(paths)
+    return jsonify([{
+        'id': doc.id,
+        'original_filename': doc.original_filename,
+        'parse_count': counts[path]
+    } for doc, path in zip(documents, paths)])
+
+@document_blueprint.route('/stats/metadata-cache', methods=['GET'])
+def get_metadata_cache_stats():
+    """Report hit/miss counters of the PDF metadata cache"""
+    return jsonify(get_pdf_metadata_cache().stats())
+
+@document_blueprint.route('/stats/normalization', methods=['GET'])
+def get_normalization_stats():
+    """List uploads that needed normalizing or were slow to check, slowest first"""
+    return jsonify(get_upload_normalization_cache().slow(current_app.config['NORMALIZE_SLOW_SECONDS']))
+
+@document_blueprint.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Generation stage, per-document and upload metrics for Prometheus"""
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+@document_blueprint.route('/stats/book-cache', methods=['GET'])
+def get_book_cache_stats():
+    """Report hit/miss counters and disk usage of the assembled-book cache"""
+    book_cache = get_assembled_book_cache(current_app.config)
+    if book_cache is None:
+        return jsonify({'enabled': False})
+    return jsonify(dict(book_cache.stats(), enabled=True))
+
 @document_blueprint.route('/upload', methods=['POST'])
 def upload_file():
-    # Dynamically import the configured PDF utility module
-    pdf_utils_module = importlib.import_module(current_app.config['PDF_UTIL_MODULE'])
-    get_pdf_page_count = pdf_utils_module.get_pdf_page_count
+    started = time.perf_counter()
+    
+    @after_this_request
+    def count_upload(response):
+        record_upload(request.content_length or 0, time.perf_counter() - started, response.status_code)
+        return response
+    
+    # The configured PDF backend, imported on first use
+    pdf_utils_module = get_pdf_backend()
+    get_pdf_metadata = pdf_utils_module.get_pdf_metadata
     
     if 'file' not in request.files and 'folder' not in request.files:
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
@@ -98,6 +275,7 @@ def upload_file():
         return redirect(url_for('document.index'))
     
     upload_folder = current_app.config['UPLOAD_FOLDER']
+    blob_store = get_blob_store(upload_folder)
     
     # Process uploaded file or folder
     if 'file' in request.files:
@@ -110,40 +288,34 @@ def upload_file():
             
             if file and allowed_file(file.filename):
                 filename = secure_filename(file.filename)
-                file_path = os.path.join(upload_folder, filename)
-                file.save(file_path)
                 
                 # Process based on file type
                 if filename.lower().endswith('.pdf'):
+                    # Store by content hash, hashing while the upload streams in
+                    content_hash, stored_name, _ = blob_store.store_stream(file.stream)
+                    
                     # Create document object
-                    doc = Document(filename=filename, original_filename=file.filename, file_type='pdf')
-                    try:
-                        doc.page_count = get_pdf_page_count(file_path)
-                        doc.status = "success"
-                    except Exception as e:
-                        doc.status = "error"
-                        doc.errors.append(str(e))
+                    doc = Document(filename=stored_name, original_filename=file.filename,
+                                   file_type='pdf', content_hash=content_hash)
+                    with upload_inspector(get_pdf_metadata, blob_store) as inspector:
+                        submit_upload(inspector, doc, blob_store)
+                        inspector.finish()
                     
                     # Save to session
-                    doc_dict = save_document_to_session(doc)
-                    uploaded_docs.append(doc_dict)
+                    uploaded_docs.extend(save_documents_to_session([doc]))
                     
                 elif filename.lower().endswith('.zip'):
-                    # Process ZIP file
+                    # Process ZIP file straight from the upload stream; PDF
+                    # members are hashed as they are stored and page-counted
+                    # in parallel while the rest of the archive is read
                     try:
-                        documents = process_zip_file(file_path, upload_folder)
-                        for doc in documents:
-                            try:
-                                pdf_path = os.path.join(upload_folder, doc.filename)
-                                doc.page_count = get_pdf_page_count(pdf_path)
-                                doc.status = "success"
-                            except Exception as e:
-                                doc.status = "error"
-                                doc.errors.append(str(e))
-                            
-                            # Save to session
-                            doc_dict = save_document_to_session(doc)
-                            uploaded_docs.append(doc_dict)
+                        with upload_inspector(get_pdf_metadata, blob_store) as inspector:
+                            documents = process_zip_file(
+                                file.stream, blob_store,
+                                inspect=lambda doc, path: submit_upload(inspector, doc, blob_store))
+                            inspector.finish()
+                        # Save to session
+                        uploaded_docs.extend(save_documents_to_session(documents))
                     except Exception as e:
                         error_msg = f"Error processing ZIP file: {str(e)}"
                         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
@@ -162,7 +334,10 @@ def upload_file():
     # Process uploaded folder (if supported by the browser)
     elif 'folder' in request.files:
         folder = request.files.getlist('folder')
-        temp_folder = tempfile.mkdtemp()
+        scratch_folder = current_app.config['SCRATCH_FOLDER']
+        if scratch_folder:
+            os.makedirs(scratch_folder, exist_ok=True)
+        temp_folder = tempfile.mkdtemp(dir=scratch_folder)
         uploaded_docs = []
         
         try:
@@ -180,19 +355,16 @@ def upload_file():
                 file.save(file_path)
             
             # Process the folder
-            documents = process_folder(temp_folder, upload_folder)
-            for doc in documents:
-                try:
-                    pdf_path = os.path.join(upload_folder, doc.filename)
-                    doc.page_count = get_pdf_page_count(pdf_path)
-                    doc.status = "success"
-                except Exception as e:
-                    doc.status = "error"
-                    doc.errors.append(str(e))
-                
-                # Save to session
-                doc_dict = save_document_to_session(doc)
-                uploaded_docs.append(doc_dict)
+            documents = process_folder(temp_folder, blob_store)
+            
+            # Normalize, page-count and validate the batch in parallel
+            with upload_inspector(get_pdf_metadata, blob_store) as inspector:
+                for doc in documents:
+                    submit_upload(inspector, doc, blob_store)
+                inspector.finish()
+            
+            # Save to session
+            uploaded_docs.extend(save_documents_to_session(documents))
                 
         finally:
             # Clean up temp folder
@@ -257,26 +429,90 @@ PDF_TRANSLATIONS = {
     }
 }
 
+def get_generation_language():
+    """Language requested for the generated book, defaulting to English"""
+    language = request.args.get('language', 'en')
+    if language not in PDF_TRANSLATIONS:
+        language = 'en'
+    return language
+
+def request_flag(name, default):
+    """Read an on/off query parameter such as ?dedup=1; default when it is absent"""
+    if name not in request.args:
+        return default
+    return request.args[name].lower() in ('1', 'true', 'yes')
+
+def timed_send(response):
+    """Record the send stage once the server has finished sending a book"""
+    started = time.perf_counter()
+    # send_file bodies bypass call_on_close, so wrap the body itself
+    response.response = ClosingIterator(response.response,
+                                        lambda: record_send(time.perf_counter() - started))
+    return response
+
+# Merge report fields sent back as headers by /generate
+MERGE_REPORT_HEADERS = {
+    'streams_shared': 'X-Streams-Shared',
+    'bytes_saved': 'X-Bytes-Saved',
+    'objects_packed': 'X-Objects-Packed',
+    'streams_compressed': 'X-Streams-Compressed',
+    'compression_bytes_saved': 'X-Compression-Bytes-Saved',
+    'packing_bytes_saved': 'X-Packing-Bytes-Saved',
+    'output_bytes': 'X-Merge-Output-Bytes',
+    'uncompacted_bytes': 'X-Merge-Uncompacted-Bytes',
+    'merge_seconds': 'X-Merge-Seconds'
+}
+
+def run_book_generation(documents, language, pdf_utils_module, config, progress=None, dedup=False,
+                        compact=None, linearize=False):
+    """Build a book outside the request; returns the finished output fields"""
+    logger = config['LOGGER']
+    metadata_cache = get_metadata_cache(
+        config['METADATA_CACHE_PATH'],
+        config['METADATA_CACHE_MAX_ENTRIES']
+    )
+    # Identical documents, order, language and backend reuse the merged body
+    book_cache = get_assembled_book_cache(config)
+    cache_key = book_cache_key(documents, language, pdf_utils_module.name, dedup, compact,
+                               linearize)
+    book = build_book(
+        documents,
+        PDF_TRANSLATIONS[language],
+        pdf_utils_module,
+        config['UPLOAD_FOLDER'],
+        config['OUTPUT_FOLDER'],
+        metadata_cache,
+        logger,
+        progress=progress,
+        book_cache=book_cache,
+        cache_key=cache_key,
+        scratch_folder=config['SCRATCH_FOLDER'],
+        streaming_merge_min_bytes=config['STREAMING_MERGE_MIN_BYTES'],
+        dedup=dedup,
+        compact=compact,
+        compact_min_bytes=config['COMPACT_OUTPUT_MIN_BYTES'],
+        linearize=linearize,
+        slow_seconds=config['GENERATION_SLOW_SECONDS']
+    )
+    return {
+        'output_path': book.output_path,
+        'output_filename': os.path.basename(book.output_path),
+        'merge_report': book.merge_report
+    }
+
 @document_blueprint.route('/generate', methods=['POST'])
 def generate_pdf():
     logger = current_app.config['LOGGER']
     logger.info("Starting Book of Documents generation")
     
     # Get the selected language from request or default to English
-    language = request.args.get('language', 'en')
-    if language not in PDF_TRANSLATIONS:
-        language = 'en'
+    language = get_generation_language()
     
-    logger.info(f"Generating Book of Documents in language: {language}")
+    logger.info("Generating Book of Documents in language: %s", language)
     
-    # Dynamically import the configured PDF utility module
+    # The configured PDF backend, imported on first use
     try:
-        pdf_utils_module = importlib.import_module(current_app.config['PDF_UTIL_MODULE'])
-        create_cover_page = pdf_utils_module.create_cover_page
-        create_index_page = pdf_utils_module.create_index_page
-        create_receipt_page = pdf_utils_module.create_receipt_page
-        merge_pdfs = pdf_utils_module.merge_pdfs
-        Document_PDF = pdf_utils_module.Document  # Get the Document class from the PDF module
+        pdf_utils_module = get_pdf_backend()
     except ImportError as e:
         error_msg = f"Failed to import PDF utilities: {str(e)}"
         logger.error(error_msg)
@@ -285,22 +521,12 @@ def generate_pdf():
         flash(error_msg)
         return redirect(url_for('document.index'))
     
-    upload_folder = current_app.config['UPLOAD_FOLDER']
-    output_folder = current_app.config['OUTPUT_FOLDER']
-    
     # Get documents from session
     documents = get_documents_from_session()
-    logger.info(f"Retrieved {len(documents)} documents from session")
-    
-    # Create a new Book instance
-    book = Book()
-    
-    # Add all documents to the book
-    for doc in documents:
-        book.add_document(doc)
+    logger.info("Retrieved %d documents from session", len(documents))
     
     # If no documents were processed successfully, return error
-    if all(doc.status == "error" for doc in book.documents) or not book.documents:
+    if all(doc.status == "error" for doc in documents) or not documents:
         error_msg = "No valid PDF documents were found."
         logger.error(error_msg)
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
@@ -310,98 +536,22 @@ def generate_pdf():
     
     # Create the Book of Documents
     try:
-        # Generate temporary files for cover, index, and receipt
-        temp_dir = tempfile.mkdtemp()
-        logger.info(f"Created temporary directory: {temp_dir}")
-        
-        cover_path = os.path.join(temp_dir, 'cover.pdf')
-        index_path = os.path.join(temp_dir, 'index.pdf')
-        receipt_path = os.path.join(temp_dir, 'receipt.pdf')
-        
-        # Pass translations to PDF generation functions
-        translations = PDF_TRANSLATIONS[language]
-        
-        logger.info("Creating cover page...")
-        create_cover_page(cover_path, translations["book_title"])
-        
-        logger.info("Creating index page...")
-        index_result = create_index_page(index_path, book.documents, translations)
-        
-        # Handle both return formats (path or tuple with links)
-        if isinstance(index_result, tuple):
-            index_path, document_links = index_result
-        
-        logger.info("Creating receipt page...")
-        create_receipt_page(receipt_path, book, translations)
-        
-        # Prepare list of PDFs to merge
-        pdfs_to_merge = [cover_path, index_path]
-        
-        # Add document PDFs in the order they appear in the session
-        success_count = 0
-        for doc in documents:
-            if doc.status == "success":
-                pdf_path = os.path.join(upload_folder, doc.filename)
-                # Verify the file exists before trying to merge
-                if not os.path.exists(pdf_path):
-                    logger.error(f"Document file not found: {pdf_path}")
-                    continue
-                pdfs_to_merge.append(pdf_path)
-                success_count += 1
-        
-        logger.info(f"Found {success_count} successful documents to merge")
-        
-        # Add receipt at the end
-        pdfs_to_merge.append(receipt_path)
-        
-        # Verify each PDF file to be merged exists and is valid
-        valid_pdfs = []
-        for pdf_path in pdfs_to_merge:
-            try:
-                with open(pdf_path, 'rb') as f:
-                    reader = PyPDF2.PdfReader(f)
-                    if len(reader.pages) > 0:
-                        valid_pdfs.append(pdf_path)
-                    else:
-                        logger.error(f"PDF has 0 pages: {pdf_path}")
-            except Exception as e:
-                logger.error(f"Invalid PDF file {pdf_path}: {str(e)}")
-        
-        if len(valid_pdfs) < 3:  # At minimum need cover, index, receipt
-            raise ValueError("Not enough valid PDF components to create the book")
-        
-        # Get current username and format timestamp for filename
-        username = getpass.getuser()
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        
-        # Create filename with username and timestamp instead of GUID
-        output_filename = f"book_of_documents_{username}_{timestamp}.pdf"
-        output_path = os.path.join(output_folder, output_filename)
-        logger.info(f"Merging {len(valid_pdfs)} PDFs to: {output_path}")
-        merge_pdfs(valid_pdfs, output_path)
-        
-        book.output_path = output_path
-        
-        # Verify the output file was created successfully
-        if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
-            raise FileNotFoundError("Generated PDF file is missing or empty")
-        
-        # Cleanup temporary files
-        try:
-            shutil.rmtree(temp_dir, ignore_errors=True)
-            logger.info(f"Cleaned up temporary directory: {temp_dir}")
-        except Exception as cleanup_error:
-            logger.warning(f"Error cleaning up temp dir: {str(cleanup_error)}")
-        
-        logger.info(f"Successfully generated Book of Documents: {output_path}")
+        result = run_book_generation(documents, language, pdf_utils_module, current_app.config,
+                                     dedup=request_flag('dedup', current_app.config['DEDUP_STREAMS']),
+                                     compact=request_flag('compact', None),
+                                     linearize=request_flag('linearize', current_app.config['LINEARIZE_OUTPUT']))
         
         # Return the compiled PDF
-        return send_file(
-            output_path,
+        response = send_file(
+            result['output_path'],
             as_attachment=True,
-            download_name=output_filename,
+            download_name=result['output_filename'],
             mimetype='application/pdf'
         )
+        for field, header in MERGE_REPORT_HEADERS.items():
+            if field in result['merge_report']:
+                response.headers[header] = str(result['merge_report'][field])
+        return timed_send(response)
         
     except Exception as e:
         # Get detailed error information
@@ -412,13 +562,6 @@ def generate_pdf():
         # Log the error with all details
         logger.error(error_message)
         
-        # Try to clean up temp dir if it exists
-        try:
-            if 'temp_dir' in locals() and temp_dir:
-                shutil.rmtree(temp_dir, ignore_errors=True)
-        except:
-            pass  # Ignore cleanup errors
-        
         # Return appropriate error response
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             return jsonify({
@@ -430,27 +573,185 @@ def generate_pdf():
         flash(error_message)
         return redirect(url_for('document.index'))
 
+@document_blueprint.route('/generate/stream', methods=['POST'])
+def stream_generated_pdf():
+    """Generate the book and stream it to the client while it is written"""
+    logger = current_app.config['LOGGER']
+    language = get_generation_language()
+    logger.info("Streaming Book of Documents generation in language: %s", language)
+    
+    try:
+        pdf_utils_module = get_pdf_backend()
+    except ImportError as e:
+        error_msg = f"Failed to import PDF utilities: {str(e)}"
+        logger.error(error_msg)
+        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+            return jsonify({'status': 'error', 'message': error_msg}), 500
+        flash(error_msg)
+        return redirect(url_for('document.index'))
+    
+    documents = get_documents_from_session()
+    if all(doc.status == "error" for doc in documents) or not documents:
+        error_msg = "No valid PDF documents were found."
+        logger.error(error_msg)
+        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+            return jsonify({'status': 'error', 'message': error_msg}), 400
+        flash(error_msg)
+        return redirect(url_for('document.index'))
+    
+    # Keeping the on-disk copy is optional
+    save_copy = request_flag('save_copy', current_app.config['STREAM_SAVE_COPY'])
+    
+    try:
+        # Front matter is rendered here so its errors still get a proper response
+        book, output_filename, chunks = stream_book(
+            documents,
+            PDF_TRANSLATIONS[language],
+            pdf_utils_module,
+            current_app.config['UPLOAD_FOLDER'],
+            current_app.config['OUTPUT_FOLDER'],
+            get_pdf_metadata_cache(),
+            logger,
+            save_copy=save_copy,
+            dedup=request_flag('dedup', current_app.config['DEDUP_STREAMS']),
+            compact=request_flag('compact', False),
+            slow_seconds=current_app.config['GENERATION_SLOW_SECONDS']
+        )
+    except Exception as e:
+        import traceback
+        error_traceback = traceback.format_exc()
+        logger.error("Error creating Book of Documents: %s\n\nDetails:\n%s", e, error_traceback)
+        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+            return jsonify({
+                'status': 'error',
+                'message': str(e),
+                'details': error_traceback.split('\n')[-3:]
+            }), 500
+        flash(f"Error creating Book of Documents: {str(e)}")
+        return redirect(url_for('document.index'))
+    
+    # No Content-Length: the body is sent chunked as each document is merged
+    return Response(
+        stream_with_context(chunks),
+        mimetype='application/pdf',
+        headers={
+            'Content-Disposition': f'attachment; filename={output_filename}',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+def get_session_job(job_id):
+    """Look up a generation job started from this session"""
+    if job_id not in session.get('generation_jobs', []):
+        return None
+    return get_job_queue(current_app.config['GENERATION_WORKERS']).get(job_id)
+
+@document_blueprint.route('/generate/jobs', methods=['POST'])
+def submit_generation_job():
+    """Queue a book generation and return its job ID immediately"""
+    logger = current_app.config['LOGGER']
+    language = get_generation_language()
+    
+    try:
+        pdf_utils_module = get_pdf_backend()
+    except ImportError as e:
+        error_msg = f"Failed to import PDF utilities: {str(e)}"
+        logger.error(error_msg)
+        return jsonify({'status': 'error', 'message': error_msg}), 500
+    
+    documents = get_documents_from_session()
+    if all(doc.status == "error" for doc in documents) or not documents:
+        error_msg = "No valid PDF documents were found."
+        logger.error(error_msg)
+        return jsonify({'status': 'error', 'message': error_msg}), 400
+    
+    queue = get_job_queue(current_app.config['GENERATION_WORKERS'])
+    job = queue.submit(
+        run_book_generation,
+        documents,
+        language,
+        pdf_utils_module,
+        current_app.config.copy(),
+        dedup=request_flag('dedup', current_app.config['DEDUP_STREAMS']),
+        compact=request_flag('compact', None),
+        linearize=request_flag('linearize', current_app.config['LINEARIZE_OUTPUT'])
+    )
+    
+    # Only the submitting session may read or download the job
+    session['generation_jobs'] = session.get('generation_jobs', [])[-19:] + [job.id]
+    session.modified = True
+    logger.info("Queued Book of Documents generation job %s in language: %s", job.id, language)
+    
+    return jsonify({
+        'status': 'queued',
+        'job_id': job.id,
+        'status_url': url_for('document.get_generation_job', job_id=job.id),
+        'progress_url': url_for('document.stream_generation_progress', job_id=job.id),
+        'download_url': url_for('document.download_generation_job', job_id=job.id)
+    }), 202
+
+@document_blueprint.route('/generate/jobs/<job_id>', methods=['GET'])
+def get_generation_job(job_id):
+    """Current state of a generation job"""
+    job = get_session_job(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+@document_blueprint.route('/generate/jobs/<job_id>/progress', methods=['GET'])
+def stream_generation_progress(job_id):
+    """Stream stage-level progress of a generation job as Server-Sent Events"""
+    job = get_session_job(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': 'Job not found'}), 404
+    
+    def events():
+        version = None
+        while True:
+            version = job.wait_for_change(version, timeout=PROGRESS_HEARTBEAT_SECONDS)
+            state = job.to_dict()
+            yield f"data: {json.dumps(state)}\n\n"
+            if job.finished:
+                break
+            # Coalesce bursts of byte-count updates
+            time.sleep(PROGRESS_INTERVAL_SECONDS)
+    
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@document_blueprint.route('/generate/jobs/<job_id>/download', methods=['GET'])
+def download_generation_job(job_id):
+    """Serve the finished book of a generation job"""
+    job = get_session_job(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': 'Job not found'}), 404
+    if job.status == 'error':
+        return jsonify({'status': 'error', 'message': job.error, 'details': job.details}), 500
+    if job.status != 'done':
+        return jsonify({'status': job.status, 'message': 'Book is not ready yet'}), 409
+    # ?inline=1 opens the book in the browser's viewer; byte-range requests
+    # let it show a linearized book before the download completes
+    response = send_file(
+        job.output_path,
+        as_attachment=not request_flag('inline', False),
+        download_name=job.output_filename,
+        mimetype='application/pdf',
+        conditional=True
+    )
+    return timed_send(response)
+
 @document_blueprint.route('/documents/<document_id>', methods=['DELETE'])
 def delete_document(document_id):
-    documents = session.get('documents', [])
-    for i, doc in enumerate(documents):
-        if doc['id'] == document_id:
-            # Remove document from session
-            documents.pop(i)
-            session['documents'] = documents
-            session['document_count'] = len(documents)
-            session.modified = True
+    # Remove document from session
+    doc = get_registry().remove(get_session_key(), document_id)
+    if doc is not None:
+        # Release the stored file; it is deleted with its last reference
+        try:
+            release_document_file(doc)
+        except:
+            pass  # Ignore errors deleting file
             
-            # Delete file from upload folder if it exists
-            try:
-                upload_folder = current_app.config['UPLOAD_FOLDER']
-                file_path = os.path.join(upload_folder, doc['filename'])
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-            except:
-                pass  # Ignore errors deleting file
-                
-            return jsonify({'status': 'success'})
+        return jsonify({'status': 'success'})
     
     return jsonify({'status': 'error', 'message': 'Document not found'}), 404
 
@@ -460,41 +761,141 @@ def view_document(document_id):
     logger = current_app.config['LOGGER']
     
     # Find document in session
-    documents = session.get('documents', [])
-    for doc in documents:
-        if doc['id'] == document_id:
-            try:
-                upload_folder = current_app.config['UPLOAD_FOLDER']
-                file_path = os.path.join(upload_folder, doc['filename'])
-                
-                if os.path.exists(file_path):
-                    logger.info(f"Serving document: {doc['original_filename']} from {file_path}")
-                    return send_file(
-                        file_path,
-                        mimetype='application/pdf'
-                    )
-                else:
-                    logger.error(f"Document file not found: {file_path}")
-                    return "Document file not found", 404
-            except Exception as e:
-                logger.error(f"Error serving document {document_id}: {str(e)}")
-                return f"Error serving document: {str(e)}", 500
+    doc = get_registry().get(get_session_key(), document_id)
+    if doc is not None:
+        try:
+            upload_folder = current_app.config['UPLOAD_FOLDER']
+            file_path = os.path.join(upload_folder, doc.filename)
+            
+            if os.path.exists(file_path):
+                logger.info("Serving document: %s from %s", doc.original_filename, file_path)
+                # Byte-range requests let the viewer fetch pages as needed
+                return send_file(
+                    file_path,
+                    mimetype='application/pdf',
+                    conditional=True
+                )
+            else:
+                logger.error("Document file not found: %s", file_path)
+                return "Document file not found", 404
+        except Exception as e:
+            logger.error("Error serving document %s: %s", document_id, e)
+            return f"Error serving document: {str(e)}", 500
     
-    logger.error(f"Document with ID {document_id} not found in session")
+    logger.error("Document with ID %s not found in session", document_id)
     return "Document not found", 404
 
+def get_log_filter():
+    """Record filter from ?level= (that level and above) and ?pattern= (a regex)"""
+    return RecordFilter(request.args.get('level'), request.args.get('pattern'))
+
 @document_blueprint.route('/logs', methods=['GET'])
 def view_logs():
-    """View the most recent log entries"""
+    """View the most recent log entries, optionally filtered.
+
+    ?lines=N sets how many entries (default 100); ?level= and ?pattern=
+    filter them. Only the end of the file is read.
+    """
+    try:
+        record_filter = get_log_filter()
+    except (ValueError, re.error) as e:
+        return f"Invalid log filter: {str(e)}", 400
+    count = min(max(request.args.get('lines', LOG_TAIL_LINES, type=int), 0), LOG_TAIL_MAX_LINES)
     try:
-        log_path = 'logs/application.log'
+        log_path = current_app.config['LOG_FILE']
         if os.path.exists(log_path):
-            with open(log_path, 'r') as f:
-                # Get the last 100 lines (or fewer if file is smaller)
-                lines = f.readlines()
-                last_lines = lines[-100:] if len(lines) > 100 else lines
-                return ''.join(last_lines)
+            return ''.join(record + '\n' for record in tail_records(log_path, count, record_filter))
         else:
             return "No log file found"
     except Exception as e:
         return f"Error reading log file: {str(e)}"
+
+@document_blueprint.route('/logs/stream', methods=['GET'])
+def stream_logs():
+    """Stream new log entries as Server-Sent Events, one event per entry.
+
+    Takes the same ?level= and ?pattern= filters as /logs; ?lines=N first
+    sends the last N entries. The file is followed across rotations.
+    """
+    try:
+        record_filter = get_log_filter()
+    except (ValueError, re.error) as e:
+        return jsonify({'status': 'error', 'message': f"Invalid log filter: {str(e)}"}), 400
+    count = min(max(request.args.get('lines', 0, type=int), 0), LOG_TAIL_MAX_LINES)
+    log_path = current_app.config['LOG_FILE']
+    follower = LogFollower(log_path, record_filter)
+    # Entries up to where following starts, so none is sent twice
+    backlog = tail_records(log_path, count, record_filter, follower.position) \
+        if count and os.path.exists(log_path) else []
+
+    def events():
+        for record in backlog:
+            yield ''.join(f"data: {line}\n" for line in record.split('\n')) + '\n'
+        for record in follower.follow(LOG_FOLLOW_INTERVAL_SECONDS, PROGRESS_HEARTBEAT_SECONDS):
+            if record is None:
+                yield ": keepalive\n\n"
+            else:
+                yield ''.join(f"data: {line}\n" for line in record.split('\n')) + '\n'
+
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# Views that can be profiled in place with PROFILING_ENABLED and an
+# X-Profile: cpu (cProfile) or X-Profile: memory (plus tracemalloc) header
+PROFILED_VIEWS = ('generate_pdf', 'upload_file')
+
+def get_profile_store():
+    """Return the folder of saved request profiles"""
+    return ProfileStore(current_app.config['PROFILE_FOLDER'])
+
+def profiled(view, endpoint):
+    """Wrap a view so requests asking for it are profiled and the profile saved"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        mode = request.headers.get('X-Profile', '').lower()
+        if not mode:
+            return view(*args, **kwargs)
+        response, name = profile_call(
+            get_profile_store(), endpoint,
+            lambda: current_app.make_response(view(*args, **kwargs)),
+            memory=mode == 'memory')
+        current_app.config['LOGGER'].info("Saved profile %s of %s", name, endpoint)
+        response.headers['X-Profile-Name'] = name
+        return response
+    return wrapper
+
+@document_blueprint.record_once
+def install_profiling(state):
+    """Wrap the profiled views when the app enables profiling.
+
+    Runs once the routes above are registered. With profiling off the
+    views are left untouched, so it costs nothing per request.
+    """
+    if not state.app.config.get('PROFILING_ENABLED'):
+        return
+    for view_name in PROFILED_VIEWS:
+        endpoint = f"{document_blueprint.name}.{view_name}"
+        state.app.view_functions[endpoint] = profiled(state.app.view_functions[endpoint], endpoint)
+
+@document_blueprint.route('/profiles', methods=['GET'])
+def list_profiles():
+    """List saved request profiles, newest first"""
+    if not current_app.config['PROFILING_ENABLED']:
+        return jsonify({'status': 'error', 'message': 'Profiling is disabled'}), 404
+    return jsonify([dict(profile,
+                         download_url=url_for('document.download_profile', filename=profile['name'] + '.prof'),
+                         report_url=url_for('document.download_profile', filename=profile['name'] + '.txt'))
+                    for profile in get_profile_store().list()])
+
+@document_blueprint.route('/profiles/<filename>', methods=['GET'])
+def download_profile(filename):
+    """Download a saved profile: NAME.prof for pstats/snakeviz, NAME.txt for the report"""
+    if not current_app.config['PROFILING_ENABLED']:
+        return jsonify({'status': 'error', 'message': 'Profiling is disabled'}), 404
+    path = get_profile_store().path_for(filename)
+    if path is None:
+        return jsonify({'status': 'error', 'message': 'Profile not found'}), 404
+    if filename.endswith('.txt'):
+        return send_file(os.path.abspath(path), mimetype='text/plain')
+    return send_file(os.path.abspath(path), as_attachment=True, download_name=filename,
+                     mimetype='application/octet-stream')
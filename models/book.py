@@ -10,6 +10,7 @@ class Book:
         self.documents = []
         self.total_pages = 0
         self.output_path = ""
+        self.merge_report = {}
         
     def add_document(self, document):
         self.documents.append(document)
@@ -23,5 +24,6 @@ class Book:
             'created_at': self.created_at.isoformat(),
             'documents': [doc.to_dict() for doc in self.documents],
             'total_pages': self.total_pages,
-            'output_path': self.output_path
+            'output_path': self.output_path,
+            'merge_report': self.merge_report
         }
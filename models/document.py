@@ -2,24 +2,60 @@ import os
 import uuid
 
 class Document:
-    def __init__(self, filename, original_filename, file_type):
+    def __init__(self, filename, original_filename, file_type, content_hash=None):
         self.id = str(uuid.uuid4())
         self.filename = filename
+        self.content_hash = content_hash
         self.original_filename = original_filename
         self.file_type = file_type
         self.page_count = 0
         self.status = "pending"
         self.errors = []
+        self.file_size = None
+        self.file_mtime = None
+        self.normalized = None
+    
+    def apply_metadata(self, metadata, pdf_path=None):
+        """Set page count and status from PDF metadata read from pdf_path"""
+        if metadata['valid']:
+            self.page_count = metadata['page_count']
+            self.status = "success"
+        else:
+            self.status = "error"
+            self.errors.append(metadata['error'])
+        if pdf_path is not None:
+            self.stamp_file(pdf_path)
+        return self
+    
+    def stamp_file(self, pdf_path):
+        """Remember the size and mtime of the file that was validated"""
+        stat = os.stat(pdf_path)
+        self.file_size = stat.st_size
+        self.file_mtime = stat.st_mtime_ns
+    
+    def file_unchanged(self, pdf_path):
+        """True if pdf_path still has the size and mtime recorded at validation"""
+        if self.file_size is None:
+            return False
+        try:
+            stat = os.stat(pdf_path)
+        except OSError:
+            return False
+        return stat.st_size == self.file_size and stat.st_mtime_ns == self.file_mtime
     
     def to_dict(self):
         return {
             'id': self.id,
             'filename': self.filename,
+            'content_hash': self.content_hash,
             'original_filename': self.original_filename,
             'file_type': self.file_type,
             'page_count': self.page_count,
             'status': self.status,
-            'errors': self.errors
+            'errors': self.errors,
+            'file_size': self.file_size,
+            'file_mtime': self.file_mtime,
+            'normalized': self.normalized
         }
     
     @classmethod
@@ -28,10 +64,14 @@ class Document:
         doc = cls(
             filename=data.get('filename'),
             original_filename=data.get('original_filename'),
-            file_type=data.get('file_type')
+            file_type=data.get('file_type'),
+            content_hash=data.get('content_hash')
         )
         doc.id = data.get('id')
         doc.page_count = data.get('page_count', 0)
         doc.status = data.get('status', 'pending')
         doc.errors = data.get('errors', [])
+        doc.file_size = data.get('file_size')
+        doc.file_mtime = data.get('file_mtime')
+        doc.normalized = data.get('normalized')
         return doc
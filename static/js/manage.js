@@ -45,7 +45,7 @@ document.addEventListener('DOMContentLoaded', function() {
         // Create a form to submit the action
         const form = document.createElement('form');
         form.method = 'POST';
-        form.action = '/generate';
+        form.action = '/generate/stream';
         document.body.appendChild(form);
         form.submit();
     });
@@ -292,21 +292,16 @@ document.addEventListener('DOMContentLoaded', function() {
         e.stopPropagation();
         
         if (draggedItem !== this) {
-            // Get positions in the list
-            const list = Array.from(documentList.children);
-            const draggedPos = list.indexOf(draggedItem);
-            const dropPos = list.indexOf(this);
-            
-            // Reorder in DOM
-            if (draggedPos < dropPos) {
+            // Reorder in DOM, dropping after the target when dragging downwards
+            if (draggedItem.compareDocumentPosition(this) & Node.DOCUMENT_POSITION_FOLLOWING) {
                 documentList.insertBefore(draggedItem, this.nextSibling);
             } else {
                 documentList.insertBefore(draggedItem, this);
             }
             
-            // Update server with new order
-            const newOrder = Array.from(documentList.children).map(item => item.dataset.id);
-            updateDocumentOrder(newOrder);
+            // Tell the server about this one move only
+            const next = draggedItem.nextElementSibling;
+            moveDocument(draggedItem.dataset.id, next ? next.dataset.id : null);
         }
         
         this.classList.remove('drag-over');
@@ -318,17 +313,17 @@ document.addEventListener('DOMContentLoaded', function() {
         draggedItem = null;
     }
     
-    function updateDocumentOrder(newOrder) {
-        fetch('/documents/reorder', {
+    function moveDocument(documentId, beforeId) {
+        fetch('/documents/move', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
                 'X-Requested-With': 'XMLHttpRequest'
             },
-            body: JSON.stringify({ order: newOrder })
+            body: JSON.stringify({ id: documentId, before: beforeId })
         })
         .then(response => response.json())
-        .catch(error => console.error('Error updating document order:', error));
+        .catch(error => console.error('Error moving document:', error));
     }
     
     // Initialize drag and drop on page load
@@ -67,139 +67,209 @@ document.addEventListener('DOMContentLoaded', function() {
             const existingCloseButtons = progressContent.querySelectorAll('.close-btn');
             existingCloseButtons.forEach(btn => btn.remove());
             
-            // Simulate generation progress up to 95%
-            let progress = 0;
-            const interval = setInterval(() => {
-                // Faster progression
-                if (progress < 20) {
-                    progress += 1.5;
-                } else if (progress < 60) {
-                    progress += 2;
-                } else if (progress < 85) {
-                    progress += 1.2;
-                } else if (progress < 95) {
-                    progress += 0.8;
+            // Queue the generation job and follow its real progress
+            progressText.textContent = window.i18n.t('initializing_generation');
+            
+            const language = encodeURIComponent(window.i18n.getCurrentLanguage());
+            fetch(`/generate/jobs?language=${language}`, {
+                method: 'POST',
+                headers: {
+                    'X-Requested-With': 'XMLHttpRequest'
+                }
+            })
+            .then(response => {
+                if (!response.ok) {
+                    return throwResponseError(response);
                 }
+                return response.json();
+            })
+            .then(job => followGenerationJob(job, progressBar, progressText))
+            .then(job => {
+                progressBar.style.width = "100%";
+                progressText.textContent = window.i18n.t('starting_download');
                 
-                // Update the progress bar
-                progressBar.style.width = `${Math.min(progress, 95)}%`;
+                return fetch(job.download_url, {
+                    headers: {
+                        'X-Requested-With': 'XMLHttpRequest'
+                    }
+                });
+            })
+            .then(response => {
+                // Check if the response is valid
+                if (!response.ok) {
+                    return throwResponseError(response);
+                }
                 
-                // Update text for better UX with translations
-                if (progress < 20) {
-                    progressText.textContent = window.i18n.t('initializing_generation');
-                } else if (progress < 40) {
-                    progressText.textContent = window.i18n.t('processing_content');
-                } else if (progress < 60) {
-                    progressText.textContent = window.i18n.t('creating_index');
-                } else if (progress < 80) {
-                    progressText.textContent = window.i18n.t('merging_documents');
-                } else {
-                    progressText.textContent = window.i18n.t('finalizing');
+                // Get filename from content-disposition if available
+                let filename = 'book_of_documents.pdf';
+                const disposition = response.headers.get('content-disposition');
+                if (disposition && disposition.includes('filename=')) {
+                    const filenameRegex = /filename[^;=\n]*=((['"]).*?\2|[^;\n]*)/;
+                    const matches = filenameRegex.exec(disposition);
+                    if (matches && matches[1]) {
+                        filename = matches[1].replace(/['"]/g, '');
+                    }
                 }
                 
-                // At 95%, initiate the actual download
-                if (progress >= 95) {
-                    clearInterval(interval);
-                    progressBar.style.width = "100%";
-                    progressText.textContent = window.i18n.t('starting_download');
+                progressText.textContent = window.i18n.t('download_progress');
+                
+                // Return the blob
+                return response.blob().then(blob => ({ blob, filename }));
+            })
+            .then(({ blob, filename }) => {
+                // Create a download link and trigger it
+                const url = window.URL.createObjectURL(blob);
+                const a = document.createElement('a');
+                a.style.display = 'none';
+                a.href = url;
+                a.download = filename;
+                document.body.appendChild(a);
+                
+                // Trigger the download
+                a.click();
+                window.URL.revokeObjectURL(url);
+                
+                // Show success message with translations
+                progressText.innerHTML = `<strong>${window.i18n.t('download_complete')}</strong><br>${window.i18n.t('book_downloaded')}`;
+                
+                // Add a single close button
+                addCloseButton(progressContent, generationProgress);
+                
+                // Auto-hide after a reasonable time if not clicked
+                setTimeout(() => {
+                    generationProgress.style.display = 'none';
+                }, 5000); // Hide after 5 seconds
+            })
+            .catch(error => {
+                console.error('Download error:', error);
+                
+                // Show detailed error information with translations
+                const errorMessage = error.message || window.i18n.t('unknown_error');
+                progressBar.style.backgroundColor = "#dc3545"; // Red for error
+                progressText.innerHTML = `<strong>${window.i18n.t('error')}</strong><br>${errorMessage.replace(/\n/g, '<br>')}`;
+                
+                // Add error details collapsible section if available
+                if (error.details) {
+                    const detailsContainer = document.createElement('div');
+                    detailsContainer.className = 'error-details';
+                    detailsContainer.innerHTML = `
+                        <button class="btn details-toggle">${window.i18n.t('show_details')}</button>
+                        <div class="details-content" style="display:none; text-align:left; margin-top:10px;">
+                            <pre>${error.details.join('\n')}</pre>
+                        </div>
+                    `;
+                    progressText.appendChild(detailsContainer);
                     
-                    // Initiate fetch request instead of form submission
-                    fetch('/generate', {
-                        method: 'POST',
-                        headers: {
-                            'X-Requested-With': 'XMLHttpRequest'
-                        }
-                    })
-                    .then(response => {
-                        // Check if the response is valid
-                        if (!response.ok) {
-                            // Try to get error details from response
-                            return response.json().then(errData => {
-                                throw new Error(`Error ${response.status}: ${errData.message || response.statusText}${errData.details ? '\n' + errData.details.join('\n') : ''}`);
-                            }).catch(e => {
-                                // If response isn't JSON, throw standard error
-                                if (e instanceof SyntaxError) {
-                                    throw new Error(`Error ${response.status}: ${response.statusText}`);
-                                }
-                                throw e;
-                            });
-                        }
-                        
-                        // Get filename from content-disposition if available
-                        let filename = 'book_of_documents.pdf';
-                        const disposition = response.headers.get('content-disposition');
-                        if (disposition && disposition.includes('filename=')) {
-                            const filenameRegex = /filename[^;=\n]*=((['"]).*?\2|[^;\n]*)/;
-                            const matches = filenameRegex.exec(disposition);
-                            if (matches && matches[1]) {
-                                filename = matches[1].replace(/['"]/g, '');
-                            }
-                        }
-                        
-                        progressText.textContent = window.i18n.t('download_progress');
-                        
-                        // Return the blob
-                        return response.blob().then(blob => ({ blob, filename }));
-                    })
-                    .then(({ blob, filename }) => {
-                        // Create a download link and trigger it
-                        const url = window.URL.createObjectURL(blob);
-                        const a = document.createElement('a');
-                        a.style.display = 'none';
-                        a.href = url;
-                        a.download = filename;
-                        document.body.appendChild(a);
-                        
-                        // Trigger the download
-                        a.click();
-                        window.URL.revokeObjectURL(url);
-                        
-                        // Show success message with translations
-                        progressText.innerHTML = `<strong>${window.i18n.t('download_complete')}</strong><br>${window.i18n.t('book_downloaded')}`;
-                        
-                        // Add a single close button
-                        addCloseButton(progressContent, generationProgress);
-                        
-                        // Auto-hide after a reasonable time if not clicked
-                        setTimeout(() => {
-                            generationProgress.style.display = 'none';
-                        }, 5000); // Hide after 5 seconds
-                    })
-                    .catch(error => {
-                        console.error('Download error:', error);
-                        
-                        // Show detailed error information with translations
-                        const errorMessage = error.message || window.i18n.t('unknown_error');
-                        progressBar.style.backgroundColor = "#dc3545"; // Red for error
-                        progressText.innerHTML = `<strong>${window.i18n.t('error')}</strong><br>${errorMessage.replace(/\n/g, '<br>')}`;
-                        
-                        // Add error details collapsible section if available
-                        if (error.details) {
-                            const detailsContainer = document.createElement('div');
-                            detailsContainer.className = 'error-details';
-                            detailsContainer.innerHTML = `
-                                <button class="btn details-toggle">${window.i18n.t('show_details')}</button>
-                                <div class="details-content" style="display:none; text-align:left; margin-top:10px;">
-                                    <pre>${error.details.join('\n')}</pre>
-                                </div>
-                            `;
-                            progressText.appendChild(detailsContainer);
-                            
-                            // Add toggle functionality with translations
-                            const toggleBtn = detailsContainer.querySelector('.details-toggle');
-                            const content = detailsContainer.querySelector('.details-content');
-                            toggleBtn.addEventListener('click', function() {
-                                const isVisible = content.style.display !== 'none';
-                                content.style.display = isVisible ? 'none' : 'block';
-                                toggleBtn.textContent = isVisible ? window.i18n.t('show_details') : window.i18n.t('hide_details');
-                            });
-                        }
-                        
-                        // Add a single close button
-                        addCloseButton(progressContent, generationProgress);
+                    // Add toggle functionality with translations
+                    const toggleBtn = detailsContainer.querySelector('.details-toggle');
+                    const content = detailsContainer.querySelector('.details-content');
+                    toggleBtn.addEventListener('click', function() {
+                        const isVisible = content.style.display !== 'none';
+                        content.style.display = isVisible ? 'none' : 'block';
+                        toggleBtn.textContent = isVisible ? window.i18n.t('show_details') : window.i18n.t('hide_details');
                     });
                 }
-            }, 50); // Update more frequently for smoother animation
+                
+                // Add a single close button
+                addCloseButton(progressContent, generationProgress);
+            });
+        });
+    }
+    
+    // Turn a failed response into an Error carrying the server's message
+    function throwResponseError(response) {
+        return response.json().then(errData => {
+            const error = new Error(`Error ${response.status}: ${errData.message || response.statusText}`);
+            error.details = errData.details;
+            throw error;
+        }).catch(e => {
+            // If response isn't JSON, throw standard error
+            if (e instanceof SyntaxError) {
+                throw new Error(`Error ${response.status}: ${response.statusText}`);
+            }
+            throw e;
+        });
+    }
+    
+    // Progress bar position for each generation stage
+    const GENERATION_STAGES = {
+        queued: { percent: 2, text: 'initializing_generation' },
+        cover: { percent: 5, text: 'initializing_generation' },
+        index: { percent: 10, text: 'creating_index' },
+        receipt: { percent: 15, text: 'creating_index' },
+        validate: { percent: 20, text: 'processing_content' },
+        merge: { percent: 20, text: 'merging_documents' }
+    };
+    
+    function showGenerationProgress(state, progressBar, progressText) {
+        const stage = GENERATION_STAGES[state.stage || 'queued'] || GENERATION_STAGES.queued;
+        let percent = stage.percent;
+        let text = window.i18n.t(stage.text);
+        
+        if (state.stage === 'merge') {
+            if (state.bytes_written > 0 && state.documents_merged >= state.documents_total) {
+                // All documents merged; the book is being written out
+                percent = 95;
+                text = `${window.i18n.t('finalizing')} (${(state.bytes_written / 1048576).toFixed(1)} MB)`;
+            } else if (state.documents_total > 0) {
+                percent = 20 + Math.round(70 * state.documents_merged / state.documents_total);
+                text = `${text} (${state.documents_merged}/${state.documents_total})`;
+            }
+        }
+        
+        progressBar.style.width = `${percent}%`;
+        progressText.textContent = text;
+    }
+    
+    // Follow a generation job until it finishes; resolves with the job
+    function followGenerationJob(job, progressBar, progressText) {
+        return new Promise((resolve, reject) => {
+            const handleState = state => {
+                if (state.status === 'done') {
+                    resolve(job);
+                    return true;
+                }
+                if (state.status === 'error') {
+                    const error = new Error(state.error || window.i18n.t('unknown_error'));
+                    error.details = state.details;
+                    reject(error);
+                    return true;
+                }
+                showGenerationProgress(state, progressBar, progressText);
+                return false;
+            };
+            
+            // Poll the job status if the event stream is unavailable
+            const poll = () => {
+                fetch(job.status_url, {
+                    headers: {
+                        'X-Requested-With': 'XMLHttpRequest'
+                    }
+                })
+                .then(response => response.ok ? response.json() : throwResponseError(response))
+                .then(state => {
+                    if (!handleState(state)) {
+                        setTimeout(poll, 1000);
+                    }
+                })
+                .catch(reject);
+            };
+            
+            if (!window.EventSource) {
+                poll();
+                return;
+            }
+            
+            const events = new EventSource(job.progress_url);
+            events.onmessage = function(e) {
+                if (handleState(JSON.parse(e.data))) {
+                    events.close();
+                }
+            };
+            events.onerror = function() {
+                events.close();
+                poll();
+            };
         });
     }
     
@@ -482,21 +552,16 @@ document.addEventListener('DOMContentLoaded', function() {
         e.stopPropagation();
         
         if (draggedItem !== this) {
-            // Get positions in the list
-            const list = Array.from(documentList.children);
-            const draggedPos = list.indexOf(draggedItem);
-            const dropPos = list.indexOf(this);
-            
-            // Reorder in DOM
-            if (draggedPos < dropPos) {
+            // Reorder in DOM, dropping after the target when dragging downwards
+            if (draggedItem.compareDocumentPosition(this) & Node.DOCUMENT_POSITION_FOLLOWING) {
                 documentList.insertBefore(draggedItem, this.nextSibling);
             } else {
                 documentList.insertBefore(draggedItem, this);
             }
             
-            // Update server with new order
-            const newOrder = Array.from(documentList.children).map(item => item.dataset.id);
-            updateDocumentOrder(newOrder);
+            // Tell the server about this one move only
+            const next = draggedItem.nextElementSibling;
+            moveDocument(draggedItem.dataset.id, next ? next.dataset.id : null);
         }
         
         this.classList.remove('drag-over');
@@ -508,17 +573,17 @@ document.addEventListener('DOMContentLoaded', function() {
         draggedItem = null;
     }
     
-    function updateDocumentOrder(newOrder) {
-        fetch('/documents/reorder', {
+    function moveDocument(documentId, beforeId) {
+        fetch('/documents/move', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
                 'X-Requested-With': 'XMLHttpRequest'
             },
-            body: JSON.stringify({ order: newOrder })
+            body: JSON.stringify({ id: documentId, before: beforeId })
         })
         .then(response => response.json())
-        .catch(error => console.error('Error updating document order:', error));
+        .catch(error => console.error('Error moving document:', error));
     }
     
     // Initialize drag and drop on page load
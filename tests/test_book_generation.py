@@ -0,0 +1,86 @@
+import hashlib
+import logging
+import os
+import threading
+import PyPDF2
+import pytest
+from benchmarks.corpus import make_pdf
+from controllers.document_controller import run_book_generation
+from models.document import Document
+from utils.pdf_backends import get_backend
+
+@pytest.fixture
+def config(tmp_path):
+    """The settings run_book_generation reads, with every folder under tmp_path"""
+    for name in ('uploads', 'output'):
+        (tmp_path / name).mkdir()
+    return {
+        'LOGGER': logging.getLogger('book_of_documents'),
+        'UPLOAD_FOLDER': str(tmp_path / 'uploads'),
+        'OUTPUT_FOLDER': str(tmp_path / 'output'),
+        'METADATA_CACHE_PATH': str(tmp_path / 'cache' / 'metadata.sqlite3'),
+        'METADATA_CACHE_MAX_ENTRIES': 100,
+        'BOOK_CACHE_FOLDER': str(tmp_path / 'cache' / 'books'),
+        'BOOK_CACHE_MAX_BYTES': 1073741824,
+        'SCRATCH_FOLDER': None,
+        'STREAMING_MERGE_MIN_BYTES': None,
+        'COMPACT_OUTPUT_MIN_BYTES': None,
+        'GENERATION_SLOW_SECONDS': None,
+    }
+
+def _documents(config, *page_counts):
+    """Validated uploads with the given page counts"""
+    documents = []
+    for pages in page_counts:
+        name = f"document_{pages}.pdf"
+        path = f"{config['UPLOAD_FOLDER']}/{name}"
+        make_pdf(path, pages, title=name)
+        with open(path, 'rb') as f:
+            content_hash = hashlib.sha256(f.read()).hexdigest()
+        doc = Document(filename=name, original_filename=name, file_type='pdf', content_hash=content_hash)
+        documents.append(doc.apply_metadata({'valid': True, 'page_count': pages}, path))
+    return documents
+
+@pytest.mark.parametrize('backend', ['utils.pdf_utils', 'utils.pdf_utils_fpdf'])
+def test_concurrent_generations_write_separate_books(config, backend):
+    # Two sessions' jobs started in the same second
+    sessions = [_documents(config, 2), _documents(config, 7)]
+    results = [None, None]
+    barrier = threading.Barrier(2)
+
+    def generate(i):
+        barrier.wait()
+        results[i] = run_book_generation(sessions[i], 'en', get_backend(backend), config)
+
+    threads = [threading.Thread(target=generate, args=(i,)) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results[0]['output_path'] != results[1]['output_path']
+    # Cover, index and receipt around each session's own document
+    assert [len(PyPDF2.PdfReader(result['output_path']).pages) for result in results] == [5, 10]
+
+def test_linearized_book_does_not_serve_its_body_to_a_packed_one(config):
+    documents = _documents(config, 3, 4)
+    backend = get_backend('utils.pdf_utils')
+    linearized = run_book_generation(documents, 'en', backend, config, compact=True, linearize=True)
+    packed = run_book_generation(documents, 'en', backend, config, compact=True)
+
+    with open(linearized['output_path'], 'rb') as f:
+        assert b'/ObjStm' not in f.read()
+    with open(packed['output_path'], 'rb') as f:
+        assert b'/ObjStm' in f.read()
+    assert len(PyPDF2.PdfReader(packed['output_path']).pages) == 10
+
+def test_merge_report_sizes_the_finished_book(config):
+    result = run_book_generation(_documents(config, 3, 4), 'en', get_backend('utils.pdf_utils'), config,
+                                 compact=True)
+
+    report = result['merge_report']
+    # The cover and receipt are spliced onto the cached body after the merge
+    assert report['output_bytes'] == os.path.getsize(result['output_path'])
+    assert report['uncompacted_bytes'] == (report['output_bytes'] + report['compression_bytes_saved']
+                                           + report['packing_bytes_saved'])
+    assert report['packing_bytes_saved'] > 0
@@ -0,0 +1,66 @@
+import re
+import PyPDF2
+import pytest
+from benchmarks.corpus import make_pdf
+from utils.merge_utils import ManifestEntry
+from utils.pdf_stream_writer import OutputCompactor
+from utils.pdf_utils import merge_pdfs
+
+_FIRST_OBJECT_RE = re.compile(rb'%PDF-1\.\d\n[^\n]*\n(\d+) 0 obj\n<<(.*?)>>', re.S)
+
+def _merged_book(folder, **options):
+    """Merge a cover, an index, three documents and a receipt into book.pdf"""
+    entries = []
+    for name, pages in [('cover', 1), ('index', 1), ('a', 2), ('b', 3), ('c', 1), ('receipt', 1)]:
+        path = str(folder / f"{name}.pdf")
+        make_pdf(path, pages, title=name)
+        entries.append(ManifestEntry(path, None, name))
+    output_path = str(folder / 'book.pdf')
+    merge_pdfs(entries, output_path, linearize=True, **options)
+    return output_path
+
+def _linearization_dict(data):
+    """The entries of the dictionary that must be the file's first object"""
+    match = _FIRST_OBJECT_RE.match(data)
+    assert match, "the linearization dictionary is not the first object"
+    entries = dict(re.findall(rb'/(\w+) (\d+|\[\d+ \d+\])', match.group(2)))
+    return {key.decode(): [int(value) for value in re.findall(rb'\d+', raw)] for key, raw in entries.items()}
+
+@pytest.mark.parametrize('options', [
+    {},
+    {'streaming': True},
+    {'compact': OutputCompactor(pack_objects=False)},
+], ids=['merger', 'streaming', 'compressed'])
+def test_linearized_book_has_a_valid_linearization_dictionary(tmp_path, options):
+    path = _merged_book(tmp_path, **options)
+    with open(path, 'rb') as f:
+        data = f.read()
+    linearized = _linearization_dict(data)
+
+    assert linearized['Linearized'] == [1]
+    assert linearized['L'] == [len(data)]
+
+    reader = PyPDF2.PdfReader(path)
+    assert linearized['N'] == [len(reader.pages)] == [9]
+    assert linearized['O'] == [reader.pages[0].indirect_ref.idnum]
+
+    # /H gives the offset and length of the hint stream object
+    hint_offset, hint_length = linearized['H']
+    hint = data[hint_offset:hint_offset + hint_length]
+    assert re.match(rb'\d+ 0 obj\n<<[^>]*/S \d+', hint)
+    assert hint.endswith(b'endstream\nendobj\n')
+
+    # /T is the white-space before the first entry of the main xref table
+    main_xref = data.rindex(b'xref\n0 ')
+    assert main_xref < linearized['T'][0]
+    assert data[linearized['T'][0]:linearized['T'][0] + 1].isspace()
+    assert data[linearized['T'][0] + 1:linearized['T'][0] + 19] == b'0000000000 65535 f'
+
+def test_compressing_a_linearized_book_does_not_report_packed_objects(tmp_path):
+    compactor = OutputCompactor(pack_objects=False)
+    path = _merged_book(tmp_path, compact=compactor)
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    assert b'/ObjStm' not in data
+    assert 'objects_packed' not in compactor.report()
@@ -0,0 +1,26 @@
+import pytest
+from benchmarks.corpus import make_pdf
+from utils.merge_utils import get_parse_counts
+from utils.pdf_normalize import diagnose_pdf
+
+def _shifted(path):
+    """Move every object past its xref offset, as a broken editor would"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    start = data.index(b'\n', 10) + 1
+    with open(path, 'wb') as f:
+        f.write(data[:start] + b'%' + b'x' * 300 + b'\n' + data[start:])
+
+@pytest.mark.parametrize('damage, reason, parses', [
+    (None, None, 0),
+    (_shifted, 'damaged', 1),
+], ids=['clean', 'damaged'])
+def test_only_uploads_failing_the_xref_probe_are_parsed(tmp_path, damage, reason, parses):
+    path = str(tmp_path / 'upload.pdf')
+    make_pdf(path, 3)
+    if damage is not None:
+        damage(path)
+    before = get_parse_counts([path])[path]
+
+    assert diagnose_pdf(path) == reason
+    assert get_parse_counts([path])[path] - before == parses
@@ -0,0 +1,67 @@
+import PyPDF2
+import pytest
+from PyPDF2.generic import ArrayObject, DictionaryObject, NameObject, NullObject, NumberObject, TextStringObject
+from reportlab.pdfgen import canvas
+from benchmarks.corpus import make_pdf
+from utils.merge_utils import ManifestEntry
+from utils.pdf_stream_writer import OutputCompactor
+from utils.pdf_utils import merge_pdfs
+
+def _form_document(path, label):
+    """Three pages with nested bookmarks, a text field on page 2 and a named destination to page 3"""
+    pdf = canvas.Canvas(path)
+    for page in range(3):
+        pdf.drawString(72, 720, f"{label} page {page + 1}")
+        pdf.bookmarkPage(f"{label}{page}")
+        pdf.addOutlineEntry(f"{label} section {page + 1}", f"{label}{page}", level=min(page, 1))
+        if page == 1:
+            pdf.acroForm.textfield(name=f"{label}_name", value=label, x=72, y=600, width=200, height=20)
+        pdf.showPage()
+    pdf.save()
+
+    reader = PyPDF2.PdfReader(path)
+    destination = ArrayObject([reader.pages[2].indirect_ref, NameObject('/XYZ'),
+                               NumberObject(0), NumberObject(500), NullObject()])
+    reader.trailer['/Root'][NameObject('/Names')] = DictionaryObject({
+        NameObject('/Dests'): DictionaryObject({
+            NameObject('/Names'): ArrayObject([TextStringObject(f"{label}_end"), destination])
+        })
+    })
+    writer = PyPDF2.PdfWriter()
+    writer.clone_reader_document_root(reader)
+    with open(path, 'wb') as f:
+        writer.write(f)
+
+def _outline(reader, items=None):
+    items = reader.outline if items is None else items
+    return [_outline(reader, item) if isinstance(item, list)
+            else (item.title, reader.get_destination_page_number(item)) for item in items]
+
+@pytest.mark.parametrize('options', [
+    {'streaming': True},
+    {'compact': OutputCompactor()},
+], ids=['streaming', 'compacted'])
+def test_streaming_merge_keeps_outlines_destinations_and_forms(tmp_path, options):
+    entries = []
+    for name in ('cover', 'index'):
+        make_pdf(str(tmp_path / f"{name}.pdf"), 1)
+        entries.append(ManifestEntry(str(tmp_path / f"{name}.pdf"), None, name))
+    for label in ('a', 'b'):
+        _form_document(str(tmp_path / f"{label}.pdf"), label)
+        entries.append(ManifestEntry(str(tmp_path / f"{label}.pdf"), 3, f"{label}.pdf"))
+    make_pdf(str(tmp_path / 'receipt.pdf'), 1)
+    entries.append(ManifestEntry(str(tmp_path / 'receipt.pdf'), None, 'receipt'))
+    output_path = str(tmp_path / 'book.pdf')
+    merge_pdfs(entries, output_path, **options)
+
+    reader = PyPDF2.PdfReader(output_path, strict=True)
+    assert _outline(reader) == [
+        ('a section 1', 2), [('a section 2', 3), ('a section 3', 4)], ('a.pdf', 2),
+        ('b section 1', 5), [('b section 2', 6), ('b section 3', 7)], ('b.pdf', 5),
+    ]
+    destinations = reader.named_destinations
+    assert {name: reader.get_destination_page_number(destination)
+            for name, destination in destinations.items()} == {'a_end': 4, 'b_end': 7}
+    assert destinations['a_end'].typ == '/XYZ' and destinations['a_end'].top == 500
+    assert {name: field['/V'] for name, field in reader.get_fields().items()} == {'a_name': 'a', 'b_name': 'b'}
+    assert '/DR' in reader.trailer['/Root']['/AcroForm']
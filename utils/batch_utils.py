@@ -0,0 +1,106 @@
+import multiprocessing
+from utils.merge_utils import get_parse_counts, record_parse
+
+def _pool_context():
+    """Start workers from a clean server process rather than forking a threaded app."""
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
+    return multiprocessing.get_context('spawn')
+
+def error_metadata(error):
+    return {
+        'page_count': 0,
+        'page_sizes': None,
+        'encrypted': False,
+        'valid': False,
+        'error': error
+    }
+
+def _timeout_metadata(timeout):
+    return error_metadata(f"Timed out after {timeout} seconds while reading the PDF")
+
+def _counted(task, pdf_path):
+    """Run task(pdf_path) in a worker; returns its result and the parses it made.
+
+    The worker's parse counter stays behind in the worker, so the counts
+    go back with the result.
+    """
+    before = get_parse_counts()
+    result = task(pdf_path)
+    parses = {path: count - before.get(path, 0) for path, count in get_parse_counts().items()
+              if count != before.get(path, 0)}
+    return result, parses
+
+class BatchInspector:
+    """Normalize, page-count and validate a batch of documents on a process pool.
+
+    Documents are submitted one at a time as they are stored. Cache hits are
+    applied immediately; misses run loader(pdf_path) on up to max_workers
+    processes. An upload not yet checked for damage or encryption is
+    submitted with normalize set and runs normalizer(pdf_path) instead,
+    which normalizes it and reads the metadata of the result; finish()
+    hands that outcome to store_normalized(doc, outcome), which returns the
+    path the document reads from then on. finish() applies the results in
+    submission order, giving each file at most timeout seconds, then shuts
+    the pool down (terminating any worker stuck on a pathological file).
+    """
+
+    def __init__(self, loader, metadata_cache, max_workers, timeout, normalizer=None,
+                 store_normalized=None):
+        self.loader = loader
+        self.metadata_cache = metadata_cache
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.normalizer = normalizer
+        self.store_normalized = store_normalized
+        self._pool = None
+        self._pending = []
+
+    def submit(self, doc, pdf_path, normalize=False):
+        if doc.content_hash and not normalize:
+            metadata = self.metadata_cache.get(doc.content_hash)
+            if metadata is not None:
+                doc.apply_metadata(metadata, pdf_path)
+                return
+        entry = [doc, pdf_path, normalize, None]
+        self._pending.append(entry)
+        # A pool only pays off once there are two files to work on
+        if self.max_workers > 1 and len(self._pending) >= 2:
+            if self._pool is None:
+                self._pool = _pool_context().Pool(processes=self.max_workers)
+            for pending in self._pending:
+                if pending[3] is None:
+                    task = self.normalizer if pending[2] else self.loader
+                    pending[3] = self._pool.apply_async(_counted, (task, pending[1]))
+
+    def finish(self):
+        """Wait for outstanding files and apply their metadata in order."""
+        try:
+            for doc, pdf_path, normalize, result in self._pending:
+                if result is None:
+                    outcome = (self.normalizer if normalize else self.loader)(pdf_path)
+                else:
+                    try:
+                        outcome, parses = result.get(self.timeout)
+                    except multiprocessing.TimeoutError:
+                        doc.apply_metadata(_timeout_metadata(self.timeout), pdf_path)
+                        continue
+                    for path, count in parses.items():
+                        record_parse(path, count)
+                metadata = outcome
+                if normalize:
+                    pdf_path = self.store_normalized(doc, outcome)
+                    metadata = outcome['metadata']
+                if doc.content_hash:
+                    self.metadata_cache.put(doc.content_hash, metadata)
+                doc.apply_metadata(metadata, pdf_path)
+        finally:
+            self.close()
+
+    def close(self):
+        """Drop outstanding files and stop the pool."""
+        self._pending = []
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
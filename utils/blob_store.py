@@ -0,0 +1,159 @@
+import os
+import hashlib
+import sqlite3
+import tempfile
+import threading
+from contextlib import closing
+
+CHUNK_SIZE = 1024 * 1024  # 1MB
+
+class BlobStore:
+    """Content-addressed file store for uploaded PDFs.
+
+    Files are stored once under blobs/<aa>/<sha256>.pdf inside the upload
+    folder and reference-counted in a small SQLite table, so identical
+    uploads from any session share a single copy on disk.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.blob_dir = os.path.join(root, 'blobs')
+        self.db_path = os.path.join(root, 'blobs.sqlite3')
+        os.makedirs(self.blob_dir, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS blobs ('
+                'content_hash TEXT PRIMARY KEY, '
+                'size INTEGER NOT NULL, '
+                'refcount INTEGER NOT NULL)'
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def relative_path(self, content_hash, suffix='.pdf'):
+        """Path of a blob relative to the upload folder."""
+        return os.path.join('blobs', content_hash[:2], content_hash + suffix)
+
+    def path_for(self, content_hash, suffix='.pdf'):
+        """Absolute path of a blob."""
+        return os.path.join(self.root, self.relative_path(content_hash, suffix))
+
+    def store_stream(self, stream, suffix='.pdf'):
+        """Store a readable stream, hashing it while it is written.
+
+        Returns (content_hash, relative_path, size). The temporary copy is
+        discarded when an identical blob already exists.
+        """
+        sha256 = hashlib.sha256()
+        size = 0
+        fd, temp_path = tempfile.mkstemp(dir=self.blob_dir, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    sha256.update(chunk)
+                    temp_file.write(chunk)
+                    size += len(chunk)
+            content_hash = sha256.hexdigest()
+            self._commit(content_hash, temp_path, size, suffix)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return content_hash, self.relative_path(content_hash, suffix), size
+
+    def store_file(self, file_path, suffix='.pdf'):
+        """Store a file that is already on disk."""
+        with open(file_path, 'rb') as f:
+            return self.store_stream(f, suffix)
+
+    def _commit(self, content_hash, temp_path, size, suffix):
+        """Take a reference on a blob, moving the temp file in if it is new."""
+        final_path = self.path_for(content_hash, suffix)
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            if not os.path.exists(final_path):
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                os.replace(temp_path, final_path)
+            conn.execute(
+                'INSERT INTO blobs (content_hash, size, refcount) VALUES (?, ?, 1) '
+                'ON CONFLICT(content_hash) DO UPDATE SET refcount = refcount + 1',
+                (content_hash, size)
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def acquire(self, content_hash, suffix='.pdf'):
+        """Take another reference on a stored blob; False if it no longer exists."""
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            cursor = conn.execute(
+                'UPDATE blobs SET refcount = refcount + 1 WHERE content_hash = ?', (content_hash,)
+            )
+            if cursor.rowcount == 0 or not os.path.exists(self.path_for(content_hash, suffix)):
+                conn.execute('ROLLBACK')
+                return False
+            conn.execute('COMMIT')
+            return True
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def release(self, content_hash, suffix='.pdf'):
+        """Drop one reference; the file is deleted with the last reference."""
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute(
+                'SELECT refcount FROM blobs WHERE content_hash = ?', (content_hash,)
+            ).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return 0
+            refcount = row[0] - 1
+            if refcount > 0:
+                conn.execute(
+                    'UPDATE blobs SET refcount = ? WHERE content_hash = ?',
+                    (refcount, content_hash)
+                )
+            else:
+                conn.execute('DELETE FROM blobs WHERE content_hash = ?', (content_hash,))
+                final_path = self.path_for(content_hash, suffix)
+                if os.path.exists(final_path):
+                    os.remove(final_path)
+            conn.execute('COMMIT')
+            return refcount
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def refcount(self, content_hash):
+        """Current number of references to a blob."""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                'SELECT refcount FROM blobs WHERE content_hash = ?', (content_hash,)
+            ).fetchone()
+        return row[0] if row else 0
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_blob_store(upload_folder):
+    """Return the shared BlobStore for an upload folder."""
+    key = os.path.abspath(upload_folder)
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = BlobStore(upload_folder)
+        return _stores[key]
@@ -0,0 +1,329 @@
+import io
+import os
+import shutil
+import getpass
+import tempfile
+import time
+import uuid
+from datetime import datetime
+from models.book import Book
+from utils.merge_utils import ManifestEntry, get_parse_counts
+from utils.metrics import GenerationTimer, stage
+
+def _no_progress(**fields):
+    pass
+
+def _cleanup(temp_dir, logger):
+    """Remove a scratch directory"""
+    try:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        logger.info("Cleaned up temporary directory: %s", temp_dir)
+    except Exception as cleanup_error:
+        logger.warning("Error cleaning up temp dir: %s", cleanup_error)
+
+def _new_book(documents):
+    """Create a Book holding all documents"""
+    book = Book()
+    for doc in documents:
+        book.add_document(doc)
+    return book
+
+def _document_entries(documents, pdf_utils_module, upload_folder, metadata_cache, logger):
+    """Manifest entries for the documents that can be merged.
+
+    Validity and page counts were established at upload and are trusted as
+    long as a stat shows the file unchanged, so inputs are not re-parsed here.
+    """
+    entries = []
+    for doc in documents:
+        if doc.status == "success":
+            pdf_path = os.path.join(upload_folder, doc.filename)
+            if doc.file_unchanged(pdf_path):
+                entries.append(ManifestEntry(pdf_path, doc.page_count, doc.original_filename))
+                continue
+            # Verify the file exists before trying to merge
+            if not os.path.exists(pdf_path):
+                logger.error("Document file not found: %s", pdf_path)
+                continue
+            if doc.file_size is None:
+                # Uploaded before file stats were recorded; use the metadata cache
+                metadata = metadata_cache.get_or_load(
+                    doc.content_hash, pdf_path, pdf_utils_module.get_pdf_metadata)
+            else:
+                logger.warning("Document file changed since upload, validating again: %s", pdf_path)
+                metadata = pdf_utils_module.get_pdf_metadata(pdf_path)
+            if not metadata['valid']:
+                logger.error("Invalid PDF file %s: %s", pdf_path, metadata['error'])
+                continue
+            entries.append(ManifestEntry(pdf_path, metadata['page_count'], doc.original_filename))
+    logger.info("Found %d successful documents to merge", len(entries))
+    return entries
+
+def _check_rendered(buffers):
+    """Verify the front matter was rendered"""
+    for buffer in buffers:
+        if buffer.getbuffer().nbytes == 0:
+            raise ValueError("Not enough valid PDF components to create the book")
+
+def _merge_options(entries, streaming_merge_min_bytes, dedup, compact, compact_min_bytes, linearize,
+                   logger):
+    """Decide how to merge the documents: (streaming, deduplicator, compactor).
+
+    The merge streams once the documents add up to streaming_merge_min_bytes
+    (None: never). compact None compacts once they add up to
+    compact_min_bytes (None: never); compacting always streams, since only
+    the streaming writer packs objects. A linearized book is written with
+    plain objects and xref tables, so with linearize compacting only
+    compresses streams. dedup only applies to a streaming merge.
+    """
+    # The streaming writer brings in PyPDF2, which is only loaded for a merge
+    from utils.pdf_stream_writer import StreamDeduplicator, OutputCompactor
+    total = sum(os.path.getsize(entry.path) for entry in entries)
+    streaming = streaming_merge_min_bytes is not None and total >= streaming_merge_min_bytes
+    if compact is None:
+        compact = compact_min_bytes is not None and total >= compact_min_bytes
+    if streaming or compact:
+        logger.info("Documents total %d bytes; using the streaming merge%s", total,
+                    " with compaction" if compact else "")
+    if compact and linearize:
+        logger.warning("Linearized books cannot keep object streams; only compressing streams")
+    return (streaming or compact,
+            StreamDeduplicator() if dedup and (streaming or compact) else None,
+            OutputCompactor(pack_objects=not linearize) if compact else None)
+
+def _record_merge(book, deduplicator, compactor, seconds, output_path, logger):
+    """Put the deduplication and compaction counts on the book's merge report.
+
+    output_path is the finished book; with a compactor the report also
+    estimates its size had the merge not been compacted.
+    """
+    if deduplicator is None and compactor is None:
+        return
+    report = {'merge_seconds': round(seconds, 3), 'output_bytes': os.path.getsize(output_path)}
+    if deduplicator is not None:
+        report.update(deduplicator.report())
+        logger.info("Shared %d duplicate streams, saving %d bytes",
+                    deduplicator.streams_shared, deduplicator.bytes_saved)
+    if compactor is not None:
+        report.update(compactor.report())
+        if compactor.pack_objects:
+            logger.info("Packed %d objects into object streams", compactor.objects_packed)
+        logger.info("Compressed %d streams, saving %d bytes",
+                    compactor.streams_compressed, compactor.compression_bytes_saved)
+        report['uncompacted_bytes'] = (report['output_bytes'] + compactor.compression_bytes_saved
+                                       + compactor.packing_bytes_saved)
+    book.merge_report = report
+
+def _output_path(output_folder):
+    # Get current username and format timestamp for filename
+    username = getpass.getuser()
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+
+    # Generations run concurrently, so the timestamp alone does not keep
+    # two books apart; a random suffix gives each its own file
+    output_filename = f"book_of_documents_{username}_{timestamp}_{uuid.uuid4().hex[:12]}.pdf"
+    return os.path.join(output_folder, output_filename)
+
+def prepare_book(documents, translations, pdf_utils_module, upload_folder, output_folder,
+                 metadata_cache, logger, progress):
+    """Render the front matter and build the merge manifest.
+
+    The cover, index and receipt are rendered into memory buffers that go
+    into the manifest directly. Returns (book, manifest, output_path).
+    """
+    # Create a new Book instance with all documents
+    book = _new_book(documents)
+    cover, index, receipt = io.BytesIO(), io.BytesIO(), io.BytesIO()
+
+    progress(stage='cover')
+    logger.info("Creating cover, index and receipt pages...")
+    pdf_utils_module.render_front_matter(book, translations, cover, index, receipt)
+    _check_rendered([cover, index, receipt])
+
+    # Build the merge manifest from the Document records, in the order
+    # they appear in the session
+    progress(stage='validate')
+    manifest = [
+        ManifestEntry(cover, None, "Cover Page"),
+        ManifestEntry(index, None, "Index")
+    ]
+    with stage('validation'):
+        manifest += _document_entries(documents, pdf_utils_module, upload_folder, metadata_cache, logger)
+
+    # Add receipt at the end
+    manifest.append(ManifestEntry(receipt, None, "Receipt"))
+
+    return book, manifest, _output_path(output_folder)
+
+def build_book(documents, translations, pdf_utils_module, upload_folder, output_folder,
+               metadata_cache, logger, progress=None, book_cache=None, cache_key=None,
+               scratch_folder=None, streaming_merge_min_bytes=None, dedup=False,
+               compact=None, compact_min_bytes=None, linearize=False, slow_seconds=None):
+    """Run the cover, index, receipt, validate and merge pipeline.
+
+    Needs no request context, so it can run on a worker thread; progress
+    is called with keyword arguments (stage, documents_merged,
+    documents_total, bytes_written). With a book_cache, the body is reused
+    under cache_key and merged under scratch_folder on a miss. The merge
+    streams once the documents reach streaming_merge_min_bytes, writing
+    streams shared between documents once with dedup. compact packs the
+    output into object streams (None: once the documents reach
+    compact_min_bytes); linearize writes it for fast web view. Savings go
+    into book.merge_report; a generation taking slow_seconds or more logs
+    its stage times. Returns the Book with its output_path set.
+    """
+    progress = progress or _no_progress
+    timer = GenerationTimer()
+    with timer.activate():
+        if book_cache is not None:
+            book = _build_cached_book(documents, translations, pdf_utils_module, upload_folder,
+                                      output_folder, metadata_cache, logger, progress,
+                                      book_cache, cache_key, scratch_folder, streaming_merge_min_bytes,
+                                      dedup, compact, compact_min_bytes, linearize)
+        else:
+            book = _build_merged_book(documents, translations, pdf_utils_module, upload_folder,
+                                      output_folder, metadata_cache, logger, progress,
+                                      streaming_merge_min_bytes, dedup, compact, compact_min_bytes,
+                                      linearize)
+    timer.finish(logger, slow_seconds)
+    return book
+
+def _build_merged_book(documents, translations, pdf_utils_module, upload_folder, output_folder,
+                       metadata_cache, logger, progress, streaming_merge_min_bytes, dedup,
+                       compact, compact_min_bytes, linearize):
+    """build_book without the book cache: merge the whole book."""
+    book, manifest, output_path = prepare_book(
+        documents, translations, pdf_utils_module, upload_folder, output_folder,
+        metadata_cache, logger, progress)
+
+    progress(stage='merge', documents_merged=0, documents_total=len(manifest) - 3)
+    logger.info("Merging %d PDFs to: %s", len(manifest), output_path)
+    # Only the uploaded files are parsed from disk
+    document_paths = [entry.path for entry in manifest[2:-1]]
+    streaming, deduplicator, compactor = _merge_options(
+        manifest[2:-1], streaming_merge_min_bytes, dedup, compact, compact_min_bytes, linearize, logger)
+    parses_before = get_parse_counts(document_paths)
+    started = time.perf_counter()
+    with stage('merge'):
+        pdf_utils_module.merge_pdfs(manifest, output_path, progress=progress, streaming=streaming,
+                                    dedup=deduplicator, compact=compactor, linearize=linearize)
+    merge_seconds = time.perf_counter() - started
+    parses_after = get_parse_counts(document_paths)
+    logger.info("Parse counts for this generation: %s", ", ".join(
+        f"{os.path.basename(path)}={parses_after[path] - parses_before[path]}"
+        for path in document_paths))
+    book.output_path = output_path
+
+    # Verify the output file was created successfully
+    if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
+        raise FileNotFoundError("Generated PDF file is missing or empty")
+    _record_merge(book, deduplicator, compactor, merge_seconds, output_path, logger)
+
+    logger.info("Successfully generated Book of Documents: %s", output_path)
+    return book
+
+def _build_cached_book(documents, translations, pdf_utils_module, upload_folder, output_folder,
+                      metadata_cache, logger, progress, book_cache, cache_key, scratch_folder,
+                      streaming_merge_min_bytes, dedup, compact, compact_min_bytes, linearize):
+    """build_book through the book cache: merge the body only on a miss."""
+    book = _new_book(documents)
+    cover, receipt = io.BytesIO(), io.BytesIO()
+    index = None
+    temp_dir = None
+    body = None
+    deduplicator = compactor = merge_seconds = None
+    try:
+        body = book_cache.open(cache_key)
+        if body is None:
+            logger.info("Book cache miss for %s", cache_key)
+            # The index is part of the cached body, so it is only needed on a miss
+            index = io.BytesIO()
+
+        progress(stage='cover')
+        logger.info("Creating front matter pages...")
+        pdf_utils_module.render_front_matter(book, translations, cover, index, receipt)
+        _check_rendered([page for page in (cover, index, receipt) if page is not None])
+
+        if body is None:
+            progress(stage='validate')
+            with stage('validation'):
+                entries = _document_entries(documents, pdf_utils_module, upload_folder, metadata_cache, logger)
+
+            # The merged body is the one part that goes to disk
+            progress(stage='merge', documents_merged=0, documents_total=len(entries))
+            if scratch_folder:
+                os.makedirs(scratch_folder, exist_ok=True)
+            temp_dir = tempfile.mkdtemp(dir=scratch_folder)
+            body_path = os.path.join(temp_dir, 'body.pdf')
+            logger.info("Merging %d PDFs into the book body", len(entries) + 1)
+            streaming, deduplicator, compactor = _merge_options(
+                entries, streaming_merge_min_bytes, dedup, compact, compact_min_bytes, linearize, logger)
+            started = time.perf_counter()
+            with stage('merge'):
+                # The index is not counted in documents_total; merge_body reports the entries after it
+                pdf_utils_module.merge_body([ManifestEntry(index, None, "Index")] + entries, body_path,
+                                            progress=progress, streaming=streaming, dedup=deduplicator,
+                                            compact=compactor)
+            merge_seconds = time.perf_counter() - started
+            body = book_cache.put(cache_key, body_path)
+            if body is None:
+                # Larger than the whole quota; use it uncached
+                body = open(body_path, 'rb')
+        else:
+            logger.info("Book cache hit for %s", cache_key)
+            progress(stage='merge', documents_merged=len(documents), documents_total=len(documents))
+
+        output_path = _output_path(output_folder)
+        logger.info("Adding cover and receipt to the book body: %s", output_path)
+        with stage('merge'):
+            pdf_utils_module.splice_book(cover, body, receipt, output_path, linearize=linearize)
+        progress(bytes_written=os.path.getsize(output_path))
+        book.output_path = output_path
+        _record_merge(book, deduplicator, compactor, merge_seconds, output_path, logger)
+
+        logger.info("Successfully generated Book of Documents: %s", output_path)
+        return book
+    finally:
+        if body is not None:
+            body.close()
+        if temp_dir is not None:
+            _cleanup(temp_dir, logger)
+
+def stream_book(documents, translations, pdf_utils_module, upload_folder, output_folder,
+                metadata_cache, logger, save_copy=False, dedup=False, compact=False, slow_seconds=None):
+    """Render the front matter now and return a generator of book bytes.
+
+    Front-matter errors are raised before any byte is produced. The merge
+    itself runs as the generator is consumed; the on-disk copy in
+    output_folder is only written when save_copy is set. dedup and compact
+    work as in build_book, except that compact is never automatic here,
+    as does slow_seconds; the merge stage includes the time the client
+    takes to receive the book. Returns (book, output_filename, chunks).
+    """
+    timer = GenerationTimer()
+    with timer.activate():
+        book, manifest, output_path = prepare_book(
+            documents, translations, pdf_utils_module, upload_folder, output_folder,
+            metadata_cache, logger, _no_progress)
+    if save_copy:
+        book.output_path = output_path
+    from utils.pdf_stream_writer import StreamDeduplicator, OutputCompactor
+    deduplicator = StreamDeduplicator() if dedup else None
+    compactor = OutputCompactor() if compact else None
+
+    def chunks():
+        logger.info("Streaming %d PDFs%s", len(manifest),
+                    f" with a copy at: {output_path}" if save_copy else "")
+        with timer.activate(), stage('merge'):
+            for chunk in pdf_utils_module.stream_pdfs(manifest, output_path if save_copy else None,
+                                                      dedup=deduplicator, compact=compactor):
+                if chunk:
+                    yield chunk
+        timer.finish(logger, slow_seconds)
+        if deduplicator is not None:
+            book.merge_report.update(deduplicator.report())
+        if compactor is not None:
+            book.merge_report.update(compactor.report())
+        logger.info("Finished streaming Book of Documents")
+
+    return book, os.path.basename(output_path), chunks()
@@ -0,0 +1,161 @@
+import os
+import json
+import errno
+import shutil
+import time
+import hashlib
+import sqlite3
+import threading
+from contextlib import closing
+
+def book_cache_key(documents, language, backend, dedup=False, compact=None, linearize=False):
+    """Key for a book body: the documents in order, the language, the backend
+    and the dedup, compact and linearize settings (a compacted body packs
+    its objects only when the book is not linearized).
+
+    Besides each content hash the key covers everything the index and the
+    bookmarks print about a document, so a renamed upload is not served a
+    stale body.
+    """
+    parts = [language, backend, dedup, compact, linearize] + [
+        [doc.content_hash, doc.original_filename, doc.status, doc.page_count]
+        for doc in documents
+    ]
+    return hashlib.sha256(json.dumps(parts).encode('utf-8')).hexdigest()
+
+class BookCache:
+    """On-disk cache of assembled book bodies with a byte quota.
+
+    A body is the index plus every document, merged and bookmarked, i.e.
+    the whole book except the timestamped cover and receipt. Bodies live
+    in root as <key>.pdf and are indexed in a SQLite table; the least
+    recently used bodies are evicted once the total size exceeds max_bytes.
+    """
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.db_path = os.path.join(root, 'books.sqlite3')
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._stats_lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS books ('
+                'cache_key TEXT PRIMARY KEY, '
+                'size INTEGER NOT NULL, '
+                'last_used REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS books_last_used ON books (last_used)')
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def path_for(self, cache_key):
+        return os.path.join(self.root, cache_key + '.pdf')
+
+    def open(self, cache_key):
+        """Open a cached body for reading, or return None on a miss.
+
+        The file is opened while the index is locked, so a concurrent
+        eviction cannot remove it first.
+        """
+        with closing(self._connect()) as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            body = None
+            if conn.execute('SELECT 1 FROM books WHERE cache_key = ?', (cache_key,)).fetchone():
+                try:
+                    body = open(self.path_for(cache_key), 'rb')
+                    conn.execute(
+                        'UPDATE books SET last_used = ? WHERE cache_key = ?',
+                        (time.time(), cache_key)
+                    )
+                except FileNotFoundError:
+                    conn.execute('DELETE FROM books WHERE cache_key = ?', (cache_key,))
+            conn.execute('COMMIT')
+        self._count('hits' if body else 'misses')
+        return body
+
+    def put(self, cache_key, body_path):
+        """Move a freshly merged body into the cache, evicting LRU bodies over quota.
+
+        Returns the cached body opened for reading, or None (leaving
+        body_path in place) when the body alone is larger than the quota.
+        """
+        size = os.path.getsize(body_path)
+        if size > self.max_bytes:
+            return None
+        with closing(self._connect()) as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._move_in(body_path, self.path_for(cache_key))
+                conn.execute(
+                    'INSERT OR REPLACE INTO books (cache_key, size, last_used) VALUES (?, ?, ?)',
+                    (cache_key, size, time.time())
+                )
+                total = conn.execute('SELECT SUM(size) FROM books').fetchone()[0]
+                evicted = 0
+                for old_key, old_size in conn.execute(
+                        'SELECT cache_key, size FROM books WHERE cache_key != ? ORDER BY last_used',
+                        (cache_key,)).fetchall():
+                    if total <= self.max_bytes:
+                        break
+                    conn.execute('DELETE FROM books WHERE cache_key = ?', (old_key,))
+                    try:
+                        os.remove(self.path_for(old_key))
+                    except FileNotFoundError:
+                        pass
+                    total -= old_size
+                    evicted += 1
+                body = open(self.path_for(cache_key), 'rb')
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        if evicted:
+            self._count('evictions', evicted)
+        return body
+
+    def _move_in(self, body_path, cache_path):
+        try:
+            os.replace(body_path, cache_path)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            # The scratch folder is on another file system (e.g. tmpfs); copy
+            # next to the target first so readers never see a partial body
+            part_path = cache_path + '.part'
+            shutil.copyfile(body_path, part_path)
+            os.replace(part_path, cache_path)
+            os.remove(body_path)
+
+    def stats(self):
+        """Hit/miss counters and current disk usage."""
+        with closing(self._connect()) as conn:
+            entries, size = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM books').fetchone()
+        with self._stats_lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': entries,
+                'bytes': size,
+                'max_bytes': self.max_bytes
+            }
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+def get_book_cache(root, max_bytes):
+    """Return the shared BookCache for a directory."""
+    key = os.path.abspath(root)
+    with _caches_lock:
+        if key not in _caches:
+            _caches[key] = BookCache(root, max_bytes)
+        return _caches[key]
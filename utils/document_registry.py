@@ -0,0 +1,221 @@
+import os
+import json
+import sqlite3
+import threading
+from contextlib import closing
+from models.document import Document
+
+class DocumentRegistry:
+    """Server-side store of each session's ordered document list.
+
+    Rows are keyed by (session_key, document id) and ordered by a position
+    column, so the session cookie only needs to carry the opaque key.
+    Lookups, deletes and inserts touch single rows; listing reads one
+    session's rows in order.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS documents ('
+                'session_key TEXT NOT NULL, '
+                'id TEXT NOT NULL, '
+                'position REAL NOT NULL, '
+                'data TEXT NOT NULL, '
+                'PRIMARY KEY (session_key, id))'
+            )
+            conn.execute(
+                'CREATE INDEX IF NOT EXISTS documents_position '
+                'ON documents (session_key, position)'
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def add(self, session_key, documents):
+        """Append Documents to the end of a session's list."""
+        with closing(self._connect()) as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            last = conn.execute(
+                'SELECT MAX(position) FROM documents WHERE session_key = ?',
+                (session_key,)
+            ).fetchone()[0]
+            start = 0 if last is None else last + 1
+            conn.executemany(
+                'INSERT INTO documents (session_key, id, position, data) VALUES (?, ?, ?, ?)',
+                [(session_key, doc.id, start + i, json.dumps(doc.to_dict()))
+                 for i, doc in enumerate(documents)]
+            )
+            conn.execute('COMMIT')
+
+    def list(self, session_key):
+        """Return a session's Documents in order."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                'SELECT data FROM documents WHERE session_key = ? ORDER BY position',
+                (session_key,)
+            ).fetchall()
+        return [Document.from_dict(json.loads(row[0])) for row in rows]
+
+    def get(self, session_key, document_id):
+        """Return one Document, or None if the session does not have it."""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                'SELECT data FROM documents WHERE session_key = ? AND id = ?',
+                (session_key, document_id)
+            ).fetchone()
+        return None if row is None else Document.from_dict(json.loads(row[0]))
+
+    def remove(self, session_key, document_id):
+        """Delete one document and return it, or None if it was not found."""
+        with closing(self._connect()) as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute(
+                'SELECT data FROM documents WHERE session_key = ? AND id = ?',
+                (session_key, document_id)
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    'DELETE FROM documents WHERE session_key = ? AND id = ?',
+                    (session_key, document_id)
+                )
+            conn.execute('COMMIT')
+        return None if row is None else Document.from_dict(json.loads(row[0]))
+
+    def clear(self, session_key):
+        """Delete all of a session's documents and return them."""
+        with closing(self._connect()) as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            rows = conn.execute(
+                'SELECT data FROM documents WHERE session_key = ?', (session_key,)
+            ).fetchall()
+            conn.execute('DELETE FROM documents WHERE session_key = ?', (session_key,))
+            conn.execute('COMMIT')
+        return [Document.from_dict(json.loads(row[0])) for row in rows]
+
+    def reorder(self, session_key, order):
+        """Put the listed document IDs first, in the given order.
+
+        Documents missing from order keep their relative order after them.
+        """
+        with closing(self._connect()) as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            # Shift everything past the new positions so unlisted rows
+            # cannot collide with them
+            low = conn.execute(
+                'SELECT MIN(position) FROM documents WHERE session_key = ?', (session_key,)
+            ).fetchone()[0]
+            if low is not None and low < len(order):
+                conn.execute(
+                    'UPDATE documents SET position = position + ? WHERE session_key = ?',
+                    (len(order) - low, session_key)
+                )
+            conn.executemany(
+                'UPDATE documents SET position = ? WHERE session_key = ? AND id = ?',
+                [(i, session_key, document_id) for i, document_id in enumerate(order)]
+            )
+            conn.execute('COMMIT')
+
+    def move(self, session_key, document_id, before_id=None):
+        """Move one document in front of another, or to the end if before_id is None.
+
+        Only the moved row is rewritten: it takes the midpoint between its
+        new neighbours' positions, each found with one index lookup. When
+        repeated moves into the same gap exhaust float precision the session
+        is renumbered once. Returns False if either document is not in the
+        session.
+        """
+        with closing(self._connect()) as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                position = None
+                if self._position(conn, session_key, document_id) is not None:
+                    if before_id is None:
+                        last = self._nearest_before(conn, session_key, document_id, None)
+                        position = 0 if last is None else last + 1
+                    else:
+                        position = self._position_before(conn, session_key, document_id, before_id)
+                if position is not None:
+                    conn.execute(
+                        'UPDATE documents SET position = ? WHERE session_key = ? AND id = ?',
+                        (position, session_key, document_id)
+                    )
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        return position is not None
+
+    def _position(self, conn, session_key, document_id):
+        row = conn.execute(
+            'SELECT position FROM documents WHERE session_key = ? AND id = ?',
+            (session_key, document_id)
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def _nearest_before(self, conn, session_key, document_id, position):
+        """Highest position below position (or overall if None), ignoring document_id."""
+        if position is None:
+            rows = conn.execute(
+                'SELECT id, position FROM documents WHERE session_key = ? '
+                'ORDER BY position DESC LIMIT 2',
+                (session_key,)
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                'SELECT id, position FROM documents WHERE session_key = ? AND position < ? '
+                'ORDER BY position DESC LIMIT 2',
+                (session_key, position)
+            ).fetchall()
+        for row_id, row_position in rows:
+            if row_id != document_id:
+                return row_position
+        return None
+
+    def _position_before(self, conn, session_key, document_id, before_id):
+        if before_id == document_id:
+            return self._position(conn, session_key, document_id)
+        for attempt in range(2):
+            before = self._position(conn, session_key, before_id)
+            if before is None:
+                return None
+            previous = self._nearest_before(conn, session_key, document_id, before)
+            if previous is None:
+                return before - 1
+            position = (previous + before) / 2
+            if previous < position < before:
+                return position
+            self._renumber(conn, session_key)
+        raise RuntimeError("could not find a free position between documents")
+
+    def _renumber(self, conn, session_key):
+        """Spread a session's positions back out to 0, 1, 2, ..."""
+        ids = conn.execute(
+            'SELECT id FROM documents WHERE session_key = ? ORDER BY position',
+            (session_key,)
+        ).fetchall()
+        conn.executemany(
+            'UPDATE documents SET position = ? WHERE session_key = ? AND id = ?',
+            [(i, session_key, row[0]) for i, row in enumerate(ids)]
+        )
+
+    def count(self, session_key):
+        with closing(self._connect()) as conn:
+            return conn.execute(
+                'SELECT COUNT(*) FROM documents WHERE session_key = ?', (session_key,)
+            ).fetchone()[0]
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+def get_document_registry(db_path):
+    """Return the shared DocumentRegistry for a database path."""
+    key = os.path.abspath(db_path)
+    with _registries_lock:
+        if key not in _registries:
+            _registries[key] = DocumentRegistry(db_path)
+        return _registries[key]
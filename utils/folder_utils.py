@@ -1,8 +1,7 @@
 import os
-import shutil
 from models.document import Document
 
-def process_folder(folder_path, upload_folder):
+def process_folder(folder_path, blob_store):
     """Process a folder and return a list of Document objects."""
     documents = []
     
@@ -17,21 +16,16 @@ def process_folder(folder_path, upload_folder):
             
             # Only process PDF files
             if filename.lower().endswith('.pdf'):
-                # Create a unique filename in the upload folder
-                new_filename = os.path.join(
-                    upload_folder, 
-                    f"{os.path.splitext(filename)[0]}_{os.path.getmtime(file_path):.0f}.pdf"
-                )
-                
-                # Copy the file to the upload folder
-                shutil.copy2(file_path, new_filename)
+                # Store the file by content hash
+                content_hash, stored_name, _ = blob_store.store_file(file_path)
                 
                 # Create a document record
                 rel_path = os.path.relpath(file_path, folder_path)
                 doc = Document(
-                    filename=os.path.basename(new_filename),
+                    filename=stored_name,
                     original_filename=rel_path,
-                    file_type='pdf'
+                    file_type='pdf',
+                    content_hash=content_hash
                 )
                 documents.append(doc)
     
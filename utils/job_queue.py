@@ -0,0 +1,118 @@
+import time
+import uuid
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+class Job:
+    """State of one background generation, shared with progress readers."""
+
+    FINISHED = ('done', 'error')
+
+    def __init__(self):
+        self.id = str(uuid.uuid4())
+        self.status = 'queued'
+        self.stage = None
+        self.documents_merged = 0
+        self.documents_total = 0
+        self.bytes_written = 0
+        self.output_path = None
+        self.output_filename = None
+        self.error = None
+        self.details = []
+        self.merge_report = {}
+        self.created_at = time.time()
+        self.finished_at = None
+        self.version = 0
+        self._changed = threading.Condition()
+
+    def update(self, **fields):
+        """Set fields and wake up anyone waiting for progress."""
+        with self._changed:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self.version += 1
+            self._changed.notify_all()
+
+    def wait_for_change(self, version, timeout=None):
+        """Block until the job changes past version, or timeout expires."""
+        with self._changed:
+            self._changed.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+    @property
+    def finished(self):
+        return self.status in self.FINISHED
+
+    def to_dict(self):
+        with self._changed:
+            return {
+                'id': self.id,
+                'status': self.status,
+                'stage': self.stage,
+                'documents_merged': self.documents_merged,
+                'documents_total': self.documents_total,
+                'bytes_written': self.bytes_written,
+                'output_filename': self.output_filename,
+                'error': self.error,
+                'details': self.details,
+                'merge_report': self.merge_report
+            }
+
+class JobQueue:
+    """Bounded worker pool for book generation jobs.
+
+    At most max_workers jobs run at once; the rest wait in the queue.
+    Finished jobs are forgotten after retention_seconds.
+    """
+
+    def __init__(self, max_workers, retention_seconds=3600):
+        self.max_workers = max_workers
+        self.retention_seconds = retention_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix='book-generation')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args, **kwargs):
+        """Queue func(*args, progress=job.update, **kwargs) and return its Job.
+
+        func returns a dict of fields (e.g. output_path) set on success.
+        """
+        job = Job()
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, func, args, kwargs)
+        return job
+
+    def _run(self, job, func, args, kwargs):
+        job.update(status='running')
+        try:
+            result = func(*args, progress=job.update, **kwargs) or {}
+            job.update(status='done', stage='done', finished_at=time.time(), **result)
+        except Exception as e:
+            job.update(status='error', error=str(e), finished_at=time.time(),
+                       details=traceback.format_exc().split('\n')[-3:])
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _prune(self):
+        cutoff = time.time() - self.retention_seconds
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished_at and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+_queue = None
+_queue_lock = threading.Lock()
+
+def get_job_queue(max_workers):
+    """Return the process-wide generation queue, creating it on first use."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue(max_workers)
+        return _queue
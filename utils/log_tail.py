@@ -0,0 +1,179 @@
+import os
+import re
+import time
+import logging
+
+BLOCK_SIZE = 8192
+
+# A record starts with its timestamp (text format) or a brace (JSON lines);
+# anything else continues the record above it, e.g. a traceback
+_RECORD_START_RE = re.compile(r'^(\d{4}-\d{2}-\d{2} |\{)')
+_LEVEL_RE = re.compile(r' - (DEBUG|INFO|WARNING|ERROR|CRITICAL) - |"level": "(DEBUG|INFO|WARNING|ERROR|CRITICAL)"')
+
+class RecordFilter:
+    """Matches log records at or above min_level whose text matches pattern.
+
+    min_level is a level name or number (None: any); pattern is a regular
+    expression searched for anywhere in the record (None: any).
+    """
+
+    def __init__(self, min_level=None, pattern=None):
+        if isinstance(min_level, str):
+            level = logging.getLevelName(min_level.upper())
+            if not isinstance(level, int):
+                raise ValueError(f"Unknown log level: {min_level}")
+            min_level = level
+        self.min_level = min_level
+        self.pattern = re.compile(pattern) if pattern else None
+
+    def __call__(self, record):
+        if self.min_level is not None:
+            match = _LEVEL_RE.search(record.split('\n', 1)[0])
+            if not match or logging.getLevelName(match.group(1) or match.group(2)) < self.min_level:
+                return False
+        return self.pattern is None or self.pattern.search(record) is not None
+
+def _reverse_lines(f, end=None):
+    """Lines of a binary file before offset end (default: the end), last first."""
+    position = f.seek(0, os.SEEK_END) if end is None else end
+    remainder = b''
+    while position > 0:
+        size = min(BLOCK_SIZE, position)
+        position -= size
+        f.seek(position)
+        lines = (f.read(size) + remainder).split(b'\n')
+        # The first piece may be the end of a line in the block before
+        remainder = lines.pop(0)
+        for line in reversed(lines):
+            yield line
+    yield remainder
+
+def _decode(line):
+    return line.decode('utf-8', errors='replace').rstrip('\r')
+
+def tail_records(path, count, record_filter=None, end=None):
+    """The last count records of a log file that pass record_filter, oldest first.
+
+    Reads backwards in blocks from offset end (default: the end of the
+    file), so the cost depends on how far back the matching records are
+    rather than on the size of the file.
+    """
+    records = []
+    continuation = []
+    with open(path, 'rb') as f:
+        for raw_line in _reverse_lines(f, end):
+            if len(records) >= count:
+                break
+            line = _decode(raw_line)
+            if not line and not continuation:
+                continue  # The trailing newline
+            continuation.append(line)
+            if _RECORD_START_RE.match(line):
+                record = '\n'.join(reversed(continuation))
+                continuation = []
+                if record_filter is None or record_filter(record):
+                    records.append(record)
+    return records[::-1]
+
+class LogFollower:
+    """Yields records appended to a log file, following it across rotations.
+
+    Starts at the current end of the file. Records are assembled from
+    complete lines and released once the next record starts or the file
+    goes quiet. When the path is renamed away (rotation) or truncated, the
+    rest of the old file is read and the new file is followed from its
+    start; nothing is read twice.
+    """
+
+    def __init__(self, path, record_filter=None):
+        self.path = path
+        self.record_filter = record_filter
+        self._file = None
+        self._partial = b''
+        self._lines = []
+        self._open(at_end=True)
+
+    def _open(self, at_end=False):
+        try:
+            self._file = open(self.path, 'rb')
+        except FileNotFoundError:
+            self._file = None
+            return
+        if at_end:
+            self._file.seek(0, os.SEEK_END)
+
+    @property
+    def position(self):
+        """Offset in the current file up to which records have been read"""
+        return self._file.tell() if self._file is not None else 0
+
+    def _rotated(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False  # Between the rename and the new file; keep reading the old one
+        current = os.fstat(self._file.fileno())
+        return stat.st_ino != current.st_ino or stat.st_size < self._file.tell()
+
+    def _read_lines(self):
+        data = self._file.read()
+        if not data:
+            return []
+        lines = (self._partial + data).split(b'\n')
+        self._partial = lines.pop()
+        return [_decode(line) for line in lines]
+
+    def _release(self):
+        if not self._lines:
+            return []
+        record = '\n'.join(self._lines)
+        self._lines = []
+        if self.record_filter is None or self.record_filter(record):
+            return [record]
+        return []
+
+    def poll(self):
+        """Records completed since the last poll."""
+        if self._file is None:
+            self._open()
+            if self._file is None:
+                return []
+        lines = self._read_lines()
+        if not lines and self._rotated():
+            # The old file is finished; whatever is left of it was read above
+            self._file.close()
+            self._partial = b''
+            self._open()
+            if self._file is not None:
+                lines = self._read_lines()
+        records = []
+        for line in lines:
+            if _RECORD_START_RE.match(line):
+                records += self._release()
+            self._lines.append(line)
+        if not lines:
+            # Quiet: the record in progress is complete
+            records += self._release()
+        return records
+
+    def follow(self, interval=0.5, heartbeat=None):
+        """Yield records as they arrive; None every heartbeat seconds of silence"""
+        quiet_since = time.monotonic()
+        try:
+            while True:
+                records = self.poll()
+                for record in records:
+                    yield record
+                if records:
+                    quiet_since = time.monotonic()
+                elif heartbeat is not None and time.monotonic() - quiet_since >= heartbeat:
+                    quiet_since = time.monotonic()
+                    yield None
+                time.sleep(interval)
+        finally:
+            self.close()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,94 @@
+import os
+import json
+import queue
+import atexit
+import logging
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+SOURCE_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(pathname)s:%(lineno)d - %(message)s'
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger and message.
+
+    Records come off the queue already rendered, so a traceback is part of
+    the message.
+    """
+
+    def format(self, record):
+        return json.dumps({
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        })
+
+class LoggerNameFilter(logging.Filter):
+    """Pass records from the named loggers and their children."""
+
+    def __init__(self, names):
+        super().__init__()
+        self.names = tuple(names)
+
+    def filter(self, record):
+        return any(record.name == name or record.name.startswith(name + '.') for name in self.names)
+
+def env_level(name, default):
+    """A logging level from an environment variable such as LOG_LEVEL=DEBUG"""
+    level = logging.getLevelName(os.environ.get(name, default).upper())
+    return level if isinstance(level, int) else logging.getLevelName(default)
+
+def env_flag(name):
+    return os.environ.get(name, '').lower() in ('1', 'true', 'yes')
+
+def stop_listener(listener):
+    """Flush and stop a QueueListener unless it was already stopped"""
+    if listener._thread is not None:
+        listener.stop()
+
+def configure_logging(log_path, file_loggers, level=None, root_level=None, json_output=None,
+                      source_location=None, max_bytes=10485760, backup_count=5):
+    """Send all logging through a queue to a listener thread.
+
+    Request threads only put records on the queue; the console handler and
+    the rotating log file are written by the listener. The file receives
+    records from file_loggers only. Unset arguments come from the
+    environment: LOG_LEVEL (file_loggers, default INFO), LOG_ROOT_LEVEL
+    (everything else, default INFO), LOG_JSON=1 for JSON lines in the
+    file, and LOG_SOURCE=1 to add pathname:lineno to each file line.
+    Returns the started QueueListener, which is stopped at exit.
+    """
+    level = level if level is not None else env_level('LOG_LEVEL', 'INFO')
+    root_level = root_level if root_level is not None else env_level('LOG_ROOT_LEVEL', 'INFO')
+    json_output = json_output if json_output is not None else env_flag('LOG_JSON')
+    source_location = source_location if source_location is not None else env_flag('LOG_SOURCE')
+
+    log_dir = os.path.dirname(log_path)
+    if log_dir:
+        os.makedirs(log_dir, exist_ok=True)
+
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    file_handler = RotatingFileHandler(log_path, maxBytes=max_bytes, backupCount=backup_count)
+    file_handler.addFilter(LoggerNameFilter(file_loggers))
+    if json_output:
+        file_handler.setFormatter(JsonFormatter())
+    else:
+        file_handler.setFormatter(logging.Formatter(SOURCE_FORMAT if source_location else TEXT_FORMAT))
+
+    records = queue.SimpleQueue()
+    listener = QueueListener(records, console_handler, file_handler)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(QueueHandler(records))
+    root.setLevel(root_level)
+    for name in file_loggers:
+        logging.getLogger(name).setLevel(level)
+    if not source_location:
+        # Skip the caller lookup on every record ("Optimization" in the logging HOWTO)
+        logging._srcfile = None
+        logging.logMultiprocessing = False
+    listener.start()
+    atexit.register(stop_listener, listener)
+    return listener
@@ -0,0 +1,158 @@
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from collections import Counter, namedtuple
+from utils.metrics import record_document_timing
+
+# One entry per PDF handed to the merge engine. path is a file path or, for
+# front matter rendered in memory, a binary buffer. page_count is the count
+# already known from upload (None for freshly rendered front matter).
+ManifestEntry = namedtuple('ManifestEntry', ['path', 'page_count', 'title'])
+
+# A child of the app logger, so merge errors reach the log file and /logs
+logger = logging.getLogger('book_of_documents.merge')
+
+_parse_lock = threading.Lock()
+_parse_counts = Counter()
+
+def record_parse(pdf_path, count=1):
+    """Count a full parse of a PDF file; in-memory buffers are not counted."""
+    if not isinstance(pdf_path, str):
+        return
+    with _parse_lock:
+        _parse_counts[os.path.abspath(pdf_path)] += count
+
+def get_parse_counts(pdf_paths=None):
+    """Return how many times each PDF has been parsed by this process."""
+    with _parse_lock:
+        if pdf_paths is None:
+            return dict(_parse_counts)
+        return {path: _parse_counts.get(os.path.abspath(path), 0) for path in pdf_paths}
+
+def reset_parse_counts():
+    """Clear the parse counter."""
+    with _parse_lock:
+        _parse_counts.clear()
+
+def as_manifest(pdf_paths):
+    """Accept a list of paths or ManifestEntry objects and return entries."""
+    manifest = []
+    for item in pdf_paths:
+        if isinstance(item, ManifestEntry):
+            manifest.append(item)
+        else:
+            manifest.append(ManifestEntry(item, None, os.path.basename(item)))
+    return manifest
+
+@contextmanager
+def open_source(source):
+    """Open a manifest path for reading, or rewind an in-memory buffer."""
+    if isinstance(source, str):
+        with open(source, 'rb') as f:
+            yield f
+    else:
+        source.seek(0)
+        yield source
+
+def source_name(source):
+    """Printable name of a manifest path or buffer."""
+    return source if isinstance(source, str) else '<in-memory PDF>'
+
+def append_entry(merger, entry):
+    """Append a manifest entry to a PdfMerger and return the pages added.
+
+    The merger's own reader is the only parse of the file; the page count
+    comes from the pages it added, so the input is never reopened. Only the
+    parse is timed: PdfMerger copies every document in its final write.
+    """
+    before = len(merger.pages)
+    if not isinstance(entry.path, str):
+        entry.path.seek(0)
+    started = time.perf_counter()
+    merger.append(entry.path)
+    record_parse(entry.path)
+    if isinstance(entry.path, str):
+        record_document_timing(entry.title, time.perf_counter() - started)
+    return len(merger.pages) - before
+
+def append_documents(merger, entries, progress=None, parent=None):
+    """Append document entries to a PdfMerger with one bookmark each.
+
+    Bookmarks go under parent if given. A document that cannot be read is
+    logged and left out. Returns the page count after the last document.
+    """
+    current_page = len(merger.pages)
+    for documents_merged, entry in enumerate(entries, 1):
+        try:
+            # Add the document to the merger
+            added_pages = append_entry(merger, entry)
+            
+            # Create a bookmark at the current page number
+            merger.add_outline_item(entry.title, current_page, parent=parent)
+            
+            current_page += added_pages
+        except Exception as e:
+            logger.warning("Error merging %s: %s", source_name(entry.path), e)
+        if progress:
+            progress(documents_merged=documents_merged, documents_total=len(entries))
+    return current_page
+
+def stream_documents(writer, entries, progress=None, parent=None):
+    """Append document entries to a StreamingPdfWriter with one bookmark each.
+
+    Bookmarks go under parent if given. A document that cannot be read is
+    logged and left out. Yields after each document so the caller can
+    flush what was written.
+    """
+    for documents_merged, entry in enumerate(entries, 1):
+        current_page = writer.page_count
+        try:
+            writer.append(entry.path, entry.title)
+            writer.add_outline_item(entry.title, current_page, parent=parent)
+        except Exception as e:
+            logger.warning("Error merging %s: %s", source_name(entry.path), e)
+        if progress:
+            progress(documents_merged=documents_merged, documents_total=len(entries))
+        yield
+
+class ProgressWriter:
+    """File-like wrapper that reports bytes written to a progress callback."""
+
+    def __init__(self, stream, progress):
+        self.stream = stream
+        self.progress = progress
+        self.bytes_written = 0
+
+    def write(self, data):
+        written = self.stream.write(data)
+        self.bytes_written += len(data)
+        self.progress(bytes_written=self.bytes_written)
+        return written
+
+    def tell(self):
+        return self.stream.tell()
+
+    def flush(self):
+        self.stream.flush()
+
+def write_merged(merger, output_path, progress=None):
+    """Write a PdfMerger to output_path, reporting bytes written."""
+    if progress is None:
+        merger.write(output_path)
+        return
+    with open(output_path, 'wb') as output_file:
+        merger.write(ProgressWriter(output_file, progress))
+
+def drain_stream(chunks, progress=None):
+    """Run a stream_pdfs-style generator that writes its own copy to disk.
+
+    The chunks are dropped as they arrive; progress, if given, gets the
+    running bytes_written.
+    """
+    bytes_written = 0
+    for chunk in chunks:
+        bytes_written += len(chunk)
+        if progress:
+            progress(bytes_written=bytes_written)
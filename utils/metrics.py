@@ -0,0 +1,203 @@
+import math
+import time
+import threading
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+THROUGHPUT_BUCKETS = (1e5, 1e6, 5e6, 1e7, 5e7, 1e8, 5e8, 1e9)  # bytes per second
+
+# Inputs named by the slow-generation log entry
+SLOWEST_INPUTS = 5
+
+def _label_text(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+def _number(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """A monotonically increasing count per label set."""
+
+    type_name = 'counter'
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield self.name + _label_text(self.labelnames, key), value
+
+class Histogram:
+    """Observations counted into cumulative buckets per label set."""
+
+    type_name = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][i] += 1
+            series['sum'] += value
+
+    def samples(self):
+        with self._lock:
+            series = sorted((key, dict(value, counts=list(value['counts'])))
+                            for key, value in self._series.items())
+        for key, value in series:
+            for bound, count in zip(self.buckets, value['counts']):
+                yield (self.name + '_bucket' + _label_text(self.labelnames, key, [('le', _number(bound))]),
+                       count)
+            yield self.name + '_sum' + _label_text(self.labelnames, key), value['sum']
+            yield self.name + '_count' + _label_text(self.labelnames, key), value['counts'][-1]
+
+class MetricsRegistry:
+    """Process-wide metrics, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, help_text, labelnames=()):
+        metric = Counter(name, help_text, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, help_text, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(f"{name} {_number(value)}" for name, value in metric.samples())
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = MetricsRegistry()
+
+GENERATION_SECONDS = REGISTRY.histogram(
+    'book_generation_seconds', 'Time to build a book, excluding sending it')
+GENERATION_STAGE_SECONDS = REGISTRY.histogram(
+    'book_generation_stage_seconds', 'Time spent in each book generation stage', ['stage'])
+DOCUMENT_PARSE_SECONDS = REGISTRY.histogram(
+    'document_parse_seconds', 'Time to open and parse one input document while merging')
+DOCUMENT_MERGE_SECONDS = REGISTRY.histogram(
+    'document_merge_seconds', 'Time to copy one parsed input document into the book')
+UPLOADS = REGISTRY.counter('uploads_total', 'Upload requests handled', ['status'])
+UPLOAD_BYTES = REGISTRY.counter('upload_bytes_total', 'Request bytes received by uploads')
+UPLOAD_SECONDS = REGISTRY.histogram('upload_seconds', 'Time to handle one upload request')
+UPLOAD_THROUGHPUT = REGISTRY.histogram(
+    'upload_throughput_bytes_per_second', 'Request bytes per second of each upload',
+    buckets=THROUGHPUT_BUCKETS)
+
+def render_metrics():
+    """All metrics in the Prometheus text exposition format."""
+    return REGISTRY.render()
+
+def record_upload(byte_count, seconds, status):
+    """Count one upload request of byte_count bytes that took seconds."""
+    UPLOADS.inc(status=status)
+    UPLOAD_BYTES.inc(byte_count)
+    UPLOAD_SECONDS.observe(seconds)
+    if seconds > 0:
+        UPLOAD_THROUGHPUT.observe(byte_count / seconds)
+
+def record_send(seconds):
+    """Time from a finished book's response being created to it being closed."""
+    GENERATION_STAGE_SECONDS.observe(seconds, stage='send')
+
+_current = threading.local()
+
+class GenerationTimer:
+    """Stage and per-document timings of one book generation.
+
+    While activated on a thread, stage() and record_document_timing() calls
+    on that thread are collected here as well as in the process-wide
+    histograms, so the generation can report its own slowest inputs.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.documents = []
+
+    @contextmanager
+    def activate(self):
+        previous = getattr(_current, 'timer', None)
+        _current.timer = self
+        try:
+            yield self
+        finally:
+            _current.timer = previous
+
+    def finish(self, logger, slow_seconds=None):
+        """Record the total time; log the stages and slowest inputs if it took slow_seconds or more."""
+        seconds = time.perf_counter() - self.started
+        GENERATION_SECONDS.observe(seconds)
+        if slow_seconds is None or seconds < slow_seconds:
+            return seconds
+        stages = ", ".join(f"{name} {value:.2f}s" for name, value in self.stages.items())
+        slowest = sorted(self.documents, key=lambda doc: doc[1] + (doc[2] or 0), reverse=True)
+        inputs = ", ".join(
+            f"{name} (parse {parse:.2f}s" + (f", merge {merge:.2f}s)" if merge is not None else ")")
+            for name, parse, merge in slowest[:SLOWEST_INPUTS])
+        logger.warning("Slow generation: %.2fs (%s); slowest inputs: %s",
+                       seconds, stages, inputs or 'none merged')
+        return seconds
+
+@contextmanager
+def stage(name):
+    """Time a generation stage into the histogram and the active GenerationTimer."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        GENERATION_STAGE_SECONDS.observe(seconds, stage=name)
+        timer = getattr(_current, 'timer', None)
+        if timer is not None:
+            timer.stages[name] = timer.stages.get(name, 0) + seconds
+
+def record_document_timing(name, parse_seconds, merge_seconds=None):
+    """Record how long one input took to parse and to copy into the book.
+
+    merge_seconds is None where the copy is not separable from the rest
+    of the merge (PdfMerger copies every document in its final write).
+    """
+    DOCUMENT_PARSE_SECONDS.observe(parse_seconds)
+    if merge_seconds is not None:
+        DOCUMENT_MERGE_SECONDS.observe(merge_seconds)
+    timer = getattr(_current, 'timer', None)
+    if timer is not None:
+        timer.documents.append((name, parse_seconds, merge_seconds))
@@ -0,0 +1,105 @@
+import threading
+import importlib
+import importlib.util
+
+# What every backend module provides; see utils.pdf_utils for the signatures
+BACKEND_OPERATIONS = (
+    'get_pdf_page_count',
+    'get_pdf_metadata',
+    'get_pdf_page_sizes',
+    'warm_up_front_matter',
+    'render_front_matter',
+    'create_cover_page',
+    'create_index_page',
+    'create_receipt_page',
+    'merge_pdfs',
+    'merge_body',
+    'splice_book',
+    'stream_pdfs',
+    'stream_body',
+)
+
+# Backend modules in order of preference, with the package each one needs
+_registered = [
+    ('utils.pdf_utils', 'reportlab'),
+    ('utils.pdf_utils_fpdf', 'fpdf'),
+]
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+class PdfBackend:
+    """A backend module's operations, looked up once.
+
+    Attributes named after BACKEND_OPERATIONS are the module's own
+    functions, so they can be handed to worker processes like the module
+    functions themselves.
+    """
+
+    def __init__(self, module):
+        missing = [name for name in BACKEND_OPERATIONS if not callable(getattr(module, name, None))]
+        if missing:
+            raise ImportError(f"{module.__name__} is not a PDF backend; it lacks {', '.join(missing)}")
+        self.name = module.__name__
+        self.module = module
+        for name in BACKEND_OPERATIONS:
+            setattr(self, name, getattr(module, name))
+
+    def __repr__(self):
+        return f"PdfBackend({self.name!r})"
+
+def register_backend(module_name, requires=None, preferred=False):
+    """Make a backend module available for automatic selection.
+
+    requires names the package the module needs; the backend is only
+    picked automatically when it is installed. A preferred backend is
+    tried before the built-in ones. Any module providing BACKEND_OPERATIONS
+    can also be configured by name without registering it.
+    """
+    entry = (module_name, requires)
+    with _backends_lock:
+        _registered[:] = [item for item in _registered if item[0] != module_name]
+        if preferred:
+            _registered.insert(0, entry)
+        else:
+            _registered.append(entry)
+
+def default_backend_name():
+    """The first registered backend whose required package is installed.
+
+    Checks without importing anything, so ReportLab or FPDF only load when
+    the backend is first used.
+    """
+    for module_name, requires in list(_registered):
+        if requires is None or importlib.util.find_spec(requires) is not None:
+            return module_name
+    raise ImportError("No PDF backend is available; install reportlab or fpdf2")
+
+def get_backend(module_name=None):
+    """Return the backend for a module name (None: the default), importing it on first use."""
+    module_name = module_name or default_backend_name()
+    backend = _backends.get(module_name)
+    if backend is not None:
+        return backend
+    with _backends_lock:
+        if module_name not in _backends:
+            _backends[module_name] = PdfBackend(importlib.import_module(module_name))
+        return _backends[module_name]
+
+def warm_up_backend(module_name, all_translations, logger):
+    """Import a backend and build its front-matter renderers on a background thread.
+
+    The server can take requests meanwhile; a request that needs the
+    backend first waits for the import to finish. Returns the thread.
+    """
+    def warm_up():
+        try:
+            backend = get_backend(module_name)
+            logger.info("Using %s for PDF generation", backend.name)
+            backend.warm_up_front_matter(all_translations)
+        except Exception as e:
+            logger.warning("PDF backend warm-up failed: %s", e)
+
+    thread = threading.Thread(target=warm_up, name='pdf-backend-warm-up', daemon=True)
+    thread.start()
+    return thread
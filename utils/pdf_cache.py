@@ -0,0 +1,129 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from contextlib import closing
+
+class PdfMetadataCache:
+    """Persistent PDF metadata cache keyed by content hash.
+
+    Holds page count, encryption flag and validity for every file seen,
+    and its page sizes once they have been asked for, in a SQLite table
+    bounded to max_entries rows. The least recently used rows are evicted
+    first.
+    """
+
+    def __init__(self, db_path, max_entries=10000):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._stats_lock = threading.Lock()
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS pdf_metadata ('
+                'content_hash TEXT PRIMARY KEY, '
+                'metadata TEXT NOT NULL, '
+                'last_used REAL NOT NULL)'
+            )
+            conn.execute(
+                'CREATE INDEX IF NOT EXISTS pdf_metadata_last_used '
+                'ON pdf_metadata (last_used)'
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def get(self, content_hash):
+        """Return cached metadata for a content hash, or None on a miss."""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                'SELECT metadata FROM pdf_metadata WHERE content_hash = ?',
+                (content_hash,)
+            ).fetchone()
+            if row is None:
+                self._count('misses')
+                return None
+            conn.execute(
+                'UPDATE pdf_metadata SET last_used = ? WHERE content_hash = ?',
+                (time.time(), content_hash)
+            )
+        self._count('hits')
+        return json.loads(row[0])
+
+    def put(self, content_hash, metadata):
+        """Store metadata for a content hash, evicting the LRU rows if full."""
+        with closing(self._connect()) as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO pdf_metadata (content_hash, metadata, last_used) '
+                'VALUES (?, ?, ?)',
+                (content_hash, json.dumps(metadata), time.time())
+            )
+            overflow = conn.execute('SELECT COUNT(*) FROM pdf_metadata').fetchone()[0] - self.max_entries
+            if overflow > 0:
+                conn.execute(
+                    'DELETE FROM pdf_metadata WHERE content_hash IN ('
+                    'SELECT content_hash FROM pdf_metadata ORDER BY last_used LIMIT ?)',
+                    (overflow,)
+                )
+                self._count('evictions', overflow)
+
+    def get_or_load(self, content_hash, pdf_path, loader):
+        """Return metadata from the cache, calling loader(pdf_path) on a miss."""
+        if content_hash:
+            metadata = self.get(content_hash)
+            if metadata is not None:
+                return metadata
+        else:
+            self._count('misses')
+        metadata = loader(pdf_path)
+        if content_hash:
+            self.put(content_hash, metadata)
+        return metadata
+
+    def get_page_sizes(self, content_hash, pdf_path, loader):
+        """Return a file's page sizes, calling loader(pdf_path) the first time they are asked for.
+
+        The sizes are stored with the file's cached metadata; a file with no
+        cached metadata has them read every time.
+        """
+        metadata = self.get(content_hash)
+        if metadata is None:
+            return loader(pdf_path)
+        if metadata.get('page_sizes') is None:
+            metadata['page_sizes'] = loader(pdf_path)
+            self.put(content_hash, metadata)
+        return metadata['page_sizes']
+
+    def stats(self):
+        """Hit/miss counters and current size."""
+        with closing(self._connect()) as conn:
+            entries = conn.execute('SELECT COUNT(*) FROM pdf_metadata').fetchone()[0]
+        with self._stats_lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': entries,
+                'max_entries': self.max_entries
+            }
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+def get_metadata_cache(db_path, max_entries=10000):
+    """Return the shared PdfMetadataCache for a database path."""
+    key = os.path.abspath(db_path)
+    with _caches_lock:
+        if key not in _caches:
+            _caches[key] = PdfMetadataCache(db_path, max_entries)
+        return _caches[key]
@@ -0,0 +1,366 @@
+import io
+import os
+import zlib
+import shutil
+import tempfile
+from collections import deque
+import PyPDF2
+from PyPDF2.generic import IndirectObject, DictionaryObject, ArrayObject
+from utils.merge_utils import open_source
+from utils.pdf_stream_writer import StreamingPdfWriter, PDF_HEADER
+
+# Catalog entries a viewer needs before the first page; they go in the
+# first-page section with the catalog (ISO 32000-1 annex F, part 4)
+OPEN_DOCUMENT_KEYS = ('/ViewerPreferences', '/PageMode', '/Threads', '/OpenAction', '/AcroForm')
+
+# Digits reserved for the offsets in the linearization dictionary and the
+# first-page trailer, which are written before the offsets are known
+OFFSET_DIGITS = 10
+
+def _key(ref):
+    return (ref.idnum, ref.generation)
+
+def _references(obj):
+    """Indirect references inside obj, in order, without resolving them."""
+    found = []
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, IndirectObject):
+            found.append(item)
+        elif isinstance(item, DictionaryObject):
+            stack.extend(reversed(list(dict.values(item))))
+        elif isinstance(item, ArrayObject):
+            stack.extend(reversed(item))
+    return found
+
+def _closure(reader, roots, stop):
+    """Keys of the objects reachable from roots, breadth first, not entering stop."""
+    reached = []
+    seen = set(stop)
+    queue = deque(roots)
+    while queue:
+        ref = queue.popleft()
+        key = _key(ref)
+        if key in seen:
+            continue
+        seen.add(key)
+        reached.append(key)
+        queue.extend(_references(reader.get_object(ref)))
+    return reached
+
+def _entries(obj, keys=None, skip=()):
+    """References in the values of a dictionary, limited to keys / without skip."""
+    return _references(DictionaryObject(
+        (key, value) for key, value in obj.items()
+        if (keys is None or key in keys) and key not in skip
+    ))
+
+def _page_tree(reader, root):
+    """Page references in document order"""
+    pages = []
+    stack = [root]
+    while stack:
+        ref = stack.pop()
+        node = reader.get_object(ref)
+        if '/Kids' in node:
+            stack.extend(reversed(node.raw_get('/Kids').get_object()))
+        else:
+            pages.append(ref)
+    return pages
+
+class LinearizationLayout:
+    """Object order of a linearized file (ISO 32000-1 annex F).
+
+    part4 is the catalog and what a viewer needs to open the document,
+    part6 the first page and everything it uses, part7 each later page
+    followed by the objects only that page uses, part8 the objects later
+    pages share and part9 the rest (page tree, document information).
+    The outline is kept together, at the end of part6 when the document
+    opens showing it and at the start of part9 otherwise.
+    Objects are keys (object number, generation) of the input.
+    """
+
+    def __init__(self, reader):
+        if '/Encrypt' in reader.trailer:
+            raise ValueError("Encrypted PDFs cannot be linearized")
+        catalog_ref = reader.trailer.raw_get('/Root')
+        catalog = reader.get_object(catalog_ref)
+        self.pages = [_key(ref) for ref in _page_tree(reader, catalog.raw_get('/Pages'))]
+        if not self.pages:
+            raise ValueError("PDF has no pages")
+        stop = set(self.pages) | {_key(catalog_ref)}
+
+        # Objects each page uses; a page's /Parent is the page tree, not content
+        self.page_objects = []
+        self.users = {}
+        for index, page_key in enumerate(self.pages):
+            page = reader.get_object(IndirectObject(page_key[0], page_key[1], reader))
+            reached = _closure(reader, _entries(page, skip=('/Parent',)), stop)
+            for key in reached:
+                self.users.setdefault(key, []).append(index)
+            self.page_objects.append(reached)
+            # Keep PyPDF2's object cache to about one page
+            reader.resolved_objects.clear()
+
+        self.part6 = [self.pages[0]] + self.page_objects[0]
+        self.outlines = []
+        if '/Outlines' in catalog:
+            self.outlines = _closure(reader, [catalog.raw_get('/Outlines')],
+                                     stop | set(self.part6) | set(self.users))
+        outlines_first = catalog.get('/PageMode') == '/UseOutlines'
+        if outlines_first:
+            # Shown with the first page, so they end the first-page section
+            self.part6 += self.outlines
+        self.part7 = []
+        self.object_counts = [len(self.part6)]
+        for index in range(1, len(self.pages)):
+            private = [key for key in self.page_objects[index] if self.users[key] == [index]]
+            self.part7 += [self.pages[index]] + private
+            self.object_counts.append(1 + len(private))
+        placed = stop | set(self.part6) | set(self.part7) | set(self.outlines)
+        self.part8 = []
+        for reached in self.page_objects[1:]:
+            for key in reached:
+                if key not in placed:
+                    placed.add(key)
+                    self.part8.append(key)
+
+        self.part4 = [_key(catalog_ref)] + _closure(reader, _entries(catalog, OPEN_DOCUMENT_KEYS), placed)
+        placed.update(self.part4)
+        info = [reader.trailer.raw_get('/Info')] if '/Info' in reader.trailer else []
+        self.part9 = _closure(reader, _entries(catalog) + info, placed)
+        if not outlines_first:
+            self.part9 = self.outlines + self.part9
+        reader.resolved_objects.clear()
+
+    def shared_identifiers(self, index):
+        """Positions in the shared object hint table of the shared objects page index uses."""
+        if index == 0:
+            return []
+        if not hasattr(self, '_shared_positions'):
+            self._shared_positions = {key: i for i, key in enumerate(self.part6 + self.part8)}
+        return [self._shared_positions[key] for key in self.page_objects[index]
+                if len(self.users[key]) > 1]
+
+class _BitWriter:
+    """Packs unsigned integers of any bit width, most significant bit first."""
+
+    def __init__(self):
+        self.data = bytearray()
+        self.value = 0
+        self.count = 0
+
+    def write(self, value, bits):
+        self.value = (self.value << bits) | value
+        self.count += bits
+        while self.count >= 8:
+            self.count -= 8
+            self.data.append((self.value >> self.count) & 0xff)
+        self.value &= (1 << self.count) - 1
+
+    def pad(self):
+        """Fill the current byte with zero bits"""
+        if self.count:
+            self.write(0, 8 - self.count)
+
+    def write_items(self, values, bits):
+        for value in values:
+            self.write(value, bits)
+        self.pad()
+
+def _hint_tables(layout, lengths, offsets, mapping):
+    """Hint tables: page offsets, shared objects and, if any, the outline.
+
+    Returns (data, shared object table offset, outline table offset or None).
+    Offsets are those of a file without the hint stream, as the tables
+    require. Content stream offsets and lengths follow Acrobat's practice
+    of 0 and the page length, since pages are not interleaved with them.
+    """
+    page_lengths = []
+    keys = iter(layout.part6 + layout.part7)
+    for count in layout.object_counts:
+        page_lengths.append(sum(lengths[next(keys)] for _ in range(count)))
+    shared = [layout.shared_identifiers(index) for index in range(len(layout.pages))]
+    shared_total = len(layout.part6) + len(layout.part8)
+    min_objects, max_objects = min(layout.object_counts), max(layout.object_counts)
+    objects_bits = (max_objects - min_objects).bit_length()
+    min_length, max_length = min(page_lengths), max(page_lengths)
+    length_bits = (max_length - min_length).bit_length()
+    shared_count_bits = max(len(ids) for ids in shared).bit_length()
+
+    bits = _BitWriter()
+    for value, width in [
+            (min_objects, 32), (offsets[layout.pages[0]], 32), (objects_bits, 16),
+            (min_length, 32), (length_bits, 16),
+            (0, 32), (0, 16),  # content stream offset
+            (min_length, 32), (length_bits, 16),  # content stream length
+            (shared_count_bits, 16), (shared_total.bit_length(), 16),
+            (0, 16), (4, 16)]:  # shared object numerators are not used
+        bits.write(value, width)
+    bits.write_items([count - min_objects for count in layout.object_counts], objects_bits)
+    bits.write_items([length - min_length for length in page_lengths], length_bits)
+    bits.write_items([len(ids) for ids in shared], shared_count_bits)
+    bits.write_items([i for ids in shared for i in ids], shared_total.bit_length())
+    bits.write_items([], 0)  # numerators
+    bits.write_items([0] * len(page_lengths), 0)  # content stream offsets
+    bits.write_items([length - min_length for length in page_lengths], length_bits)
+    shared_offset = len(bits.data)
+
+    # One group per object: the first page's objects, then part 8
+    group_lengths = [lengths[key] for key in layout.part6 + layout.part8]
+    min_group, max_group = min(group_lengths), max(group_lengths)
+    first_shared = layout.part8[0] if layout.part8 else None
+    for value, width in [
+            (mapping[first_shared] if first_shared else 0, 32),
+            (offsets[first_shared] if first_shared else 0, 32),
+            (len(layout.part6), 32), (shared_total, 32),
+            (0, 16), (min_group, 32), ((max_group - min_group).bit_length(), 16)]:
+        bits.write(value, width)
+    bits.write_items([length - min_group for length in group_lengths],
+                     (max_group - min_group).bit_length())
+    bits.write_items([0] * shared_total, 1)  # no MD5 signatures
+    bits.write_items([0] * shared_total, 0)
+    if not layout.outlines:
+        return bytes(bits.data), shared_offset, None
+
+    outline_offset = len(bits.data)
+    for value in [mapping[layout.outlines[0]], offsets[layout.outlines[0]], len(layout.outlines),
+                  sum(lengths[key] for key in layout.outlines)]:
+        bits.write(value, 32)
+    return bytes(bits.data), shared_offset, outline_offset
+
+def _xref_entries(numbers, offsets):
+    return b''.join(b'%010d 00000 n\r\n' % offsets[number] for number in numbers)
+
+class _Renumberer(StreamingPdfWriter):
+    """Serializes input objects under their object numbers in the linearized file."""
+
+    def __init__(self, mapping):
+        # Objects are only serialized here; the caller writes them out
+        self._init_state(None)
+        self.mapping = mapping
+
+    def serialize(self, obj):
+        buffer = io.BytesIO()
+        self._serialize(obj, buffer, self.mapping, None)
+        return buffer.getvalue()
+
+    def object_bytes(self, key, obj):
+        return b'%d 0 obj\n' % self.mapping[key] + self.serialize(obj) + b'\nendobj\n'
+
+def linearize_pdf(source, output_path):
+    """Rewrite a PDF for fast web view: first page first, with hint tables.
+
+    source is a path or binary file. A viewer can show the first page of
+    the result as soon as its first-page section (/E bytes) has arrived
+    and fetch other pages by byte range using the hint stream. Objects
+    after the first page are spooled to a temporary file next to
+    output_path, so memory stays bounded by the first page. Streams keep
+    their filters; object and xref streams are written out as plain
+    objects and xref tables. Returns the page count.
+    """
+    with open_source(source) as f:
+        reader = PyPDF2.PdfReader(f)
+        layout = LinearizationLayout(reader)
+        rest = layout.part7 + layout.part8 + layout.part9
+
+        # The main xref covers 1..first-1; the first-page xref the
+        # linearization dictionary, part 4, the hint stream and part 6
+        mapping = {key: number for number, key in enumerate(rest, 1)}
+        first = len(rest) + 1
+        mapping.update({key: number for number, key in enumerate(layout.part4, first + 1)})
+        hint_number = first + 1 + len(layout.part4)
+        mapping.update({key: number for number, key in enumerate(layout.part6, hint_number + 1)})
+        size = hint_number + 1 + len(layout.part6)
+        renumberer = _Renumberer(mapping)
+        page_keys = set(layout.pages)
+
+        lengths = {}
+        def serialize(keys, out):
+            for key in keys:
+                if key in page_keys:
+                    reader.resolved_objects.clear()
+                data = renumberer.object_bytes(key, reader.get_object(IndirectObject(key[0], key[1], reader)))
+                lengths[key] = len(data)
+                out.write(data)
+
+        part4 = io.BytesIO()
+        serialize(layout.part4, part4)
+        trailer = b'/Root %d 0 R' % mapping[layout.part4[0]]
+        for name in ('/Info', '/ID'):
+            if name in reader.trailer:
+                trailer += b' ' + name.encode() + b' ' + renumberer.serialize(reader.trailer.raw_get(name))
+
+        with tempfile.TemporaryFile(dir=os.path.dirname(os.path.abspath(output_path))) as spool:
+            serialize(layout.part6 + rest, spool)
+
+            # Offsets as if there were no hint stream, which is how the hint
+            # tables state them; objects after it then move by its length
+            linearization_length = len(_linearization_dict(first, 0, 0, 0, 0, 0, 0, 0))
+            xref_position = len(PDF_HEADER) + linearization_length
+            first_numbers = range(first, size)
+            first_trailer_length = len(_first_page_trailer(size, trailer, 0))
+            position = xref_position + len(b'xref\n%d %d\n' % (first, size - first)) \
+                + 20 * len(first_numbers) + first_trailer_length
+            offsets = {}
+            for key in layout.part4 + [None] + layout.part6 + rest:
+                if key is None:
+                    hint_position = position
+                    continue
+                offsets[key] = position
+                position += lengths[key]
+
+            hint_data, shared_offset, outline_offset = _hint_tables(layout, lengths, offsets, mapping)
+            hint_data = zlib.compress(hint_data)
+            outline_entry = b' /O %d' % outline_offset if outline_offset is not None else b''
+            hint = b'%d 0 obj\n<< /Filter /FlateDecode /S %d%s /Length %d >>\nstream\n' % (
+                hint_number, shared_offset, outline_entry, len(hint_data)) + hint_data + b'\nendstream\nendobj\n'
+            for key in layout.part6 + rest:
+                offsets[key] += len(hint)
+            main_xref_position = position + len(hint)
+            main_xref = b'xref\n0 %d\n0000000000 65535 f\r\n' % first + _xref_entries(
+                range(1, first), {mapping[key]: offsets[key] for key in rest})
+            main_xref += b'trailer\n<< /Size %d >>\nstartxref\n%d\n%%%%EOF\n' % (first, xref_position)
+            first_page_end = offsets[layout.part6[-1]] + lengths[layout.part6[-1]]
+            number_offsets = {mapping[key]: offsets[key] for key in layout.part4 + layout.part6}
+            number_offsets[first] = len(PDF_HEADER)
+            number_offsets[hint_number] = hint_position
+
+            with open(output_path, 'wb') as output_file:
+                output_file.write(PDF_HEADER)
+                output_file.write(_linearization_dict(
+                    first, main_xref_position + len(main_xref), hint_position, len(hint),
+                    mapping[layout.pages[0]], first_page_end, len(layout.pages),
+                    main_xref_position + len(b'xref\n0 %d' % first)))
+                output_file.write(b'xref\n%d %d\n' % (first, size - first))
+                output_file.write(_xref_entries(first_numbers, number_offsets))
+                output_file.write(_first_page_trailer(size, trailer, main_xref_position))
+                output_file.write(part4.getvalue())
+                output_file.write(hint)
+                spool.seek(0)
+                shutil.copyfileobj(spool, output_file)
+                output_file.write(main_xref)
+    return len(layout.pages)
+
+def _linearization_dict(number, file_length, hint_offset, hint_length, first_page, first_page_end,
+                        page_count, main_xref_entry):
+    values = b'<< /Linearized 1 /L %d /H [%d %d] /O %d /E %d /N %d /T %d >>' % (
+        file_length, hint_offset, hint_length, first_page, first_page_end, page_count, main_xref_entry)
+    # Padded to the widest values, so the length is known in advance
+    width = len(b'<< /Linearized 1 /L  /H [ ] /O  /E  /N  /T  >>') + 7 * OFFSET_DIGITS
+    return b'%d 0 obj\n' % number + values.ljust(width) + b'\nendobj\n'
+
+def _first_page_trailer(size, entries, main_xref_position):
+    prev = (b'%d' % main_xref_position).ljust(OFFSET_DIGITS)
+    return b'trailer\n<< /Size %d %s /Prev %s >>\nstartxref\n0\n%%%%EOF\n' % (size, entries, prev)
+
+def linearize_file(path):
+    """Linearize the PDF at path in place."""
+    linearized_path = path + '.linearized'
+    try:
+        linearize_pdf(path, linearized_path)
+        os.replace(linearized_path, path)
+    finally:
+        if os.path.exists(linearized_path):
+            os.remove(linearized_path)
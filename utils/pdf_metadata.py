@@ -0,0 +1,75 @@
+import PyPDF2
+from utils.merge_utils import record_parse
+from utils.pdf_probe import probe_page_count, probe_page_sizes
+
+# Reading a PDF's page count and metadata does not depend on how front
+# matter is drawn, so every backend shares these
+
+def get_pdf_page_count(pdf_path):
+    """Returns the number of pages in a PDF file."""
+    # Trailer-only probe first; the full parser handles what it cannot
+    page_count = probe_page_count(pdf_path)
+    if page_count is not None:
+        return page_count
+    
+    with open(pdf_path, 'rb') as file:
+        reader = PyPDF2.PdfReader(file)
+        record_parse(pdf_path)
+        return len(reader.pages)
+
+def get_pdf_metadata(pdf_path):
+    """Returns page count, page sizes, encryption flag and validity of a PDF.
+
+    Files the trailer probe can read are not fully parsed. Their page sizes
+    are left as None, since reading them visits every page object; ask
+    get_pdf_page_sizes for them when they are needed.
+    """
+    page_count = probe_page_count(pdf_path)
+    if page_count is not None:
+        return {
+            'page_count': page_count,
+            'page_sizes': None,
+            'encrypted': False,
+            'valid': page_count > 0,
+            'error': None if page_count > 0 else "PDF has 0 pages"
+        }
+    
+    metadata = {
+        'page_count': 0,
+        'page_sizes': [],
+        'encrypted': False,
+        'valid': False,
+        'error': None
+    }
+    try:
+        with open(pdf_path, 'rb') as file:
+            reader = PyPDF2.PdfReader(file)
+            record_parse(pdf_path)
+            metadata['encrypted'] = reader.is_encrypted
+            if reader.is_encrypted:
+                reader.decrypt('')
+            metadata['page_sizes'] = [
+                [float(page.mediabox.width), float(page.mediabox.height)]
+                for page in reader.pages
+            ]
+            metadata['page_count'] = len(metadata['page_sizes'])
+            metadata['valid'] = metadata['page_count'] > 0
+            if not metadata['valid']:
+                metadata['error'] = "PDF has 0 pages"
+    except Exception as e:
+        metadata['error'] = str(e)
+    return metadata
+
+def get_pdf_page_sizes(pdf_path):
+    """Returns the [width, height] of every page of a PDF, in order."""
+    # Page-tree walk first; the full parser handles what it cannot
+    page_sizes = probe_page_sizes(pdf_path)
+    if page_sizes is not None:
+        return page_sizes
+    
+    with open(pdf_path, 'rb') as file:
+        reader = PyPDF2.PdfReader(file)
+        record_parse(pdf_path)
+        if reader.is_encrypted:
+            reader.decrypt('')
+        return [[float(page.mediabox.width), float(page.mediabox.height)] for page in reader.pages]
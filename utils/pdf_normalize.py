@@ -0,0 +1,188 @@
+import os
+import re
+import time
+import sqlite3
+import tempfile
+import threading
+from contextlib import closing
+from utils.merge_utils import record_parse
+from utils.pdf_probe import probe_xref_clean
+
+# Readers accept a header anywhere in the first kilobyte
+HEADER_SIZE = 1024
+
+_OBJ_HEADER_RE = re.compile(rb'\s*(\d+)\s+(\d+)\s+obj\b')
+
+def check_pdf_header(pdf_path):
+    """Cheap check that a file could be a PDF; returns an error message or None.
+
+    Reads only the first kilobyte, so it can run in the request thread and
+    spare the inspection workers files that are not PDFs at all.
+    """
+    with open(pdf_path, 'rb') as f:
+        head = f.read(HEADER_SIZE)
+    if not head:
+        return "File is empty"
+    if b'%PDF-' not in head:
+        return "Not a PDF file"
+    return None
+
+def diagnose_pdf(pdf_path):
+    """Why a PDF needs normalizing: 'encrypted', 'damaged', or None if it is clean.
+
+    A file is damaged when a strict parse fails or an xref entry does not
+    point at the object it names; PyPDF2 would otherwise repair it on
+    every read. Files whose classic xref table passes probe_xref_clean are
+    clean without a parse; only the others are parsed and counted.
+    """
+    if probe_xref_clean(pdf_path):
+        return None
+    # PyPDF2 is imported on first use to keep it off the app's start-up path
+    import PyPDF2
+    try:
+        with open(pdf_path, 'rb') as f:
+            # Counted even when the strict parse fails
+            record_parse(pdf_path)
+            reader = PyPDF2.PdfReader(f, strict=True)
+            if reader.is_encrypted:
+                return 'encrypted'
+            len(reader.pages)
+            for generation, entries in reader.xref.items():
+                for number, offset in entries.items():
+                    if number == 0:
+                        continue  # head of the free list
+                    f.seek(offset)
+                    header = _OBJ_HEADER_RE.match(f.read(32))
+                    if not header or (int(header.group(1)), int(header.group(2))) != (number, generation):
+                        return 'damaged'
+    except Exception:
+        return 'damaged'
+    return None
+
+def normalize_pdf(pdf_path, output_path):
+    """Write a repaired, decrypted copy of pdf_path to output_path if it needs one.
+
+    Returns the reason from diagnose_pdf, or None when the file is clean
+    and nothing was written. The lenient parser rebuilds damaged xref
+    tables; encrypted files must open with an empty user password.
+    """
+    reason = diagnose_pdf(pdf_path)
+    if reason is None:
+        return None
+    import PyPDF2
+    with open(pdf_path, 'rb') as f:
+        reader = PyPDF2.PdfReader(f, strict=False)
+        record_parse(pdf_path)
+        if reader.is_encrypted and not reader.decrypt(''):
+            raise ValueError("PDF is protected by a password")
+        # Cloning the catalog keeps the outline, which merges import
+        writer = PyPDF2.PdfWriter()
+        writer.clone_reader_document_root(reader)
+        with open(output_path, 'wb') as output_file:
+            writer.write(output_file)
+    return reason
+
+def inspect_upload(pdf_path, scratch_folder, get_pdf_metadata):
+    """Normalize an upload if it needs it, then read the metadata generation will use.
+
+    Runs in an inspection worker, so the xref probe, any strict parse and
+    any rewrite stay off the request thread and under the per-file
+    timeout. Returns the reason from normalize_pdf (or 'failed: ...'), the
+    normalized copy written to scratch_folder (None when the upload is
+    used as it is), the seconds normalizing took and the metadata of the
+    file to use.
+    """
+    fd, temp_path = tempfile.mkstemp(dir=scratch_folder, suffix='.pdf')
+    os.close(fd)
+    started = time.perf_counter()
+    normalized_path = None
+    try:
+        reason = normalize_pdf(pdf_path, temp_path)
+        if reason is not None:
+            normalized_path = temp_path
+    except Exception as e:
+        reason = f"failed: {str(e)}"
+    finally:
+        if normalized_path is None:
+            os.remove(temp_path)
+    seconds = time.perf_counter() - started
+    return {
+        'reason': reason,
+        'normalized_path': normalized_path,
+        'seconds': seconds,
+        'metadata': get_pdf_metadata(normalized_path or pdf_path)
+    }
+
+class NormalizationCache:
+    """Outcome of normalizing each upload, keyed by its content hash.
+
+    Maps the hash of an uploaded file to the hash of the file generation
+    should read instead (the same hash when the upload was clean), with
+    the reason and how long normalization took, so the slow cases can be
+    listed.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS normalized ('
+                'content_hash TEXT PRIMARY KEY, '
+                'normalized_hash TEXT NOT NULL, '
+                'reason TEXT, '
+                'seconds REAL NOT NULL, '
+                'original_filename TEXT, '
+                'created REAL NOT NULL)'
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def get(self, content_hash):
+        """Return the recorded outcome for a content hash, or None."""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                'SELECT normalized_hash, reason, seconds FROM normalized WHERE content_hash = ?',
+                (content_hash,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {'normalized_hash': row[0], 'reason': row[1], 'seconds': row[2]}
+
+    def put(self, content_hash, normalized_hash, reason, seconds, original_filename=None):
+        with closing(self._connect()) as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO normalized '
+                '(content_hash, normalized_hash, reason, seconds, original_filename, created) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (content_hash, normalized_hash, reason, seconds, original_filename, time.time())
+            )
+
+    def slow(self, min_seconds, limit=50):
+        """Uploads that needed normalizing or took at least min_seconds, slowest first."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                'SELECT content_hash, normalized_hash, reason, seconds, original_filename, created '
+                'FROM normalized WHERE reason IS NOT NULL OR seconds >= ? '
+                'ORDER BY seconds DESC LIMIT ?',
+                (min_seconds, limit)
+            ).fetchall()
+        return [
+            dict(zip(('content_hash', 'normalized_hash', 'reason', 'seconds',
+                      'original_filename', 'created'), row))
+            for row in rows
+        ]
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+def get_normalization_cache(db_path):
+    """Return the shared NormalizationCache for a database path."""
+    key = os.path.abspath(db_path)
+    with _caches_lock:
+        if key not in _caches:
+            _caches[key] = NormalizationCache(db_path)
+        return _caches[key]
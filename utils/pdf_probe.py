@@ -0,0 +1,223 @@
+import os
+import re
+import mmap
+
+# How far from the end of the file to look for startxref
+TAIL_SIZE = 2048
+ENTRY_SIZE = 20
+
+_STARTXREF_RE = re.compile(rb'startxref\s+(\d+)')
+_SUBSECTION_RE = re.compile(rb'\s*(\d+)\s+(\d+)[ \t]*\r?\n?')
+_ENTRY_RE = re.compile(rb'(\d{10}) (\d{5}) ([nf])')
+_OBJ_HEADER_RE = re.compile(rb'\s*(\d+)\s+(\d+)\s+obj\b')
+_REF_RE = rb'\s+(\d+)\s+(\d+)\s+R\b'
+_ROOT_RE = re.compile(rb'/Root' + _REF_RE)
+_PREV_RE = re.compile(rb'/Prev\s+(\d+)')
+_PAGES_RE = re.compile(rb'/Pages' + _REF_RE)
+_COUNT_RE = re.compile(rb'/Count\s+(\d+)(?:\s+(\d+)\s+R\b)?')
+_TYPE_PAGES_RE = re.compile(rb'/Type\s*/Pages\b')
+_KIDS_RE = re.compile(rb'/Kids\s*\[([^\]]*)\]')
+_KID_RE = re.compile(rb'(\d+)\s+(\d+)\s+R\b')
+_NUMBER = rb'\s*([-+]?(?:\d+\.?\d*|\.\d+))'
+_MEDIABOX_RE = re.compile(rb'/MediaBox\s*\[' + _NUMBER * 4 + rb'\s*\]')
+
+class ProbeError(Exception):
+    """Raised when the fast probe cannot handle a file."""
+
+def _read_xref_section(data, offset, subsections):
+    """Index one classic xref section and return its trailer dictionary bytes.
+
+    Entries are fixed 20-byte records, so only the subsection headers are
+    read; individual entries are looked up on demand.
+    """
+    if data[offset:offset + 4] != b'xref':
+        # Cross-reference streams need the full parser
+        raise ProbeError("not a classic xref table")
+    position = offset + 4
+    while True:
+        subsection = _SUBSECTION_RE.match(data, position)
+        if not subsection:
+            break
+        first, count = int(subsection.group(1)), int(subsection.group(2))
+        entries_start = subsection.end()
+        # Check the last record to make sure the table uses 20-byte entries
+        if count and not _ENTRY_RE.match(data, entries_start + (count - 1) * ENTRY_SIZE):
+            raise ProbeError("malformed xref table")
+        subsections.append((first, count, entries_start))
+        position = entries_start + count * ENTRY_SIZE
+    trailer_start = data.find(b'trailer', position, position + 64)
+    if trailer_start < 0:
+        raise ProbeError("trailer not found")
+    trailer_end = data.find(b'startxref', trailer_start)
+    if trailer_end < 0:
+        raise ProbeError("trailer not terminated")
+    return data[trailer_start:trailer_end]
+
+def _object_offset(data, subsections, object_number):
+    """Find an object's offset; newer sections are listed first."""
+    for first, count, entries_start in subsections:
+        if first <= object_number < first + count:
+            entry = _ENTRY_RE.match(data, entries_start + (object_number - first) * ENTRY_SIZE)
+            if not entry:
+                raise ProbeError("malformed xref entry")
+            if entry.group(3) == b'n':
+                return int(entry.group(1))
+            raise ProbeError(f"object {object_number} is free")
+    raise ProbeError(f"object {object_number} not in xref")
+
+def _read_object(data, subsections, object_number):
+    """Return the body of an uncompressed indirect object."""
+    offset = _object_offset(data, subsections, object_number)
+    header = _OBJ_HEADER_RE.match(data, offset)
+    if not header or int(header.group(1)) != object_number:
+        raise ProbeError(f"object {object_number} not at its xref offset")
+    end = data.find(b'endobj', header.end())
+    if end < 0:
+        raise ProbeError(f"object {object_number} not terminated")
+    return data[header.end():end]
+
+def probe_page_count(pdf_path):
+    """Read the page count from the trailer and page-tree root only.
+
+    Follows startxref -> trailer -> /Root -> /Pages -> /Count in a
+    memory-mapped file without building a PdfReader. Returns None when the
+    file uses cross-reference streams, is encrypted or looks damaged, so the
+    caller can fall back to the full parser.
+    """
+    return _probe_file(pdf_path, _probe)
+
+def probe_page_sizes(pdf_path):
+    """Read the [width, height] of every page from the page tree, in order.
+
+    Walks the page tree from its root and reads each leaf's /MediaBox,
+    inherited from the nearest ancestor that has one, without building a
+    PdfReader. Returns None in the cases probe_page_count does, and when a
+    /MediaBox is not an array of four direct numbers.
+    """
+    return _probe_file(pdf_path, _probe_sizes)
+
+def probe_xref_clean(pdf_path):
+    """Check that a file's classic xref table points at the objects it names.
+
+    Every in-use entry of the newest section listing an object must land
+    on that object's "N G obj" header, and the page-tree root must be
+    reachable. Returns True when it all checks out and None otherwise,
+    including for cross-reference streams and encrypted files, which need
+    the full parser.
+    """
+    return _probe_file(pdf_path, _probe_xref)
+
+def _probe_file(pdf_path, probe):
+    try:
+        with open(pdf_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return None
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return probe(data)
+    except (ProbeError, ValueError, OSError):
+        return None
+
+def _page_tree_root(data):
+    """Index the xref sections; returns (subsections, page-tree root number and body)."""
+    tail_start = max(0, len(data) - TAIL_SIZE)
+    tail = data[tail_start:]
+    matches = list(_STARTXREF_RE.finditer(tail))
+    if not matches:
+        raise ProbeError("startxref not found")
+    xref_offset = int(matches[-1].group(1))
+
+    subsections = []
+    root_match = None
+    seen = set()
+    while xref_offset is not None:
+        if xref_offset in seen or xref_offset >= len(data):
+            raise ProbeError("bad xref offset")
+        seen.add(xref_offset)
+        trailer = _read_xref_section(data, xref_offset, subsections)
+        if b'/Encrypt' in trailer or b'/XRefStm' in trailer:
+            raise ProbeError("encrypted or hybrid file")
+        if root_match is None:
+            root_match = _ROOT_RE.search(trailer)
+        prev = _PREV_RE.search(trailer)
+        xref_offset = int(prev.group(1)) if prev else None
+
+    if root_match is None:
+        raise ProbeError("trailer has no /Root")
+    catalog = _read_object(data, subsections, int(root_match.group(1)))
+    pages_match = _PAGES_RE.search(catalog)
+    if not pages_match:
+        raise ProbeError("catalog has no /Pages")
+    pages_number = int(pages_match.group(1))
+    pages = _read_object(data, subsections, pages_number)
+    if not _TYPE_PAGES_RE.search(pages):
+        raise ProbeError("/Pages is not a page tree node")
+    return subsections, pages_number, pages
+
+def _probe(data):
+    subsections, _, pages = _page_tree_root(data)
+    count_match = _COUNT_RE.search(pages)
+    if not count_match:
+        raise ProbeError("page tree root has no /Count")
+    if count_match.group(2) is not None:
+        # Indirect /Count: resolve the referenced integer object
+        count_body = _read_object(data, subsections, int(count_match.group(1))).strip()
+        if not count_body.isdigit():
+            raise ProbeError("indirect /Count is not an integer")
+        return int(count_body)
+    return int(count_match.group(1))
+
+def _media_box_size(node):
+    """[width, height] of a page-tree node's own /MediaBox, or None if it has none."""
+    match = _MEDIABOX_RE.search(node)
+    if match:
+        left, bottom, right, top = (float(value) for value in match.groups())
+        return [right - left, top - bottom]
+    if b'/MediaBox' in node:
+        raise ProbeError("/MediaBox is not a direct array of numbers")
+    return None
+
+def _probe_sizes(data):
+    subsections, pages_number, pages = _page_tree_root(data)
+    sizes = []
+    seen = {pages_number}
+    stack = [(pages, None)]
+    while stack:
+        node, inherited = stack.pop()
+        size = _media_box_size(node) or inherited
+        if not _TYPE_PAGES_RE.search(node):
+            if size is None:
+                raise ProbeError("page has no /MediaBox")
+            sizes.append(size)
+            continue
+        kids = _KIDS_RE.search(node)
+        if not kids:
+            raise ProbeError("page tree node has no /Kids")
+        children = []
+        for kid in _KID_RE.finditer(kids.group(1)):
+            number = int(kid.group(1))
+            if number in seen:
+                raise ProbeError("page tree has a cycle")
+            seen.add(number)
+            children.append(_read_object(data, subsections, number))
+        # Depth first, in /Kids order
+        stack.extend((child, size) for child in reversed(children))
+    return sizes
+
+def _probe_xref(data):
+    subsections, _, _ = _page_tree_root(data)
+    seen = set()
+    # Newer sections are listed first and override older entries
+    for first, count, entries_start in subsections:
+        for number in range(first, first + count):
+            if number in seen:
+                continue
+            seen.add(number)
+            entry = _ENTRY_RE.match(data, entries_start + (number - first) * ENTRY_SIZE)
+            if not entry:
+                raise ProbeError("malformed xref entry")
+            if entry.group(3) != b'n':
+                continue
+            header = _OBJ_HEADER_RE.match(data, int(entry.group(1)))
+            if not header or (int(header.group(1)), int(header.group(2))) != (number, int(entry.group(2))):
+                raise ProbeError(f"object {number} not at its xref offset")
+    return True
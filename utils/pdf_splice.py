@@ -0,0 +1,218 @@
+import io
+import re
+import shutil
+import PyPDF2
+from PyPDF2.generic import DictionaryObject, IndirectObject, NameObject, NumberObject, TextStringObject
+from utils.merge_utils import open_source, record_parse
+from utils.pdf_stream_writer import StreamingPdfWriter
+
+# How far from the end of the body to look for startxref
+TAIL_SIZE = 2048
+
+_STARTXREF_RE = re.compile(rb'startxref\s+(\d+)')
+
+def _ref(number):
+    return IndirectObject(number, 0, None)
+
+def _title_bytes(title):
+    buffer = io.BytesIO()
+    TextStringObject(title).write_to_stream(buffer, None)
+    return buffer.getvalue()
+
+class IncrementalPdfWriter(StreamingPdfWriter):
+    """StreamingPdfWriter that appends an incremental update to an existing PDF.
+
+    New objects are numbered from the existing file's /Size and offsets
+    continue from its length. pages_number is a fresh page-tree root.
+    """
+
+    def __init__(self, stream, size, position):
+        self._init_state(stream, next_number=size, position=position)
+        self.pages_number = self._reserve()
+
+    def rewrite(self, number, obj):
+        """Write a new revision of an existing object; references are kept as-is."""
+        buffer = io.BytesIO()
+        obj.write_to_stream(buffer, None)
+        self._write_plain(number, buffer.getvalue())
+
+    def write_xref(self, trailer, as_stream=False):
+        """Write the update's xref subsections and a trailer pointing back with /Prev.
+
+        as_stream writes a cross-reference stream instead, as an update to
+        a file whose own xref is a stream must.
+        """
+        if as_stream:
+            buffer = io.BytesIO()
+            for key, value in trailer.items():
+                if key != '/Size':
+                    NameObject(key).write_to_stream(buffer, None)
+                    buffer.write(b' ')
+                    trailer.raw_get(key).write_to_stream(buffer, None)
+                    buffer.write(b' ')
+            rows = {number: (1, offset, 0) for number, offset in self.offsets.items()}
+            self._write_xref_stream(rows, b' ' + buffer.getvalue().rstrip())
+            return
+        xref_position = self.position
+        numbers = sorted(self.offsets)
+        lines = [b'xref\n']
+        run_start = 0
+        for i in range(1, len(numbers) + 1):
+            if i == len(numbers) or numbers[i] != numbers[i - 1] + 1:
+                run = numbers[run_start:i]
+                lines.append(b'%d %d\n' % (run[0], len(run)))
+                lines.extend(b'%010d 00000 n\r\n' % self.offsets[number] for number in run)
+                run_start = i
+        self._write(b''.join(lines))
+        buffer = io.BytesIO()
+        trailer.write_to_stream(buffer, None)
+        self._write(b'trailer\n' + buffer.getvalue() + b'\nstartxref\n%d\n%%%%EOF\n' % xref_position)
+
+def _object_count(reader):
+    """The body's /Size; PyPDF2 leaves it out of trailers read from xref streams."""
+    if '/Size' in reader.trailer:
+        return int(reader.trailer['/Size'])
+    numbers = [number for table in reader.xref.values() for number in table]
+    return max(numbers + list(reader.xref_objStm)) + 1
+
+def splice_pdf(body, output_path, before=(), after=()):
+    """Wrap a finished PDF in extra leading and trailing pages without rewriting it.
+
+    body is a binary file holding a PDF with a classic xref table or, for
+    a compacted body, an xref stream. Its bytes are copied to output_path
+    unchanged and an incremental update appends the pages of the before
+    and after PDFs, a page-tree root above the body's own, and a new
+    catalog. before and after are lists of (pdf_path, outline_title)
+    pairs; a path may also be an in-memory buffer and a title of None adds
+    no bookmark. Titled pages are linked
+    into the body's outline around its existing items. Returns the page
+    count of the result.
+    """
+    body.seek(0, 2)
+    body_size = body.tell()
+    body.seek(max(0, body_size - TAIL_SIZE))
+    matches = list(_STARTXREF_RE.finditer(body.read()))
+    if not matches:
+        raise ValueError("Book body has no startxref")
+    body_xref = int(matches[-1].group(1))
+    body.seek(body_xref)
+    xref_stream = not body.read(4).startswith(b'xref')
+
+    body.seek(0)
+    reader = PyPDF2.PdfReader(body)
+    trailer = reader.trailer
+    root_ref = trailer.raw_get('/Root')
+    catalog = root_ref.get_object()
+    body_pages_ref = catalog.raw_get('/Pages')
+    body_pages = body_pages_ref.get_object()
+    body_page_count = int(body_pages['/Count'])
+
+    with open(output_path, 'wb') as output_file:
+        body.seek(0)
+        shutil.copyfileobj(body, output_file)
+        position = body_size
+        body.seek(body_size - 1)
+        if body.read(1) != b'\n':
+            output_file.write(b'\n')
+            position += 1
+
+        writer = IncrementalPdfWriter(output_file, _object_count(reader), position)
+
+        # Render the extra pages, remembering where each file starts
+        def append_all(items):
+            bookmarks = []
+            for pdf_path, title in items:
+                with open_source(pdf_path) as f:
+                    extra = PyPDF2.PdfReader(f)
+                    record_parse(pdf_path)
+                    first = len(writer.page_numbers)
+                    writer._append_reader(extra)
+                if title is not None and len(writer.page_numbers) > first:
+                    bookmarks.append((title, writer.page_numbers[first]))
+            return bookmarks
+
+        front_bookmarks = append_all(before)
+        front_count = len(writer.page_numbers)
+        back_bookmarks = append_all(after)
+
+        # New page-tree root: extra front pages, the body's tree, extra back pages
+        kids = writer.page_numbers[:front_count] + [body_pages_ref.idnum] + writer.page_numbers[front_count:]
+        writer._write_plain(writer.pages_number, b'<< /Type /Pages /Kids [' +
+                            b' '.join(b'%d 0 R' % number for number in kids) +
+                            b'] /Count %d >>' % (len(writer.page_numbers) + body_page_count))
+        body_pages = DictionaryObject(body_pages)
+        body_pages[NameObject('/Parent')] = _ref(writer.pages_number)
+        writer.rewrite(body_pages_ref.idnum, body_pages)
+
+        catalog = DictionaryObject(catalog)
+        catalog[NameObject('/Pages')] = _ref(writer.pages_number)
+        if front_bookmarks or back_bookmarks:
+            outline_ref = _splice_outline(writer, catalog.raw_get('/Outlines'),
+                                          front_bookmarks, back_bookmarks)
+            catalog[NameObject('/Outlines')] = _ref(outline_ref)
+            catalog[NameObject('/PageMode')] = NameObject('/UseOutlines')
+        writer.rewrite(root_ref.idnum, catalog)
+
+        new_trailer = DictionaryObject({
+            NameObject('/Size'): NumberObject(writer.next_number),
+            NameObject('/Root'): root_ref,
+            NameObject('/Prev'): NumberObject(body_xref)
+        })
+        for key in ('/Info', '/ID'):
+            if key in trailer:
+                new_trailer[NameObject(key)] = trailer.raw_get(key)
+        writer.write_xref(new_trailer, as_stream=xref_stream)
+
+    return len(writer.page_numbers) + body_page_count
+
+def _splice_outline(writer, outline_ref, front, back):
+    """Link new top-level bookmarks before and after an existing outline."""
+    first_ref = last_ref = None
+    old_count = 0
+    if outline_ref is not None:
+        outline_root = outline_ref.get_object()
+        first_ref = outline_root.raw_get('/First')
+        last_ref = outline_root.raw_get('/Last')
+        old_count = abs(int(outline_root.get('/Count', 0)))
+        root_number = outline_ref.idnum
+    else:
+        outline_root = DictionaryObject({NameObject('/Type'): NameObject('/Outlines')})
+        root_number = writer._reserve()
+
+    front_numbers = [writer._reserve() for _ in front]
+    back_numbers = [writer._reserve() for _ in back]
+    # Top-level chain: new front items, the existing items, new back items
+    existing = []
+    if first_ref is not None:
+        existing = [first_ref.idnum] if first_ref.idnum == last_ref.idnum else [first_ref.idnum, last_ref.idnum]
+    siblings = front_numbers + existing + back_numbers
+
+    for (title, page_number), number in zip(front + back, front_numbers + back_numbers):
+        position = siblings.index(number)
+        body = b'<< /Title ' + _title_bytes(title) + b' /Parent %d 0 R' % root_number
+        body += b' /Dest [%d 0 R /Fit]' % page_number
+        if position > 0:
+            body += b' /Prev %d 0 R' % siblings[position - 1]
+        if position < len(siblings) - 1:
+            body += b' /Next %d 0 R' % siblings[position + 1]
+        writer._write_plain(number, body + b' >>')
+
+    # The body's first and last items now have new neighbours
+    if existing and (front or back):
+        first_item = DictionaryObject(first_ref.get_object())
+        if front:
+            first_item[NameObject('/Prev')] = _ref(front_numbers[-1])
+        if back and len(existing) == 1:
+            first_item[NameObject('/Next')] = _ref(back_numbers[0])
+        writer.rewrite(first_ref.idnum, first_item)
+        if back and len(existing) == 2:
+            last_item = DictionaryObject(last_ref.get_object())
+            last_item[NameObject('/Next')] = _ref(back_numbers[0])
+            writer.rewrite(last_ref.idnum, last_item)
+
+    outline_root = DictionaryObject(outline_root)
+    outline_root[NameObject('/First')] = _ref(siblings[0])
+    outline_root[NameObject('/Last')] = _ref(siblings[-1])
+    outline_root[NameObject('/Count')] = NumberObject(old_count + len(front) + len(back))
+    writer.rewrite(root_number, outline_root)
+    return root_number
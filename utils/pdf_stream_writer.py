@@ -0,0 +1,663 @@
+import io
+import os
+import time
+import zlib
+import hashlib
+from collections import deque
+import PyPDF2
+from PyPDF2.generic import (
+    ArrayObject, DictionaryObject, IndirectObject, NameObject, StreamObject,
+    TextStringObject
+)
+from utils.merge_utils import open_source, record_parse
+from utils.metrics import record_document_timing
+
+PDF_HEADER = b'%PDF-1.7\n%\xe2\xe3\xcf\xd3\n'
+
+# Mapping key standing for the output's page-tree root
+PARENT_KEY = (-1, 0)
+
+# Plain objects collected into one object stream before it is written
+OBJECT_STREAM_SIZE = 100
+
+def _has_reference(obj):
+    if isinstance(obj, IndirectObject):
+        return True
+    if isinstance(obj, DictionaryObject):
+        return any(_has_reference(value) for value in dict.values(obj))
+    if isinstance(obj, ArrayObject):
+        return any(_has_reference(item) for item in list.__iter__(obj))
+    return False
+
+class StreamDeduplicator:
+    """Share identical stream objects between the inputs of one merge.
+
+    Exhibit packs repeat the same embedded fonts, images and ICC profiles
+    across documents. Streams whose dictionaries hold no indirect
+    references are keyed by a hash of their dictionary and data; a repeat
+    is pointed at the copy already in the output instead of being written
+    again. Streams that reference other objects (an image with a soft
+    mask, say) are written as usual, but the streams they refer to can
+    still be shared.
+    """
+
+    def __init__(self):
+        self._numbers = {}
+        self.streams_shared = 0
+        self.bytes_saved = 0
+
+    def digest(self, obj):
+        """Content key of a self-contained stream, or None for anything else."""
+        if not isinstance(obj, StreamObject) or _has_reference(obj):
+            return None
+        content = hashlib.sha256()
+        for key in sorted(obj):
+            if key == '/Length':
+                continue
+            buffer = io.BytesIO()
+            NameObject(key).write_to_stream(buffer, None)
+            dict.__getitem__(obj, key).write_to_stream(buffer, None)
+            content.update(buffer.getvalue())
+        content.update(b'\0stream\0')
+        content.update(obj._data)
+        return content.digest()
+
+    def lookup(self, digest, obj):
+        """Output object number of an identical stream already written, if any."""
+        number = self._numbers.get(digest)
+        if number is not None:
+            self.streams_shared += 1
+            self.bytes_saved += len(obj._data)
+        return number
+
+    def register(self, digest, number):
+        """Record a stream written to the output under number."""
+        self._numbers[digest] = number
+
+    def checkpoint(self):
+        return self.streams_shared, self.bytes_saved
+
+    def rollback(self, checkpoint, first_number):
+        """Forget the streams numbered first_number or above and restore the counters."""
+        self.streams_shared, self.bytes_saved = checkpoint
+        self._numbers = {digest: number for digest, number in self._numbers.items()
+                         if number < first_number}
+
+    def report(self):
+        return {'streams_shared': self.streams_shared, 'bytes_saved': self.bytes_saved}
+
+class OutputCompactor:
+    """Settings and counters for a StreamingPdfWriter's compact output.
+
+    Plain objects are packed into compressed object streams, the xref
+    table becomes a compressed cross-reference stream and streams stored
+    without a filter are flate-compressed. Unused objects need no pass of
+    their own: the streaming writer only writes what the pages reach.
+    Without pack_objects only the streams are compressed, which is all
+    that survives linearization. packing_bytes_saved counts what the object
+    and cross-reference streams save over plain objects and an xref table.
+    """
+
+    def __init__(self, level=6, pack_objects=True):
+        self.level = level
+        self.pack_objects = pack_objects
+        self.objects_packed = 0
+        self.streams_compressed = 0
+        self.compression_bytes_saved = 0
+        self.packing_bytes_saved = 0
+
+    def compress(self, data):
+        """Flate data for an unfiltered stream; None if that does not make it smaller."""
+        compressed = zlib.compress(data, self.level)
+        if len(compressed) >= len(data):
+            return None
+        self.streams_compressed += 1
+        self.compression_bytes_saved += len(data) - len(compressed)
+        return compressed
+
+    def checkpoint(self):
+        return (self.objects_packed, self.streams_compressed, self.compression_bytes_saved,
+                self.packing_bytes_saved)
+
+    def rollback(self, checkpoint):
+        (self.objects_packed, self.streams_compressed, self.compression_bytes_saved,
+         self.packing_bytes_saved) = checkpoint
+
+    def report(self):
+        report = {
+            'streams_compressed': self.streams_compressed,
+            'compression_bytes_saved': self.compression_bytes_saved
+        }
+        if self.pack_objects:
+            report['objects_packed'] = self.objects_packed
+            report['packing_bytes_saved'] = self.packing_bytes_saved
+        return report
+
+class StreamingPdfWriter:
+    """Write a merged PDF front to back without holding the whole book.
+
+    Each appended input's pages and the objects they reference are
+    serialized as soon as the input is read, with object numbers remapped
+    into the output. The page tree, outline, catalog, xref table and trailer
+    are written by close(). Output goes to any object with write(); byte
+    offsets are tracked here, so the stream never needs to seek. With a
+    StreamDeduplicator, identical streams across inputs are written once;
+    with an OutputCompactor the output uses object and xref streams.
+    Like PdfMerger, the writer carries over each input's outline and named
+    destinations, and it gathers the inputs' form fields into one
+    /AcroForm.
+    """
+
+    def __init__(self, stream, dedup=None, compact=None):
+        self._init_state(stream, dedup, compact)
+        self.catalog_number = self._reserve()
+        self.pages_number = self._reserve()
+        self._write(PDF_HEADER)
+
+    def _init_state(self, stream, dedup=None, compact=None, next_number=1, position=0):
+        """Set up the writer's bookkeeping; subclasses that write no header start here too.
+
+        next_number is the first object number handed out and position the
+        byte offset the stream starts at.
+        """
+        self.stream = stream
+        self.dedup = dedup
+        self.compact = compact
+        self.packed = {}
+        self._pending_packed = []
+        self.position = position
+        self.offsets = {}
+        self.next_number = next_number
+        self.page_numbers = []
+        self.outline = []
+        self.named_destinations = {}
+        self.form_fields = []
+        self.form_defaults = None
+
+    def _reserve(self):
+        number = self.next_number
+        self.next_number += 1
+        return number
+
+    def _write(self, data):
+        self.stream.write(data)
+        self.position += len(data)
+
+    @property
+    def page_count(self):
+        return len(self.page_numbers)
+
+    def append(self, pdf_path, title=None):
+        """Serialize every page of a PDF path or buffer; returns the number of pages added.
+
+        The input's objects are collected in memory and reach the output
+        only once all of it has been read, so an input that fails partway
+        through leaves nothing behind. Parse and copy times of a path are
+        recorded under title.
+        """
+        checkpoint = self._checkpoint()
+        output, self.stream = self.stream, io.BytesIO()
+        try:
+            with open_source(pdf_path) as f:
+                started = time.perf_counter()
+                reader = PyPDF2.PdfReader(f)
+                record_parse(pdf_path)
+                if reader.is_encrypted:
+                    reader.decrypt('')
+                parsed = time.perf_counter()
+                added = self._append_reader(reader, keep_structure=True)
+                if isinstance(pdf_path, str):
+                    record_document_timing(title or os.path.basename(pdf_path), parsed - started,
+                                           time.perf_counter() - parsed)
+            # The reader and its object cache go out of scope here
+        except Exception:
+            self._rollback(checkpoint)
+            raise
+        finally:
+            written, self.stream = self.stream, output
+        self.stream.write(written.getvalue())
+        return added
+
+    def _checkpoint(self):
+        return (self.position, self.next_number, len(self.page_numbers), list(self._pending_packed),
+                len(self.outline), len(self.named_destinations), len(self.form_fields),
+                self.form_defaults,
+                self.dedup.checkpoint() if self.dedup is not None else None,
+                self.compact.checkpoint() if self.compact is not None else None)
+
+    def _rollback(self, checkpoint):
+        """Undo everything written since checkpoint, which has not reached the stream."""
+        (position, next_number, page_count, pending_packed, outline_count, destination_count,
+         field_count, form_defaults, dedup, compact) = checkpoint
+        self.position = position
+        for number in range(next_number, self.next_number):
+            self.offsets.pop(number, None)
+        # An object stream written since holds objects queued before it too;
+        # they go back in the queue
+        self.packed = {number: location for number, location in self.packed.items()
+                       if location[0] < next_number}
+        self._pending_packed = pending_packed
+        del self.page_numbers[page_count:]
+        # Imported bookmarks are top-level items or children of each other
+        del self.outline[outline_count:]
+        self.named_destinations = dict(list(self.named_destinations.items())[:destination_count])
+        del self.form_fields[field_count:]
+        self.form_defaults = form_defaults
+        self.next_number = next_number
+        if self.dedup is not None:
+            self.dedup.rollback(dedup, next_number)
+        if self.compact is not None:
+            self.compact.rollback(compact)
+
+    def _append_reader(self, reader, keep_structure=False):
+        """Write a reader's pages; keep_structure also imports its outline, destinations and fields."""
+        mapping = {}
+        pending = deque()
+
+        # References to the input's page tree resolve to the output's tree;
+        # pages point at it through a placeholder that no input object uses
+        mapping[PARENT_KEY] = self.pages_number
+        input_pages = reader.trailer['/Root'].get_object().raw_get(NameObject('/Pages'))
+        if isinstance(input_pages, IndirectObject):
+            mapping[(input_pages.idnum, input_pages.generation)] = self.pages_number
+
+        pages = list(reader.pages)
+        page_numbers = []
+        for page in pages:
+            ref = page.indirect_ref
+            number = self._reserve()
+            if ref is not None:
+                mapping[(ref.idnum, ref.generation)] = number
+            page_numbers.append(number)
+
+        first_index = len(self.page_numbers)
+        for page, number in zip(pages, page_numbers):
+            page_dict = DictionaryObject(
+                (key, value) for key, value in page.items() if key != '/Parent'
+            )
+            page_dict[NameObject('/Parent')] = IndirectObject(*PARENT_KEY, None)
+            self._write_object(number, page_dict, mapping, pending)
+            self.page_numbers.append(number)
+            # Write everything this page references before the next page
+            self._write_pending(reader, mapping, pending)
+
+        if keep_structure:
+            # Input page object number -> index of the page in the output
+            page_index = {ref.idnum: first_index + i
+                          for i, ref in enumerate(page.indirect_ref for page in pages) if ref is not None}
+            self._import_outline(reader.outline, page_index)
+            for name, destination in reader.named_destinations.items():
+                index = self._destination_page(destination, page_index)
+                if index is not None and name not in self.named_destinations:
+                    self.named_destinations[name] = (index, self._fit(destination))
+            self._import_form(reader, mapping, pending)
+        return len(pages)
+
+    def _write_pending(self, reader, mapping, pending):
+        while pending:
+            ref, digest = pending.popleft()
+            number = mapping[(ref.idnum, ref.generation)]
+            self._write_object(number, reader.get_object(ref), mapping, pending)
+            if digest is not None:
+                # Later inputs may point at the stream now that it is written
+                self.dedup.register(digest, number)
+
+    @staticmethod
+    def _destination_page(destination, page_index):
+        page = destination.page
+        return page_index.get(page.idnum) if isinstance(page, IndirectObject) else None
+
+    @staticmethod
+    def _fit(destination):
+        """How a destination shows its page, e.g. b'/XYZ 0 792 null'."""
+        buffer = io.BytesIO()
+        for i, value in enumerate(destination.dest_array[1:]):
+            if i:
+                buffer.write(b' ')
+            value.write_to_stream(buffer, None)
+        return buffer.getvalue()
+
+    def _import_outline(self, items, page_index, parent=None):
+        """Add an input's bookmarks, nested as in the input, under parent.
+
+        Bookmarks to pages the input does not have are left out with
+        their children, as PdfMerger does.
+        """
+        handle = None
+        for item in items:
+            if isinstance(item, list):
+                if handle is not None:
+                    self._import_outline(item, page_index, handle)
+                continue
+            index = self._destination_page(item, page_index)
+            handle = None
+            if index is not None:
+                handle = self.add_outline_item(item.title, index, parent, fit=self._fit(item))
+
+    def _import_form(self, reader, mapping, pending):
+        """Keep the input's form fields that its pages use.
+
+        Fields are reached through the widget annotations already written
+        with the pages. The first form's defaults (resources, appearance)
+        apply to the whole output.
+        """
+        form = reader.trailer['/Root'].get_object().get('/AcroForm')
+        if form is None:
+            return
+        form = form.get_object()
+        for field in form.get('/Fields', ArrayObject()).get_object():
+            if isinstance(field, IndirectObject) and (field.idnum, field.generation) in mapping:
+                self.form_fields.append(mapping[(field.idnum, field.generation)])
+        if self.form_defaults is None and self.form_fields:
+            buffer = io.BytesIO()
+            for key in ('/DR', '/DA', '/Q', '/NeedAppearances'):
+                if key in form:
+                    buffer.write(b' ')
+                    NameObject(key).write_to_stream(buffer, None)
+                    buffer.write(b' ')
+                    self._serialize(form.raw_get(key), buffer, mapping, pending)
+            self._write_pending(reader, mapping, pending)
+            self.form_defaults = buffer.getvalue()
+
+    def _write_object(self, number, obj, mapping, pending):
+        buffer = io.BytesIO()
+        self._serialize(obj, buffer, mapping, pending)
+        if isinstance(obj, StreamObject):
+            self._write_indirect(number, buffer.getvalue())
+        else:
+            self._write_plain(number, buffer.getvalue())
+
+    def _remap(self, ref, mapping, pending):
+        key = (ref.idnum, ref.generation)
+        if key not in mapping:
+            number = None
+            digest = None
+            if self.dedup is not None:
+                obj = ref.get_object()
+                digest = self.dedup.digest(obj)
+                if digest is not None:
+                    number = self.dedup.lookup(digest, obj)
+            if number is None:
+                number = self._reserve()
+                pending.append((ref, digest))
+            mapping[key] = number
+        return mapping[key]
+
+    def _serialize(self, obj, out, mapping, pending):
+        """Write obj in PDF syntax with indirect references renumbered."""
+        if isinstance(obj, IndirectObject):
+            out.write(b'%d 0 R' % self._remap(obj, mapping, pending))
+        elif isinstance(obj, StreamObject):
+            data = obj._data
+            compressed = None
+            if self.compact is not None and '/Filter' not in obj:
+                compressed = self.compact.compress(data)
+            if compressed is not None:
+                data = compressed
+            self._serialize_dict(obj, out, mapping, pending, length=len(data),
+                                 flate=compressed is not None)
+            out.write(b'\nstream\n')
+            out.write(data)
+            out.write(b'\nendstream')
+        elif isinstance(obj, DictionaryObject):
+            self._serialize_dict(obj, out, mapping, pending)
+        elif isinstance(obj, ArrayObject):
+            out.write(b'[')
+            for i, item in enumerate(obj):
+                if i:
+                    out.write(b' ')
+                self._serialize(item, out, mapping, pending)
+            out.write(b']')
+        elif obj is None:
+            out.write(b'null')
+        else:
+            obj.write_to_stream(out, None)
+
+    def _serialize_dict(self, obj, out, mapping, pending, length=None, flate=False):
+        out.write(b'<<')
+        for key, value in obj.items():
+            if length is not None and key == '/Length':
+                continue
+            if flate and key == '/DecodeParms':
+                continue
+            out.write(b'\n')
+            NameObject(key).write_to_stream(out, None)
+            out.write(b' ')
+            self._serialize(value, out, mapping, pending)
+        if length is not None:
+            out.write(b'\n/Length %d' % length)
+        if flate:
+            out.write(b'\n/Filter /FlateDecode')
+        out.write(b'\n>>')
+
+    def add_outline_item(self, title, page_index, parent=None, fit=b'/Fit'):
+        """Add a bookmark to a page; returns a handle usable as parent."""
+        self.outline.append({'title': title, 'page': page_index, 'parent': parent, 'children': [],
+                             'fit': fit})
+        handle = len(self.outline) - 1
+        if parent is not None:
+            self.outline[parent]['children'].append(handle)
+        return handle
+
+    def _write_indirect(self, number, body):
+        self.offsets[number] = self.position
+        self._write(b'%d 0 obj\n' % number + body + b'\nendobj\n')
+
+    def _write_plain(self, number, body):
+        """Write a non-stream object, packed into an object stream when compacting."""
+        if self.compact is None or not self.compact.pack_objects:
+            self._write_indirect(number, body)
+            return
+        self._pending_packed.append((number, body))
+        if len(self._pending_packed) >= OBJECT_STREAM_SIZE:
+            self._write_object_stream()
+
+    def _write_object_stream(self):
+        if not self._pending_packed:
+            return
+        stream_number = self._reserve()
+        header = []
+        bodies = []
+        offset = 0
+        # The objects written plain, each with its obj/endobj wrapper
+        plain_size = 0
+        for index, (number, body) in enumerate(self._pending_packed):
+            plain_size += len(b'%d 0 obj\n' % number) + len(body) + len(b'\nendobj\n')
+            header.append(b'%d %d' % (number, offset))
+            bodies.append(body)
+            offset += len(body) + 1
+            self.packed[number] = (stream_number, index)
+        header = b' '.join(header) + b'\n'
+        data = zlib.compress(header + b'\n'.join(bodies) + b'\n', self.compact.level)
+        self.compact.objects_packed += len(self._pending_packed)
+        position = self.position
+        self._write_indirect(stream_number, b'<< /Type /ObjStm /N %d /First %d /Filter /FlateDecode /Length %d >>\nstream\n' % (
+            len(self._pending_packed), len(header), len(data)) + data + b'\nendstream')
+        self.compact.packing_bytes_saved += plain_size - (self.position - position)
+        self._pending_packed = []
+
+    def _write_xref_stream(self, rows, trailer):
+        """Write a compressed cross-reference stream and the file trailer.
+
+        rows maps object numbers to (type, field2, field3) entries; trailer
+        holds the extra dictionary entries (/Root, /Prev, ...) as bytes.
+        """
+        number = self._reserve()
+        xref_position = self.position
+        rows[number] = (1, xref_position, 0)
+        numbers = sorted(rows)
+        width = max(1, (max(row[1] for row in rows.values()).bit_length() + 7) // 8)
+        data = b''.join(
+            bytes([rows[n][0]]) + rows[n][1].to_bytes(width, 'big') + rows[n][2].to_bytes(2, 'big')
+            for n in numbers
+        )
+        runs = []
+        run_start = 0
+        for i in range(1, len(numbers) + 1):
+            if i == len(numbers) or numbers[i] != numbers[i - 1] + 1:
+                runs.append(b'%d %d' % (numbers[run_start], i - run_start))
+                run_start = i
+        data = zlib.compress(data)
+        self._write_indirect(number, b'<< /Type /XRef /Size %d /W [1 %d 2] /Index [%s]%s /Filter /FlateDecode /Length %d >>\nstream\n' % (
+            self.next_number, width, b' '.join(runs), trailer, len(data)) + data + b'\nendstream')
+        self._write(b'startxref\n%d\n%%%%EOF\n' % xref_position)
+
+    def _write_outline(self):
+        if not self.outline:
+            return None
+        root_number = self._reserve()
+        numbers = [self._reserve() for _ in self.outline]
+        top_level = [i for i, item in enumerate(self.outline) if item['parent'] is None]
+
+        def title_bytes(title):
+            buffer = io.BytesIO()
+            TextStringObject(title).write_to_stream(buffer, None)
+            return buffer.getvalue()
+
+        def descendants(i):
+            # Items are open, so /Count is every item below, at any depth
+            return sum(1 + descendants(child) for child in self.outline[i]['children'])
+
+        def siblings_of(i):
+            parent = self.outline[i]['parent']
+            return top_level if parent is None else self.outline[parent]['children']
+
+        for i, item in enumerate(self.outline):
+            siblings = siblings_of(i)
+            position = siblings.index(i)
+            parent_number = root_number if item['parent'] is None else numbers[item['parent']]
+            page_number = self.page_numbers[min(item['page'], len(self.page_numbers) - 1)]
+            body = b'<< /Title ' + title_bytes(item['title'])
+            body += b' /Parent %d 0 R' % parent_number
+            body += b' /Dest [%d 0 R %s]' % (page_number, item['fit'])
+            if position > 0:
+                body += b' /Prev %d 0 R' % numbers[siblings[position - 1]]
+            if position < len(siblings) - 1:
+                body += b' /Next %d 0 R' % numbers[siblings[position + 1]]
+            if item['children']:
+                body += b' /First %d 0 R /Last %d 0 R /Count %d' % (
+                    numbers[item['children'][0]], numbers[item['children'][-1]],
+                    descendants(i))
+            self._write_plain(numbers[i], body + b' >>')
+
+        self._write_plain(root_number, b'<< /Type /Outlines /First %d 0 R /Last %d 0 R /Count %d >>' % (
+            numbers[top_level[0]], numbers[top_level[-1]], len(self.outline)))
+        return root_number
+
+    def _write_destinations(self):
+        """Write the named destinations; returns the catalog entries pointing at them.
+
+        Names from a name tree go into a name tree, names from an old-style
+        /Dests dictionary into a /Dests dictionary, so links keep resolving.
+        """
+        def entry(name, name_type):
+            index, fit = self.named_destinations[name]
+            buffer = io.BytesIO()
+            name_type(name).write_to_stream(buffer, None)
+            return buffer.getvalue() + b' [%d 0 R %s]' % (self.page_numbers[index], fit)
+
+        entries = b''
+        # A name tree lists its keys in sorted order
+        strings = sorted(name for name in self.named_destinations if not isinstance(name, NameObject))
+        if strings:
+            number = self._reserve()
+            self._write_plain(number, b'<< /Names [' + b' '.join(
+                entry(name, TextStringObject) for name in strings) + b'] >>')
+            entries += b' /Names << /Dests %d 0 R >>' % number
+        names = [name for name in self.named_destinations if isinstance(name, NameObject)]
+        if names:
+            number = self._reserve()
+            self._write_plain(number, b'<< ' + b' '.join(entry(name, NameObject) for name in names) + b' >>')
+            entries += b' /Dests %d 0 R' % number
+        return entries
+
+    def close(self):
+        """Write the page tree, outline, named destinations, catalog, xref table and trailer."""
+        kids = b' '.join(b'%d 0 R' % number for number in self.page_numbers)
+        self._write_plain(self.pages_number, b'<< /Type /Pages /Kids [' + kids +
+                          b'] /Count %d >>' % len(self.page_numbers))
+        outline_number = self._write_outline()
+        destinations = self._write_destinations()
+        catalog = b'<< /Type /Catalog /Pages %d 0 R' % self.pages_number
+        if outline_number is not None:
+            catalog += b' /Outlines %d 0 R /PageMode /UseOutlines' % outline_number
+        catalog += destinations
+        if self.form_fields:
+            catalog += b' /AcroForm << /Fields [' + b' '.join(
+                b'%d 0 R' % number for number in self.form_fields) + b']' + self.form_defaults + b' >>'
+        self._write_plain(self.catalog_number, catalog + b' >>')
+
+        if self.compact is not None and self.compact.pack_objects:
+            self._write_object_stream()
+            rows = {0: (0, 0, 65535)}
+            for number in range(1, self.next_number):
+                if number in self.offsets:
+                    rows[number] = (1, self.offsets[number], 0)
+                elif number in self.packed:
+                    rows[number] = (2,) + self.packed[number]
+                else:
+                    rows[number] = (0, 0, 65535)
+            # The xref table and trailer a plain file would end with, without the object streams
+            size = self.next_number - len({location[0] for location in self.packed.values()})
+            position = self.position
+            plain_size = len(b'xref\n0 %d\n' % size) + 20 * size + len(
+                b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (size, self.catalog_number, position))
+            self._write_xref_stream(rows, b' /Root %d 0 R' % self.catalog_number)
+            self.compact.packing_bytes_saved += plain_size - (self.position - position)
+            return
+
+        xref_position = self.position
+        size = self.next_number
+        lines = [b'xref\n0 %d\n' % size, b'0000000000 65535 f\r\n']
+        for number in range(1, size):
+            if number in self.offsets:
+                lines.append(b'%010d 00000 n\r\n' % self.offsets[number])
+            else:
+                lines.append(b'0000000000 65535 f\r\n')
+        self._write(b''.join(lines))
+        self._write(b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (
+            size, self.catalog_number, xref_position))
+
+def stream_merge(output_path, dedup, compact, steps):
+    """Run steps against a StreamingPdfWriter, yielding the output as it is written.
+
+    steps(writer) is a generator that appends the inputs and yields
+    whenever what has been written so far can go out; the writer is
+    closed after it. If output_path is given, a copy of the output is
+    also written to disk.
+    """
+    buffer = ChunkBuffer()
+    writer = StreamingPdfWriter(buffer, dedup, compact)
+    output_file = open(output_path, 'wb') if output_path else None
+    
+    def emit():
+        chunk = buffer.drain()
+        if output_file:
+            output_file.write(chunk)
+        return chunk
+    
+    try:
+        for _ in steps(writer):
+            yield emit()
+        
+        # The page tree, outline, xref and trailer
+        writer.close()
+        yield emit()
+    finally:
+        if output_file:
+            output_file.close()
+
+class ChunkBuffer:
+    """In-memory sink that hands written bytes out in chunks."""
+
+    def __init__(self):
+        self._buffer = io.BytesIO()
+
+    def write(self, data):
+        self._buffer.write(data)
+        return len(data)
+
+    def drain(self):
+        data = self._buffer.getvalue()
+        self._buffer = io.BytesIO()
+        return data
@@ -1,336 +1,384 @@
-import os
+import io
+import threading
+from datetime import datetime
 import PyPDF2
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
-from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib import colors
+from models.book import Book
+from utils.merge_utils import (
+    as_manifest, append_documents, append_entry, drain_stream, stream_documents, write_merged
+)
+from utils.metrics import stage
+from utils.pdf_metadata import get_pdf_page_count, get_pdf_metadata, get_pdf_page_sizes
+from utils.pdf_stream_writer import stream_merge
+from utils.pdf_splice import splice_pdf
+from utils.pdf_linearize import linearize_file
 
-def get_pdf_page_count(pdf_path):
-    """Returns the number of pages in a PDF file."""
-    with open(pdf_path, 'rb') as file:
-        reader = PyPDF2.PdfReader(file)
-        return len(reader.pages)
+# English strings used when a caller passes no translations
+DEFAULT_TRANSLATIONS = {
+    "book_title": "Book of Documents",
+    "generated_on": "Generated on",
+    "index_title": "Index of Contents",
+    "index_navigation_hint": "Use the bookmarks panel in your PDF viewer to navigate between documents",
+    "document_name": "Document Name",
+    "starting_page": "Starting Page",
+    "ending_page": "Ending Page",
+    "status": "Status",
+    "included": "Included",
+    "error": "Error",
+    "total_documents": "Total Documents",
+    "total_pages": "Total Pages",
+    "receipt_title": "Processing Receipt",
+    "summary": "Summary",
+    "book_id": "Book ID",
+    "created": "Created",
+    "processing_results": "Processing Results",
+    "pages": "Pages",
+    "errors": "Errors",
+    "none": "None"
+}
 
-def create_cover_page(output_path, title, translations=None):
-    """Create a cover page for the Book of Documents."""
-    if translations is None:
-        translations = {"generated_on": "Generated on"}
-    
-    c = canvas.Canvas(output_path, pagesize=letter)
-    width, height = letter
-    
-    # Draw the title
-    c.setFont("Helvetica-Bold", 24)
-    c.drawCentredString(width/2, height - 100, title)
-    
-    # Draw the date
-    from datetime import datetime
-    c.setFont("Helvetica", 12)
-    c.drawCentredString(width/2, height - 150, 
-                      f"{translations.get('generated_on', 'Generated on')} {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    
-    c.save()
-    return output_path
+# Table styling shared by the index and the receipt; per-row zebra striping
+# and status colours are added when a table is laid out
+TABLE_STYLE_COMMANDS = [
+    # Header styling
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2c3e50')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 12),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('TOPPADDING', (0, 0), (-1, 0), 12),
+    
+    # Content styling - alternating rows
+    ('BACKGROUND', (0, 1), (-1, -1), colors.whitesmoke),
+    ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+    ('ALIGN', (1, 1), (-1, -1), 'CENTER'),  # Center-align numeric columns
+    ('ALIGN', (0, 1), (0, -1), 'LEFT'),     # Left-align document names
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 1), (-1, -1), 10),
+    ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
+    ('TOPPADDING', (0, 1), (-1, -1), 8),
+    
+    # Grid styling
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ('BOX', (0, 0), (-1, -1), 1, colors.black),
+    ('LINEBELOW', (0, 0), (-1, 0), 2, colors.HexColor('#2c3e50')),
+]
+ZEBRA_COLOR = colors.HexColor('#f2f2f2')
 
-def create_index_page(output_path, documents, translations=None):
-    """Create an index page listing all documents with page numbers."""
-    # Default translations to English if not provided
-    if translations is None:
-        translations = {
-            "book_title": "Book of Documents",
-            "index_title": "Index of Contents",
-            "index_navigation_hint": "Use the bookmarks panel in your PDF viewer to navigate between documents",
-            "document_name": "Document Name",
-            "starting_page": "Starting Page",
-            "ending_page": "Ending Page",
-            "status": "Status",
-            "included": "Included",
-            "error": "Error",
-            "total_documents": "Total Documents",
-            "total_pages": "Total Pages"
-        }
-    
-    index_doc = SimpleDocTemplate(
-        output_path,
-        pagesize=letter,
-        leftMargin=36,
-        rightMargin=36,
-        topMargin=36,
-        bottomMargin=36
-    )
-    styles = getSampleStyleSheet()
-    
-    # Create custom styles
-    title_style = styles['Title']
-    title_style.fontSize = 24
-    title_style.spaceAfter = 20
-    
-    subtitle_style = styles['Heading2']
-    subtitle_style.alignment = 1  # Center alignment
-    subtitle_style.spaceAfter = 30
-    
-    # Create style for document names (blue but not clickable)
-    doc_name_style = styles['Normal'].clone('DocStyle')
-    doc_name_style.textColor = colors.blue
-    doc_name_style.fontSize = 10
-    
-    # Create content
-    content = []
-    
-    # Add title and subtitle with translations
-    content.append(Paragraph(translations["book_title"], title_style))
-    content.append(Paragraph(translations["index_title"], subtitle_style))
-    content.append(Paragraph(translations["index_navigation_hint"], styles['Italic']))
-    content.append(Paragraph(" ", styles['Normal']))
-    
-    # Create table for index with better column widths
-    column_widths = [280, 75, 75, 70]
-    data = [[translations["document_name"], translations["starting_page"], 
-             translations["ending_page"], translations["status"]]]
-    
-    current_page = 1  # Cover page is page 1
-    current_page += 1  # Add index page to count
-    
-    # Add document rows
-    for i, document in enumerate(documents):
-        if document.status == "success":
-            status_text = translations["included"]
+class FrontMatterRenderer:
+    """Renders the cover, index and receipt pages for one language.
+
+    Paragraph styles and translated table headers are built once, when the
+    renderer is created; rendering only lays out the per-book content.
+    Outputs may be file paths or writable binary files.
+    """
+
+    def __init__(self, translations):
+        self.translations = dict(DEFAULT_TRANSLATIONS, **translations)
+        styles = getSampleStyleSheet()
+        self.normal_style = styles['Normal']
+        self.italic_style = styles['Italic']
+        self.title_style = ParagraphStyle('FrontMatterTitle', parent=styles['Title'],
+                                          fontSize=24, spaceAfter=20)
+        self.subtitle_style = ParagraphStyle('FrontMatterSubtitle', parent=styles['Heading2'],
+                                             alignment=1, spaceAfter=30)  # Center alignment
+        # Document names are blue but not clickable
+        self.doc_name_style = ParagraphStyle('DocStyle', parent=styles['Normal'],
+                                             textColor=colors.blue, fontSize=10)
+        self.footer_style = ParagraphStyle('FrontMatterFooter', parent=styles['Normal'],
+                                           alignment=1, spaceBefore=30)
+        t = self.translations
+        self.index_header = [t["document_name"], t["starting_page"], t["ending_page"], t["status"]]
+        self.receipt_header = [t["document_name"], t["status"], t["pages"], t["errors"]]
+
+    def render(self, book, cover_path=None, index_path=None, receipt_path=None):
+        """Render the requested front-matter pages of a book in one call.
+
+        Each page is timed as its own generation stage (cover, index, receipt).
+        """
+        if cover_path is not None:
+            with stage('cover'):
+                self.render_cover(cover_path, self.translations["book_title"])
+        if index_path is not None:
+            with stage('index'):
+                self.render_index(index_path, book.documents)
+        if receipt_path is not None:
+            with stage('receipt'):
+                self.render_receipt(receipt_path, book)
+
+    def _document(self, output_path):
+        return SimpleDocTemplate(
+            output_path,
+            pagesize=letter,
+            leftMargin=36,
+            rightMargin=36,
+            topMargin=36,
+            bottomMargin=36
+        )
+
+    def _table_style(self, row_count, status_column, is_success):
+        commands = TABLE_STYLE_COMMANDS + [
+            # Zebra striping
+            *[('BACKGROUND', (0, i), (-1, i), ZEBRA_COLOR) for i in range(2, row_count, 2)],
             
+            # Status column color coding
+            *[('TEXTCOLOR', (status_column, i), (status_column, i),
+               colors.green if is_success(i) else colors.red)
+              for i in range(1, row_count)],
+        ]
+        return TableStyle(commands)
+
+    def render_cover(self, output_path, title):
+        c = canvas.Canvas(output_path, pagesize=letter)
+        width, height = letter
+        
+        # Draw the title
+        c.setFont("Helvetica-Bold", 24)
+        c.drawCentredString(width/2, height - 100, title)
+        
+        # Draw the date
+        c.setFont("Helvetica", 12)
+        c.drawCentredString(width/2, height - 150,
+                            f"{self.translations['generated_on']} {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        
+        c.save()
+        return output_path
+
+    def render_index(self, output_path, documents):
+        t = self.translations
+        
+        # Title and subtitle
+        content = [
+            Paragraph(t["book_title"], self.title_style),
+            Paragraph(t["index_title"], self.subtitle_style),
+            Paragraph(t["index_navigation_hint"], self.italic_style),
+            Paragraph(" ", self.normal_style)
+        ]
+        
+        data = [self.index_header]
+        current_page = 1  # Cover page is page 1
+        current_page += 1  # Add index page to count
+        
+        # Add document rows
+        for document in documents:
             # Format long file names nicely
             doc_name = document.original_filename
             if len(doc_name) > 40:
                 doc_name = doc_name[:37] + "..."
             
-            start_page = current_page
-            end_page = current_page + document.page_count - 1
-            
-            # Add document name with blue styling but NO link
-            doc_text = Paragraph(doc_name, doc_name_style)
+            if document.status == "success":
+                start_page = current_page
+                end_page = current_page + document.page_count - 1
+                data.append([Paragraph(doc_name, self.doc_name_style), start_page, end_page, t["included"]])
+                current_page += document.page_count
+            else:
+                # For error documents
+                data.append([doc_name, "-", "-", t["error"]])
+        
+        # Add receipt page to count
+        current_page += 1
+        
+        table = Table(data, colWidths=[280, 75, 75, 70])
+        table.setStyle(self._table_style(len(data), 3, lambda i: data[i][3] == t["included"]))
+        content.append(table)
+        
+        # Add footer text
+        footer_text = f"{t['total_documents']}: {len(documents)} | {t['total_pages']}: {current_page - 1}"
+        content.append(Paragraph(footer_text, self.footer_style))
+        
+        self._document(output_path).build(content)
+        return output_path
+
+    def render_receipt(self, output_path, book):
+        t = self.translations
+        content = [
+            Paragraph(t["receipt_title"], self.title_style),
+            Paragraph(" ", self.normal_style),
             
-            data.append([
-                doc_text,
-                start_page,
-                end_page,
-                status_text
-            ])
-            current_page += document.page_count
-        else:
-            # For error documents
-            status_text = translations["error"]
+            # Summary
+            Paragraph(f"{t['book_id']}: {book.id}", self.normal_style),
+            Paragraph(f"{t['created']}: {book.created_at.strftime('%Y-%m-%d %H:%M:%S')}", self.normal_style),
+            Paragraph(f"{t['total_documents']}: {len(book.documents)}", self.normal_style),
+            Paragraph(f"{t['total_pages']}: {book.total_pages}", self.normal_style),
+            Paragraph(" ", self.normal_style),
             
-            # Format long file names nicely
-            doc_name = document.original_filename
-            if len(doc_name) > 40:
-                doc_name = doc_name[:37] + "..."
-                
+            # Detailed results
+            Paragraph(t["processing_results"], self.subtitle_style)
+        ]
+        
+        data = [self.receipt_header]
+        for doc in book.documents:
             data.append([
-                doc_name,
-                "-",
-                "-",
-                status_text
+                doc.original_filename,
+                doc.status,
+                doc.page_count,
+                "\n".join(doc.errors) if doc.errors else t["none"]
             ])
-    
-    # Add receipt page to count
-    current_page += 1
-    
-    # Create table with enhanced styling
-    table = Table(data, colWidths=column_widths)
-    table_style = [
-        # Header styling
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2c3e50')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('TOPPADDING', (0, 0), (-1, 0), 12),
         
-        # Content styling - alternating rows
-        ('BACKGROUND', (0, 1), (-1, -1), colors.whitesmoke),
-        ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-        ('ALIGN', (1, 1), (-1, -1), 'CENTER'),  # Center-align numeric columns
-        ('ALIGN', (0, 1), (0, -1), 'LEFT'),     # Left-align document names
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
-        ('TOPPADDING', (0, 1), (-1, -1), 8),
+        table = Table(data, colWidths=[200, 75, 75, 150])
+        table.setStyle(self._table_style(len(data), 1, lambda i: data[i][1] == "success"))
+        content.append(table)
         
-        # Grid styling
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-        ('BOX', (0, 0), (-1, -1), 1, colors.black),
-        ('LINEBELOW', (0, 0), (-1, 0), 2, colors.HexColor('#2c3e50')),
-        
-        # Zebra striping
-        *[('BACKGROUND', (0, i), (-1, i), colors.HexColor('#f2f2f2')) for i in range(2, len(data), 2)],
-        
-        # Status column color coding
-        *[('TEXTCOLOR', (3, i), (3, i), 
-          colors.green if isinstance(data[i][3], str) and data[i][3] == "Included" else colors.red) 
-          for i in range(1, len(data))],
-    ]
-    
-    table.setStyle(TableStyle(table_style))
-    content.append(table)
-    
-    # Add footer text with translations
-    footer_text = f"{translations['total_documents']}: {len(documents)} | {translations['total_pages']}: {current_page - 1}"
-    footer_style = styles['Normal']
-    footer_style.alignment = 1  # Center alignment
-    footer_style.spaceBefore = 30
-    content.append(Paragraph(footer_text, footer_style))
-    
-    # Build the PDF
-    index_doc.build(content)
-    return output_path
+        self._document(output_path).build(content)
+        return output_path
+
+_renderers = {}
+_renderers_lock = threading.Lock()
+
+def get_front_matter_renderer(translations=None):
+    """Return the process-wide renderer for a set of translations."""
+    translations = translations or DEFAULT_TRANSLATIONS
+    key = tuple(sorted(translations.items()))
+    with _renderers_lock:
+        if key not in _renderers:
+            _renderers[key] = FrontMatterRenderer(translations)
+        return _renderers[key]
+
+def warm_up_front_matter(all_translations):
+    """Build a renderer per language and render one throwaway book with each.
+
+    Run at startup so the first generation does not pay for style set-up,
+    font metrics and layout code being loaded.
+    """
+    book = Book()
+    for translations in all_translations:
+        renderer = get_front_matter_renderer(translations)
+        # The pages one by one, so the throwaway book stays out of the stage metrics
+        renderer.render_cover(io.BytesIO(), renderer.translations["book_title"])
+        renderer.render_index(io.BytesIO(), book.documents)
+        renderer.render_receipt(io.BytesIO(), book)
+
+def render_front_matter(book, translations, cover_path=None, index_path=None, receipt_path=None):
+    """Render a book's cover, index and receipt with the cached renderer."""
+    get_front_matter_renderer(translations).render(book, cover_path, index_path, receipt_path)
+
+def create_cover_page(output_path, title, translations=None):
+    """Create a cover page for the Book of Documents."""
+    return get_front_matter_renderer(translations).render_cover(output_path, title)
+
+def create_index_page(output_path, documents, translations=None):
+    """Create an index page listing all documents with page numbers."""
+    return get_front_matter_renderer(translations).render_index(output_path, documents)
 
 def create_receipt_page(output_path, book, translations=None):
     """Create a receipt page showing processing results."""
-    # Default translations to English if not provided
-    if translations is None:
-        translations = {
-            "receipt_title": "Processing Receipt",
-            "summary": "Summary",
-            "book_id": "Book ID",
-            "created": "Created",
-            "total_documents": "Total Documents",
-            "total_pages": "Total Pages",
-            "processing_results": "Processing Results",
-            "document_name": "Document Name",
-            "status": "Status",
-            "pages": "Pages",
-            "errors": "Errors",
-            "none": "None"
-        }
-    
-    receipt_doc = SimpleDocTemplate(
-        output_path,
-        pagesize=letter,
-        leftMargin=36,
-        rightMargin=36,
-        topMargin=36,
-        bottomMargin=36
-    )
-    styles = getSampleStyleSheet()
-    
-    # Create custom styles
-    title_style = styles['Title']
-    title_style.fontSize = 24
-    title_style.spaceAfter = 20
-    
-    subtitle_style = styles['Heading2']
-    subtitle_style.alignment = 1  # Center alignment
-    subtitle_style.spaceAfter = 30
-    
-    # Create content
-    content = []
-    
-    # Add title and subtitle with translations
-    content.append(Paragraph(translations["receipt_title"], title_style))
-    content.append(Paragraph(" ", styles['Normal']))
-    
-    # Add summary with translations
-    content.append(Paragraph(f"{translations['book_id']}: {book.id}", styles['Normal']))
-    content.append(Paragraph(f"{translations['created']}: {book.created_at.strftime('%Y-%m-%d %H:%M:%S')}", styles['Normal']))
-    content.append(Paragraph(f"{translations['total_documents']}: {len(book.documents)}", styles['Normal']))
-    content.append(Paragraph(f"{translations['total_pages']}: {book.total_pages}", styles['Normal']))
-    content.append(Paragraph(" ", styles['Normal']))
-    
-    # Add detailed results
-    content.append(Paragraph(translations["processing_results"], subtitle_style))
-    
-    # Create table for results with translations
-    data = [[translations["document_name"], translations["status"], 
-             translations["pages"], translations["errors"]]]
-    
-    for doc in book.documents:
-        data.append([
-            doc.original_filename,
-            doc.status,
-            doc.page_count,
-            "\n".join(doc.errors) if doc.errors else translations["none"]
-        ])
-    
-    # Create table with enhanced styling
-    table = Table(data, colWidths=[200, 75, 75, 150])
-    table.setStyle(TableStyle([
-        # Header styling
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2c3e50')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('TOPPADDING', (0, 0), (-1, 0), 12),
-        
-        # Content styling - alternating rows
-        ('BACKGROUND', (0, 1), (-1, -1), colors.whitesmoke),
-        ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-        ('ALIGN', (1, 1), (-1, -1), 'CENTER'),  # Center-align numeric columns
-        ('ALIGN', (0, 1), (0, -1), 'LEFT'),     # Left-align document names
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
-        ('TOPPADDING', (0, 1), (-1, -1), 8),
-        
-        # Grid styling
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-        ('BOX', (0, 0), (-1, -1), 1, colors.black),
-        ('LINEBELOW', (0, 0), (-1, 0), 2, colors.HexColor('#2c3e50')),
-        
-        # Zebra striping
-        *[('BACKGROUND', (0, i), (-1, i), colors.HexColor('#f2f2f2')) for i in range(2, len(data), 2)],
-        
-        # Status column color coding
-        *[('TEXTCOLOR', (1, i), (1, i), 
-          colors.green if data[i][1] == "success" else colors.red) 
-          for i in range(1, len(data))],
-    ]))
-    
-    content.append(table)
-    
-    # Build the PDF
-    receipt_doc.build(content)
-    return output_path
+    return get_front_matter_renderer(translations).render_receipt(output_path, book)
+
+def merge_pdfs(pdf_paths, output_path, progress=None, streaming=False, dedup=None, compact=None,
+               linearize=False):
+    """Merge multiple PDFs into a single file with bookmarks for navigation.
 
-def merge_pdfs(pdf_paths, output_path):
-    """Merge multiple PDFs into a single file with bookmarks for navigation."""
+    pdf_paths may be plain paths or ManifestEntry objects; every input is
+    parsed exactly once. progress, if given, is called with
+    documents_merged/documents_total and bytes_written keyword arguments.
+    With streaming, objects are written out as each input is read and its
+    reader is released, so memory is bounded by the largest input rather
+    than the whole book. A StreamDeduplicator as dedup makes the streaming
+    merge write streams shared between inputs only once; PdfMerger's
+    writer already shares identical objects. An OutputCompactor as compact
+    implies streaming and writes object streams, an xref stream and
+    compressed content. linearize rewrites the finished file for fast web
+    view, so viewers can show the first page before the rest arrives.
+    """
+    manifest = as_manifest(pdf_paths)
+    if streaming or compact is not None:
+        drain_stream(stream_pdfs(manifest, output_path, progress, dedup, compact), progress)
+        if linearize:
+            linearize_file(output_path)
+        return output_path
     merger = PyPDF2.PdfMerger()
     
     # Add cover page
-    merger.append(pdf_paths[0])
+    append_entry(merger, manifest[0])
     
     # Add index page
-    merger.append(pdf_paths[1])
+    append_entry(merger, manifest[1])
     
-    # Add each document with a bookmark
-    current_page = 2  # Start after cover and index
-    for i, pdf in enumerate(pdf_paths[2:-1]):  # Skip cover, index, and receipt pages
-        try:
-            # Add the document to the merger
-            merger.append(pdf)
-            
-            # Add bookmark that links to this page
-            doc_name = os.path.basename(pdf)
-            # Create a bookmark at the current page number
-            merger.add_outline_item(doc_name, current_page, parent=None)
-            
-            # Get page count to update current_page
-            with open(pdf, 'rb') as f:
-                reader = PyPDF2.PdfReader(f)
-                current_page += len(reader.pages)
-        except Exception as e:
-            print(f"Error merging {pdf}: {str(e)}")
+    # Add each document with a bookmark, skipping cover, index, and receipt pages
+    append_documents(merger, manifest[2:-1], progress)
     
     # Add receipt page
-    merger.append(pdf_paths[-1])
+    append_entry(merger, manifest[-1])
     
     # Write the merged PDF
-    merger.write(output_path)
+    write_merged(merger, output_path, progress)
     merger.close()
+    if linearize:
+        linearize_file(output_path)
+    
+    return output_path
+
+def merge_body(pdf_paths, output_path, progress=None, streaming=False, dedup=None, compact=None):
+    """Merge the index and documents into a book body for the book cache.
+
+    pdf_paths starts with the index page; the cover and receipt are added
+    per book by splice_book. streaming, dedup and compact work as in
+    merge_pdfs.
+    """
+    manifest = as_manifest(pdf_paths)
+    if streaming or compact is not None:
+        drain_stream(stream_body(manifest, output_path, progress, dedup, compact), progress)
+        return output_path
+    merger = PyPDF2.PdfMerger()
     
+    # Add index page, then each document with a bookmark
+    append_entry(merger, manifest[0])
+    append_documents(merger, manifest[1:], progress)
+    
+    write_merged(merger, output_path, progress)
+    merger.close()
     return output_path
 
+def splice_book(cover_path, body, receipt_path, output_path, linearize=False):
+    """Put a fresh cover and receipt around a cached book body.
+
+    With linearize the spliced book is rewritten for fast web view.
+    """
+    splice_pdf(body, output_path, before=[(cover_path, None)], after=[(receipt_path, None)])
+    if linearize:
+        linearize_file(output_path)
+    return output_path
+
+def stream_pdfs(pdf_paths, output_path=None, progress=None, dedup=None, compact=None):
+    """Merge PDFs like merge_pdfs, yielding the output bytes as they are written.
+
+    Each document's objects are emitted as soon as it has been read, so a
+    response can start before the merge finishes. If output_path is given, a
+    copy of the book is also written to disk.
+    """
+    manifest = as_manifest(pdf_paths)
+    
+    def steps(writer):
+        # Add cover and index pages
+        writer.append(manifest[0].path)
+        writer.append(manifest[1].path)
+        yield
+        
+        # Add each document with a bookmark
+        yield from stream_documents(writer, manifest[2:-1], progress)
+        
+        # Add receipt page
+        writer.append(manifest[-1].path)
+    
+    return stream_merge(output_path, dedup, compact, steps)
+
+def stream_body(pdf_paths, output_path=None, progress=None, dedup=None, compact=None):
+    """Merge a book body like merge_body, yielding the output bytes as they are written."""
+    manifest = as_manifest(pdf_paths)
+    
+    def steps(writer):
+        # Add index page, then each document with a bookmark
+        writer.append(manifest[0].path)
+        yield
+        yield from stream_documents(writer, manifest[1:], progress)
+    
+    return stream_merge(output_path, dedup, compact, steps)
+
 from reportlab.platypus import SimpleDocTemplate, Paragraph
 from reportlab.lib.styles import getSampleStyleSheet
 
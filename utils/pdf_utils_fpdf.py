@@ -1,326 +1,404 @@
-import os
+import io
+import threading
 import PyPDF2
 from fpdf import FPDF
 from datetime import datetime
+from models.book import Book
+from utils.merge_utils import (
+    as_manifest, append_documents, append_entry, drain_stream, stream_documents, write_merged
+)
+from utils.metrics import stage
+from utils.pdf_metadata import get_pdf_page_count, get_pdf_metadata, get_pdf_page_sizes
+from utils.pdf_stream_writer import stream_merge
+from utils.pdf_splice import splice_pdf
+from utils.pdf_linearize import linearize_file
 
-def get_pdf_page_count(pdf_path):
-    """Returns the number of pages in a PDF file."""
-    with open(pdf_path, 'rb') as file:
-        reader = PyPDF2.PdfReader(file)
-        return len(reader.pages)
+# English strings used when a caller passes no translations
+DEFAULT_TRANSLATIONS = {
+    "book_title": "Book of Documents",
+    "generated_on": "Generated on",
+    "index_title": "Index of Contents",
+    "index_navigation_hint": "Use the bookmarks panel in your PDF viewer to navigate between documents",
+    "document_name": "Document Name",
+    "starting_page": "Starting Page",
+    "ending_page": "Ending Page",
+    "status": "Status",
+    "included": "Included",
+    "error": "Error",
+    "total_documents": "Total Documents",
+    "total_pages": "Total Pages",
+    "receipt_title": "Processing Receipt",
+    "summary": "Summary",
+    "book_id": "Book ID",
+    "created": "Created",
+    "processing_results": "Processing Results",
+    "pages": "Pages",
+    "errors": "Errors",
+    "none": "None"
+}
 
-def create_cover_page(output_path, title, translations=None):
-    """Create a cover page for the Book of Documents using FPDF."""
-    if translations is None:
-        translations = {"generated_on": "Generated on"}
+# Define colors
+HEADER_BG = (44, 62, 80)  # #2c3e50 dark blue
+ALT_ROW_BG = (242, 242, 242)  # #f2f2f2 light gray
+SUCCESS_COLOR = (40, 167, 69)  # green
+ERROR_COLOR = (220, 53, 69)  # red
+LINK_COLOR = (0, 0, 255)  # blue for document names
+
+# Index table layout on A4
+PAGE_WIDTH = 210  # A4 width in mm
+MARGIN = 10
+USABLE_WIDTH = PAGE_WIDTH - (2 * MARGIN)
+INDEX_COLUMN_WIDTHS = [USABLE_WIDTH * 0.55, USABLE_WIDTH * 0.15, USABLE_WIDTH * 0.15, USABLE_WIDTH * 0.15]
+RECEIPT_COLUMN_WIDTHS = [80, 25, 25, 60]
+
+class FrontMatterRenderer:
+    """Renders the cover, index and receipt pages for one language using FPDF.
+
+    Translated headers and labels are resolved once, when the renderer is
+    created; rendering only lays out the per-book content. Outputs may be
+    file paths or writable binary files.
+    """
+
+    def __init__(self, translations):
+        self.translations = dict(DEFAULT_TRANSLATIONS, **translations)
+        t = self.translations
+        self.index_header = [t["document_name"], t["starting_page"], t["ending_page"], t["status"]]
+        self.receipt_header = [t["document_name"], t["status"], t["pages"], t["errors"]]
+
+    def render(self, book, cover_path=None, index_path=None, receipt_path=None):
+        """Render the requested front-matter pages of a book in one call.
+
+        Each page is timed as its own generation stage (cover, index, receipt).
+        """
+        if cover_path is not None:
+            with stage('cover'):
+                self.render_cover(cover_path, self.translations["book_title"])
+        if index_path is not None:
+            with stage('index'):
+                self.render_index(index_path, book.documents)
+        if receipt_path is not None:
+            with stage('receipt'):
+                self.render_receipt(receipt_path, book)
+
+    def render_cover(self, output_path, title):
+        pdf = FPDF(orientation='P', unit='mm', format='A4')
+        pdf.add_page()
         
-    pdf = FPDF(orientation='P', unit='mm', format='A4')
-    pdf.add_page()
-    
-    # Set font and title
-    pdf.set_font("Helvetica", "B", 24)
-    pdf.cell(0, 40, txt="", ln=1)  # Add some space at top
-    pdf.cell(0, 20, txt=title, align='C', ln=1)
-    
-    # Draw the date
-    pdf.set_font("Helvetica", "", 12)
-    pdf.cell(0, 10, txt=f"{translations.get('generated_on', 'Generated on')} {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", align='C')
-    
-    pdf.output(output_path)
-    return output_path
+        # Set font and title
+        pdf.set_font("Helvetica", "B", 24)
+        pdf.cell(0, 40, txt="", ln=1)  # Add some space at top
+        pdf.cell(0, 20, txt=title, align='C', ln=1)
+        
+        # Draw the date
+        pdf.set_font("Helvetica", "", 12)
+        pdf.cell(0, 10, txt=f"{self.translations['generated_on']} {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", align='C')
+        
+        pdf.output(output_path)
+        return output_path
 
-def create_index_page(output_path, documents, translations=None):
-    """Create an index page listing all documents with page numbers."""
-    # Default translations to English if not provided
-    if translations is None:
-        translations = {
-            "book_title": "Book of Documents",
-            "index_title": "Index of Contents",
-            "index_navigation_hint": "Use the bookmarks panel in your PDF viewer to navigate between documents",
-            "document_name": "Document Name",
-            "starting_page": "Starting Page",
-            "ending_page": "Ending Page", 
-            "status": "Status",
-            "included": "Included",
-            "error": "Error",
-            "total_documents": "Total Documents",
-            "total_pages": "Total Pages"
-        }
-    
-    pdf = FPDF(orientation='P', unit='mm', format='A4')
-    pdf.set_auto_page_break(auto=True, margin=15)
-    pdf.add_page()
-    
-    # Define colors
-    header_bg = (44, 62, 80)  # #2c3e50 dark blue
-    alt_row_bg = (242, 242, 242)  # #f2f2f2 light gray
-    success_color = (40, 167, 69)  # green
-    error_color = (220, 53, 69)  # red
-    link_color = (0, 0, 255)  # blue for links
-    
-    # Add title with translation
-    pdf.set_font("Helvetica", "B", 24)
-    pdf.cell(0, 20, translations["book_title"], 0, 1, 'C')
-    
-    # Add subtitle with translation
-    pdf.set_font("Helvetica", "B", 16)
-    pdf.cell(0, 10, translations["index_title"], 0, 1, 'C')
-    
-    # Add instruction for navigation with translation
-    pdf.set_font("Helvetica", "I", 10)
-    pdf.cell(0, 10, translations["index_navigation_hint"], 0, 1, 'C')
-    pdf.ln(5)
-    
-    # Define column widths
-    page_width = 210  # A4 width in mm
-    margin = 10
-    usable_width = page_width - (2 * margin)
-    col_widths = [usable_width * 0.55, usable_width * 0.15, usable_width * 0.15, usable_width * 0.15]
-    
-    # Create table header for index with translations
-    header = [translations["document_name"], translations["starting_page"], 
-              translations["ending_page"], translations["status"]]
-    
-    # Set header style
-    pdf.set_fill_color(*header_bg)
-    pdf.set_text_color(255, 255, 255)
-    pdf.set_font("Helvetica", "B", 12)
-    
-    # Draw header row
-    pdf.set_x(margin)
-    for i in range(len(header)):
-        pdf.cell(col_widths[i], 12, header[i], 1, 0, 'C', True)
-    pdf.ln()
-    
-    # Reset text color for content
-    pdf.set_text_color(0, 0, 0)
-    pdf.set_font("Helvetica", "", 10)
-    
-    current_page = 1  # Cover page is page 1
-    current_page += 1  # Add index page to count
-    
-    # Draw table content
-    for i, document in enumerate(documents):
-        start_page = current_page
-        end_page = current_page + document.page_count - 1
+    def render_index(self, output_path, documents):
+        t = self.translations
+        pdf = FPDF(orientation='P', unit='mm', format='A4')
+        pdf.set_auto_page_break(auto=True, margin=15)
+        pdf.add_page()
         
-        # Alternate row colors
-        if i % 2 == 1:
-            pdf.set_fill_color(*alt_row_bg)
-            fill = True
-        else:
-            pdf.set_fill_color(255, 255, 255)
-            fill = True
+        # Add title, subtitle and navigation hint
+        pdf.set_font("Helvetica", "B", 24)
+        pdf.cell(0, 20, t["book_title"], 0, 1, 'C')
+        pdf.set_font("Helvetica", "B", 16)
+        pdf.cell(0, 10, t["index_title"], 0, 1, 'C')
+        pdf.set_font("Helvetica", "I", 10)
+        pdf.cell(0, 10, t["index_navigation_hint"], 0, 1, 'C')
+        pdf.ln(5)
         
-        # Format long filenames
-        doc_name = document.original_filename
-        if len(doc_name) > 45:
-            doc_name = doc_name[:42] + "..."
+        # Draw header row
+        pdf.set_fill_color(*HEADER_BG)
+        pdf.set_text_color(255, 255, 255)
+        pdf.set_font("Helvetica", "B", 12)
+        pdf.set_x(MARGIN)
+        for width, text in zip(INDEX_COLUMN_WIDTHS, self.index_header):
+            pdf.cell(width, 12, text, 1, 0, 'C', True)
+        pdf.ln()
         
-        # Set position for new row
-        pdf.set_x(margin)
+        # Reset text color for content
+        pdf.set_text_color(0, 0, 0)
+        pdf.set_font("Helvetica", "", 10)
         
-        # Document name column - with link if document status is success
-        if document.status == "success":
-            # Add link to the document page
-            pdf.set_text_color(*link_color)  # Blue color for links
-            pdf.set_font("Helvetica", "U", 10)  # Underlined font for links
+        current_page = 1  # Cover page is page 1
+        current_page += 1  # Add index page to count
+        
+        # Draw table content
+        for i, document in enumerate(documents):
+            success = document.status == "success"
+            
+            # Alternate row colors
+            pdf.set_fill_color(*(ALT_ROW_BG if i % 2 == 1 else (255, 255, 255)))
+            
+            # Format long filenames
+            doc_name = document.original_filename
+            if len(doc_name) > 45:
+                doc_name = doc_name[:42] + "..."
             
-            # Create a link to document page using page number
-            # For documents after the index, their pages in the PDF start at 3 (1-based)
-            target_page = i + 3 
+            # Set position for new row
+            pdf.set_x(MARGIN)
             
-            # Add cell with link to target page
-            pdf.cell(col_widths[0], 8, doc_name, 1, 0, 'L', fill, link=target_page)
+            # Document name column; included documents are shown in blue.
+            # Navigation is through the bookmarks, so there is no link.
+            if success:
+                pdf.set_text_color(*LINK_COLOR)
+                pdf.set_font("Helvetica", "U", 10)
+                pdf.cell(INDEX_COLUMN_WIDTHS[0], 8, doc_name, 1, 0, 'L', True)
+                pdf.set_text_color(0, 0, 0)
+                pdf.set_font("Helvetica", "", 10)
+            else:
+                pdf.cell(INDEX_COLUMN_WIDTHS[0], 8, doc_name, 1, 0, 'L', True)
             
-            # Reset text color and font
+            # Page number columns
+            if success:
+                pdf.cell(INDEX_COLUMN_WIDTHS[1], 8, str(current_page), 1, 0, 'C', True)
+                pdf.cell(INDEX_COLUMN_WIDTHS[2], 8, str(current_page + document.page_count - 1), 1, 0, 'C', True)
+            else:
+                pdf.cell(INDEX_COLUMN_WIDTHS[1], 8, "-", 1, 0, 'C', True)
+                pdf.cell(INDEX_COLUMN_WIDTHS[2], 8, "-", 1, 0, 'C', True)
+            
+            # Status column with color
+            pdf.set_text_color(*(SUCCESS_COLOR if success else ERROR_COLOR))
+            pdf.cell(INDEX_COLUMN_WIDTHS[3], 8, t["included"] if success else t["error"], 1, 0, 'C', True)
             pdf.set_text_color(0, 0, 0)
-            pdf.set_font("Helvetica", "", 10)
-        else:
-            # No link for error documents
-            pdf.cell(col_widths[0], 8, doc_name, 1, 0, 'L', fill)
+            
+            pdf.ln()
+            
+            if success:
+                current_page += document.page_count
         
-        # Page number columns
-        if document.status == "success":
-            pdf.cell(col_widths[1], 8, str(start_page), 1, 0, 'C', fill)
-            pdf.cell(col_widths[2], 8, str(end_page), 1, 0, 'C', fill)
-        else:
-            pdf.cell(col_widths[1], 8, "-", 1, 0, 'C', fill)
-            pdf.cell(col_widths[2], 8, "-", 1, 0, 'C', fill)
+        # Add receipt page to count
+        current_page += 1
         
-        # Status column with color
-        status_text = translations["included"] if document.status == "success" else translations["error"]
-        pdf.set_x(pdf.get_x())  # Maintain position
+        # Add footer
+        pdf.ln(10)
+        pdf.set_font("Helvetica", "", 11)
+        total_text = f"{t['total_documents']}: {len(documents)} | {t['total_pages']}: {current_page - 1}"
+        pdf.cell(0, 10, total_text, 0, 1, 'C')
         
-        # Save current text color
-        current_color = pdf.text_color
+        pdf.output(output_path)
+        return output_path
+
+    def render_receipt(self, output_path, book):
+        t = self.translations
+        pdf = FPDF(orientation='P', unit='mm', format='A4')
+        pdf.add_page()
         
-        # Set color based on status
-        if document.status == "success":
-            pdf.set_text_color(*success_color)
-        else:
-            pdf.set_text_color(*error_color)
-            
-        pdf.cell(col_widths[3], 8, status_text, 1, 0, 'C', fill)
+        # Add title and subtitle
+        pdf.set_font("Helvetica", "B", 24)
+        pdf.cell(0, 20, t["receipt_title"], 0, 1, 'C')
+        pdf.set_font("Helvetica", "B", 16)
+        pdf.cell(0, 10, t["summary"], 0, 1, 'C')
+        pdf.ln(10)
+        
+        # Add summary
+        pdf.set_font("Helvetica", "", 11)
+        pdf.cell(0, 8, txt=f"{t['book_id']}: {book.id}", ln=1)
+        pdf.cell(0, 8, txt=f"{t['created']}: {book.created_at.strftime('%Y-%m-%d %H:%M:%S')}", ln=1)
+        pdf.cell(0, 8, txt=f"{t['total_documents']}: {len(book.documents)}", ln=1)
+        pdf.cell(0, 8, txt=f"{t['total_pages']}: {book.total_pages}", ln=1)
+        pdf.ln(10)
         
-        # Reset text color
-        pdf.set_text_color(*current_color)
+        # Add detailed results title
+        pdf.set_font("Helvetica", "B", 14)
+        pdf.cell(0, 10, txt=t["processing_results"], ln=1)
+        pdf.ln(5)
         
+        # Draw header row
+        pdf.set_font("Helvetica", "B", 11)
+        pdf.set_fill_color(*HEADER_BG)
+        pdf.set_text_color(255, 255, 255)
+        for width, text in zip(RECEIPT_COLUMN_WIDTHS, self.receipt_header):
+            pdf.cell(width, 10, txt=text, border=1, fill=True)
         pdf.ln()
         
-        if document.status == "success":
-            current_page += document.page_count
-    
-    # Add receipt page to count
-    current_page += 1
-    
-    # Add footer with translations
-    pdf.ln(10)
-    pdf.set_font("Helvetica", "", 11)
-    total_text = f"{translations['total_documents']}: {len(documents)} | {translations['total_pages']}: {current_page - 1}"
-    pdf.cell(0, 10, total_text, 0, 1, 'C')
-    
-    # Save the PDF without trying to create links
-    pdf.output(output_path)
-    
-    # Return just the output path - no links needed
-    return output_path
-
-def create_receipt_page(output_path, book, translations=None):
-    """Create a receipt page showing processing results."""
-    # Default translations to English if not provided
-    if translations is None:
-        translations = {
-            "receipt_title": "Processing Receipt",
-            "summary": "Summary",
-            "book_id": "Book ID",
-            "created": "Created",
-            "total_documents": "Total Documents",
-            "total_pages": "Total Pages",
-            "processing_results": "Processing Results",
-            "document_name": "Document Name",
-            "status": "Status",
-            "pages": "Pages",
-            "errors": "Errors",
-            "none": "None"
-        }
-    
-    pdf = FPDF(orientation='P', unit='mm', format='A4')
-    pdf.add_page()
-    
-    # Define colors
-    header_bg = (44, 62, 80)  # #2c3e50 dark blue
-    alt_row_bg = (242, 242, 242)  # #f2f2f2 light gray
-    success_color = (40, 167, 69)  # green
-    error_color = (220, 53, 69)  # red
-    
-    # Add title
-    pdf.set_font("Helvetica", "B", 24)
-    pdf.cell(0, 20, translations["receipt_title"], 0, 1, 'C')
-    
-    # Add subtitle
-    pdf.set_font("Helvetica", "B", 16)
-    pdf.cell(0, 10, translations["summary"], 0, 1, 'C')
-    pdf.ln(10)
-    
-    # Add summary
-    pdf.set_font("Helvetica", "", 11)
-    pdf.cell(0, 8, txt=f"{translations['book_id']}: {book.id}", ln=1)
-    pdf.cell(0, 8, txt=f"{translations['created']}: {book.created_at.strftime('%Y-%m-%d %H:%M:%S')}", ln=1)
-    pdf.cell(0, 8, txt=f"{translations['total_documents']}: {len(book.documents)}", ln=1)
-    pdf.cell(0, 8, txt=f"{translations['total_pages']}: {book.total_pages}", ln=1)
-    pdf.ln(10)
-    
-    # Add detailed results title
-    pdf.set_font("Helvetica", "B", 14)
-    pdf.cell(0, 10, txt=translations["processing_results"], ln=1)
-    pdf.ln(5)
-    
-    # Create table for results
-    column_widths = [80, 25, 25, 60]
-    header = [translations["document_name"], translations["status"], translations["pages"], translations["errors"]]
-    
-    # Set header style
-    pdf.set_font("Helvetica", "B", 11)
-    pdf.set_fill_color(*header_bg)
-    pdf.set_text_color(255, 255, 255)
-    
-    # Draw header row
-    for i in range(len(header)):
-        pdf.cell(column_widths[i], 10, txt=header[i], border=1, fill=True)
-    pdf.ln()
-    
-    # Reset text color for content
-    pdf.set_text_color(0, 0, 0)
-    pdf.set_font("Helvetica", "", 9)
-    
-    # Draw table content
-    for i, doc in enumerate(book.documents):
-        fill = i % 2 == 0
+        # Reset text color for content
+        pdf.set_text_color(0, 0, 0)
+        pdf.set_font("Helvetica", "", 9)
         
-        # Truncate long filenames to fit in cell
-        doc_name = doc.original_filename
-        if len(doc_name) > 30:
-            doc_name = doc_name[:27] + "..."
+        # Draw table content
+        for i, doc in enumerate(book.documents):
+            fill = i % 2 == 0
             
-        pdf.cell(column_widths[0], 8, txt=doc_name, border=1, fill=fill)
-        pdf.cell(column_widths[1], 8, txt=doc.status, border=1, fill=fill)
-        pdf.cell(column_widths[2], 8, txt=str(doc.page_count), border=1, fill=fill)
-        
-        # Format errors to fit in cell
-        error_txt = "\n".join(doc.errors) if doc.errors else translations["none"]
-        if len(error_txt) > 40:
-            error_txt = error_txt[:37] + "..."
+            # Truncate long filenames to fit in cell
+            doc_name = doc.original_filename
+            if len(doc_name) > 30:
+                doc_name = doc_name[:27] + "..."
+            
+            pdf.cell(RECEIPT_COLUMN_WIDTHS[0], 8, txt=doc_name, border=1, fill=fill)
+            pdf.cell(RECEIPT_COLUMN_WIDTHS[1], 8, txt=doc.status, border=1, fill=fill)
+            pdf.cell(RECEIPT_COLUMN_WIDTHS[2], 8, txt=str(doc.page_count), border=1, fill=fill)
+            
+            # Format errors to fit in cell
+            error_txt = "\n".join(doc.errors) if doc.errors else t["none"]
+            if len(error_txt) > 40:
+                error_txt = error_txt[:37] + "..."
+            
+            pdf.cell(RECEIPT_COLUMN_WIDTHS[3], 8, txt=error_txt, border=1, fill=fill)
+            pdf.ln()
         
-        pdf.cell(column_widths[3], 8, txt=error_txt, border=1, fill=fill)
-        pdf.ln()
-    
-    pdf.output(output_path)
-    return output_path
+        pdf.output(output_path)
+        return output_path
+
+_renderers = {}
+_renderers_lock = threading.Lock()
+
+def get_front_matter_renderer(translations=None):
+    """Return the process-wide renderer for a set of translations."""
+    translations = translations or DEFAULT_TRANSLATIONS
+    key = tuple(sorted(translations.items()))
+    with _renderers_lock:
+        if key not in _renderers:
+            _renderers[key] = FrontMatterRenderer(translations)
+        return _renderers[key]
+
+def warm_up_front_matter(all_translations):
+    """Build a renderer per language and render one throwaway book with each.
 
-def merge_pdfs(pdf_paths, output_path):
-    """Merge multiple PDFs into a single file with bookmarks for navigation."""
+    Run at startup so the first generation does not pay for font metrics
+    and output code being loaded.
+    """
+    book = Book()
+    for translations in all_translations:
+        renderer = get_front_matter_renderer(translations)
+        # The pages one by one, so the throwaway book stays out of the stage metrics
+        renderer.render_cover(io.BytesIO(), renderer.translations["book_title"])
+        renderer.render_index(io.BytesIO(), book.documents)
+        renderer.render_receipt(io.BytesIO(), book)
+
+def render_front_matter(book, translations, cover_path=None, index_path=None, receipt_path=None):
+    """Render a book's cover, index and receipt with the cached renderer."""
+    get_front_matter_renderer(translations).render(book, cover_path, index_path, receipt_path)
+
+def create_cover_page(output_path, title, translations=None):
+    """Create a cover page for the Book of Documents using FPDF."""
+    return get_front_matter_renderer(translations).render_cover(output_path, title)
+
+def create_index_page(output_path, documents, translations=None):
+    """Create an index page listing all documents with page numbers."""
+    return get_front_matter_renderer(translations).render_index(output_path, documents)
+
+def create_receipt_page(output_path, book, translations=None):
+    """Create a receipt page showing processing results."""
+    return get_front_matter_renderer(translations).render_receipt(output_path, book)
+
+def merge_pdfs(pdf_paths, output_path, progress=None, streaming=False, dedup=None, compact=None,
+               linearize=False):
+    """Merge multiple PDFs into a single file with bookmarks for navigation.
+
+    The options work as in utils.pdf_utils.merge_pdfs; documents are
+    bookmarked under a Documents parent.
+    """
+    manifest = as_manifest(pdf_paths)
+    if streaming or compact is not None:
+        drain_stream(stream_pdfs(manifest, output_path, progress, dedup, compact), progress)
+        if linearize:
+            linearize_file(output_path)
+        return output_path
     merger = PyPDF2.PdfMerger()
     
     # Add cover page
-    merger.append(pdf_paths[0])
+    append_entry(merger, manifest[0])
     merger.add_outline_item("Cover Page", 0, parent=None)
     
     # Add index page
-    merger.append(pdf_paths[1])
-    merger.add_outline_item("Index", 1, parent=None)
+    index_start = len(merger.pages)
+    append_entry(merger, manifest[1])
+    merger.add_outline_item("Index", index_start, parent=None)
     
-    # Create a Documents parent bookmark
-    docs_parent = merger.add_outline_item("Documents", 2, parent=None)
-    
-    # Add each document with bookmarks
-    current_page = 2  # Start after cover and index
-    for i, pdf in enumerate(pdf_paths[2:-1]):  # Skip cover, index, and receipt pages
-        try:
-            # Add document to the merger
-            merger.append(pdf)
-            
-            # Add a bookmark for the document
-            doc_name = os.path.basename(pdf)
-            merger.add_outline_item(doc_name, current_page, parent=docs_parent)
-            
-            # Update current page for next document
-            with open(pdf, 'rb') as f:
-                reader = PyPDF2.PdfReader(f)
-                current_page += len(reader.pages)
-        except Exception as e:
-            print(f"Error merging {pdf}: {str(e)}")
+    # Add each document under a Documents parent bookmark, skipping cover,
+    # index, and receipt pages
+    docs_parent = merger.add_outline_item("Documents", len(merger.pages), parent=None)
+    current_page = append_documents(merger, manifest[2:-1], progress, parent=docs_parent)
     
     # Add receipt page
-    merger.append(pdf_paths[-1])
+    append_entry(merger, manifest[-1])
     merger.add_outline_item("Receipt", current_page, parent=None)
     
     # Write the merged PDF
-    merger.write(output_path)
+    write_merged(merger, output_path, progress)
     merger.close()
+    if linearize:
+        linearize_file(output_path)
     
     return output_path
 
+def merge_body(pdf_paths, output_path, progress=None, streaming=False, dedup=None, compact=None):
+    """Merge the index and documents into a book body, as utils.pdf_utils.merge_body does."""
+    manifest = as_manifest(pdf_paths)
+    if streaming or compact is not None:
+        drain_stream(stream_body(manifest, output_path, progress, dedup, compact), progress)
+        return output_path
+    merger = PyPDF2.PdfMerger()
+    
+    # Add index page
+    append_entry(merger, manifest[0])
+    merger.add_outline_item("Index", 0, parent=None)
+    
+    # Add each document under a Documents parent bookmark
+    docs_parent = merger.add_outline_item("Documents", len(merger.pages), parent=None)
+    append_documents(merger, manifest[1:], progress, parent=docs_parent)
+    
+    write_merged(merger, output_path, progress)
+    merger.close()
+    return output_path
+
+def splice_book(cover_path, body, receipt_path, output_path, linearize=False):
+    """Put a fresh cover and receipt around a cached book body.
+
+    With linearize the spliced book is rewritten for fast web view.
+    """
+    splice_pdf(body, output_path, before=[(cover_path, "Cover Page")], after=[(receipt_path, "Receipt")])
+    if linearize:
+        linearize_file(output_path)
+    return output_path
+
+def stream_pdfs(pdf_paths, output_path=None, progress=None, dedup=None, compact=None):
+    """Merge PDFs like merge_pdfs, yielding the output bytes as they are written."""
+    manifest = as_manifest(pdf_paths)
+    
+    def steps(writer):
+        # Add cover page
+        writer.append(manifest[0].path)
+        writer.add_outline_item("Cover Page", 0)
+        
+        # Add index page
+        index_start = writer.page_count
+        writer.append(manifest[1].path)
+        writer.add_outline_item("Index", index_start)
+        yield
+        
+        # Add each document under a Documents parent bookmark
+        docs_parent = writer.add_outline_item("Documents", writer.page_count)
+        yield from stream_documents(writer, manifest[2:-1], progress, parent=docs_parent)
+        
+        # Add receipt page
+        receipt_start = writer.page_count
+        writer.append(manifest[-1].path)
+        writer.add_outline_item("Receipt", receipt_start)
+    
+    return stream_merge(output_path, dedup, compact, steps)
+
+def stream_body(pdf_paths, output_path=None, progress=None, dedup=None, compact=None):
+    """Merge a book body like merge_body, yielding the output bytes as they are written."""
+    manifest = as_manifest(pdf_paths)
+    
+    def steps(writer):
+        # Add index page
+        writer.append(manifest[0].path)
+        writer.add_outline_item("Index", 0)
+        yield
+        
+        # Add each document under a Documents parent bookmark
+        docs_parent = writer.add_outline_item("Documents", writer.page_count)
+        yield from stream_documents(writer, manifest[1:], progress, parent=docs_parent)
+    
+    return stream_merge(output_path, dedup, compact, steps)
+
 class Document:
     def __init__(self, output_path, content=None):
         self.output_path = output_path
@@ -0,0 +1,102 @@
+import io
+import os
+import re
+import time
+import pstats
+import cProfile
+import secrets
+import threading
+import tracemalloc
+
+# Lines of the stats and allocation listings kept in each report
+REPORT_LINES = 40
+
+_PROFILE_NAME_RE = re.compile(r'^[\w.-]+\.(prof|txt)$')
+
+# tracemalloc is process-wide, so memory profiles run one at a time
+_memory_lock = threading.Lock()
+
+class ProfileStore:
+    """Profiles saved in a folder: NAME.prof (pstats) and NAME.txt (report).
+
+    NAME is the time the profile was taken, the endpoint and a random
+    suffix.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+
+    def new_name(self, endpoint):
+        return f"{time.strftime('%Y%m%d_%H%M%S')}_{endpoint.replace('.', '_')}_{secrets.token_hex(4)}"
+
+    def save(self, name, profile, allocations=None, seconds=None):
+        """Write a cProfile.Profile's stats and a readable report under name"""
+        os.makedirs(self.folder, exist_ok=True)
+        profile.dump_stats(os.path.join(self.folder, name + '.prof'))
+        report = io.StringIO()
+        if seconds is not None:
+            report.write(f"Wall time: {seconds:.3f}s\n\n")
+        stats = pstats.Stats(profile, stream=report)
+        stats.sort_stats('cumulative').print_stats(REPORT_LINES)
+        if allocations is not None:
+            report.write(f"Top {len(allocations)} allocation sites by size:\n")
+            for stat in allocations:
+                report.write(f"{stat}\n")
+        with open(os.path.join(self.folder, name + '.txt'), 'w') as f:
+            f.write(report.getvalue())
+
+    def list(self):
+        """Saved profiles, newest first"""
+        if not os.path.isdir(self.folder):
+            return []
+        profiles = []
+        for filename in os.listdir(self.folder):
+            if not filename.endswith('.prof'):
+                continue
+            name = filename[:-len('.prof')]
+            path = os.path.join(self.folder, filename)
+            profiles.append({
+                'name': name,
+                'size': os.path.getsize(path),
+                'created': os.path.getmtime(path),
+                'report': os.path.exists(os.path.join(self.folder, name + '.txt'))
+            })
+        return sorted(profiles, key=lambda profile: profile['created'], reverse=True)
+
+    def path_for(self, filename):
+        """Path of a saved .prof or .txt file, or None if there is no such profile"""
+        if not _PROFILE_NAME_RE.match(filename):
+            return None
+        path = os.path.join(self.folder, filename)
+        return path if os.path.isfile(path) else None
+
+def profile_call(store, endpoint, func, memory=False):
+    """Run func() under cProfile, and tracemalloc if memory, and save the profile.
+
+    Returns (result, profile name). The profile is saved even when func
+    raises.
+    """
+    name = store.new_name(endpoint)
+    lock = _memory_lock if memory else None
+    if lock:
+        lock.acquire()
+    profile = cProfile.Profile()
+    allocations = None
+    started = time.perf_counter()
+    try:
+        if memory:
+            tracemalloc.start()
+        profile.enable()
+        try:
+            result = func()
+        finally:
+            profile.disable()
+            if memory:
+                snapshot = tracemalloc.take_snapshot()
+                tracemalloc.stop()
+                allocations = snapshot.statistics('lineno')[:REPORT_LINES]
+            store.save(name, profile, allocations, time.perf_counter() - started)
+    finally:
+        if lock:
+            lock.release()
+    return result, name
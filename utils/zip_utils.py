@@ -1,55 +1,47 @@
 import os
 import zipfile
-import tempfile
-import shutil
 from models.document import Document
 
-def extract_zip_to_folder(zip_path, extract_path):
-    """Extract a ZIP file to the specified folder."""
-    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-        zip_ref.extractall(extract_path)
-    return extract_path
+def is_pdf_member(info):
+    """Whether a ZIP entry is a visible PDF file, judged from its header only."""
+    if info.is_dir():
+        return False
+    filename = os.path.basename(info.filename)
+    # Skip hidden files (including macOS ._ resource forks)
+    if not filename or filename.startswith('.'):
+        return False
+    return filename.lower().endswith('.pdf')
 
-def process_zip_file(zip_path, upload_folder):
-    """Process a ZIP file and return a list of Document objects."""
+def process_zip_file(zip_file, blob_store, inspect=None):
+    """Process a ZIP file and return a list of Document objects.
+
+    zip_file may be a path or a seekable file object (such as the upload
+    stream). Entries are read from the central directory; non-PDF entries are
+    never decompressed, and each PDF member streams straight into the blob
+    store, which hashes it on the way. inspect(doc, pdf_path), if given, is
+    called for each stored document to fill in its page count.
+    """
     documents = []
     
-    # Create a temporary directory for extraction
-    temp_dir = tempfile.mkdtemp()
-    try:
-        extract_zip_to_folder(zip_path, temp_dir)
-        
-        # Walk through the extracted files
-        for root, dirs, files in os.walk(temp_dir):
-            for filename in files:
-                # Skip hidden files
-                if filename.startswith('.'):
-                    continue
-                
-                file_path = os.path.join(root, filename)
-                
-                # Only process PDF files
-                if filename.lower().endswith('.pdf'):
-                    # Create a unique filename in the upload folder
-                    new_filename = os.path.join(
-                        upload_folder, 
-                        f"{os.path.splitext(filename)[0]}_{os.path.getmtime(file_path):.0f}.pdf"
-                    )
-                    
-                    # Copy the file to the upload folder
-                    shutil.copy2(file_path, new_filename)
-                    
-                    # Create a document record
-                    rel_path = os.path.relpath(file_path, temp_dir)
-                    doc = Document(
-                        filename=os.path.basename(new_filename),
-                        original_filename=rel_path,
-                        file_type='pdf'
-                    )
-                    documents.append(doc)
-    
-    finally:
-        # Clean up temporary directory
-        shutil.rmtree(temp_dir, ignore_errors=True)
+    with zipfile.ZipFile(zip_file, 'r') as zip_ref:
+        for info in zip_ref.infolist():
+            # Only process PDF files
+            if not is_pdf_member(info):
+                continue
+            
+            # Store the member by content hash without extracting the archive
+            with zip_ref.open(info) as member:
+                content_hash, stored_name, _ = blob_store.store_stream(member)
+            
+            # Create a document record
+            doc = Document(
+                filename=stored_name,
+                original_filename=info.filename,
+                file_type='pdf',
+                content_hash=content_hash
+            )
+            if inspect:
+                inspect(doc, os.path.join(blob_store.root, stored_name))
+            documents.append(doc)
     
     return documents